@@ -5,3 +5,9 @@ class BadgesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'badges'
     verbose_name = 'Badges'
+
+    def ready(self):
+        # Compile badge templates and load theme CSS once, before the first request
+        from .utils.svg_renderer import get_renderer
+
+        get_renderer()
@@ -0,0 +1,79 @@
+# badges/management/commands/benchmark_badges.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from badges.utils.svg_renderer import BADGE_TEMPLATES, THEMES_DIR, get_renderer
+
+SAMPLE = {
+    'username': 'octocat',
+    'display_name': 'The Octocat',
+    'avatar_url': 'https://github.com/octocat.png',
+    'profile_url': 'https://github.com/octocat',
+    'country': 'Kenya',
+    'country_slug': 'kenya',
+    'followers': 12345,
+    'following': 9,
+    'public_repos': 8,
+    'contributions_last_year': 1520,
+    'rank': 3,
+    'global_rank': 42,
+    'country_rank': 3,
+    'streak': {'current': 41, 'best': 77},
+    'impact': 6210,
+    'languages': [],
+    'country_percentile': 99.2,
+    'animated': True,
+    'text_override': None,
+}
+
+
+def _legacy_render(template_name, context):
+    # The previous path: read the theme from disk, then render through the template loaders
+    css_path = THEMES_DIR / f"{context['theme_name']}.css"
+    theme_css = css_path.read_text(encoding='utf-8') if css_path.exists() else ''
+    return render_to_string(template_name, {**context, 'theme_css': theme_css}).encode('utf-8')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark badge rendering per badge type and theme (renders/second)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Renders per badge type and theme for each renderer (default: 200)'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        renderer = get_renderer()
+
+        self.stdout.write(f"{iterations} renders per badge type and theme")
+        self.stdout.write(f"  {'badge':<12} {'theme':<11} {'before':>12} {'after':>12}")
+        totals = {'before': 0.0, 'after': 0.0}
+        for badge_type, template_name in BADGE_TEMPLATES.items():
+            for theme in renderer.themes:
+                context = {**SAMPLE, 'theme_name': theme}
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    _legacy_render(template_name, context)
+                before = time.perf_counter() - start
+
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    renderer.render(badge_type, context)
+                after = time.perf_counter() - start
+
+                totals['before'] += before
+                totals['after'] += after
+                self.stdout.write(
+                    f"  {badge_type:<12} {theme:<11} {iterations / before:>10,.0f}/s {iterations / after:>10,.0f}/s"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Overall {totals['before'] / totals['after']:.1f}x faster "
+            f"({len(BADGE_TEMPLATES) * len(renderer.themes) * iterations / totals['after']:,.0f} renders/s)"
+        ))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from badges.services.badge_render import render_stats
+from badges.services.badge_warmup import warm_badges
+from github_management.models import Country
+
+
+def _ratio(value):
+    return 'n/a' if value is None else f"{value:.1%}"
+
+
+class Command(BaseCommand):
+    help = 'Pre-render every badge type and theme for the top-ranked users of each country'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--per-country',
+            type=int,
+            default=None,
+            help='Users per country by rank (default: BADGE_WARMUP_PER_COUNTRY)'
+        )
+        parser.add_argument(
+            '--countries',
+            type=str,
+            default='',
+            help='Comma-separated country slugs to warm (default: all countries)'
+        )
+        parser.add_argument(
+            '--reset-stats',
+            action='store_true',
+            help='Reset the badge request hit/miss counters after reporting them'
+        )
+
+    def handle(self, *args, **options):
+        slugs = [s.strip() for s in options['countries'].split(',') if s.strip()]
+        country_ids = None
+        if slugs:
+            country_ids = list(Country.objects.filter(slug__in=slugs).values_list('id', flat=True))
+            if len(country_ids) != len(slugs):
+                raise CommandError(f"Unknown country slug in: {', '.join(slugs)}")
+
+        result = warm_badges(per_country=options['per_country'], country_ids=country_ids)
+        requests = result['requests']
+        self.stdout.write(
+            f"Badge requests since the counters were reset: {requests['hits']} hits, {requests['misses']} misses "
+            f"(hit ratio {_ratio(requests['hit_ratio'])})"
+        )
+        if options['reset_stats']:
+            render_stats(reset=True)
+        self.stdout.write(
+            f"Warmed set hit ratio: {_ratio(result['coverage_before'])} before, "
+            f"{_ratio(result['coverage_after'])} after"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {result['rendered']} of {result['badges']} badges for {result['users']} users"
+        ))
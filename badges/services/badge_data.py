@@ -1,7 +1,16 @@
-from typing import Dict, Any
-from django.shortcuts import get_object_or_404
+import hashlib
+import json
+import time
+from typing import Dict, Any, Iterable, Optional, Tuple
+from django.core.cache import cache
+from django.http import Http404
 from github_management.models import GitHubUser, Country
 
+BADGE_TYPES = ('stats', 'rank', 'streak', 'langs', 'impact', 'country-top')
+
+DATA_TIMEOUT = 24 * 60 * 60  # entries are invalidated explicitly, so this only bounds memory
+MISSING_TIMEOUT = 5 * 60  # unknown usernames, so crawlers don't hit the database each time
+
 
 def _impact_score(user: GitHubUser) -> int:
     followers = user.followers or 0
@@ -20,15 +29,24 @@ def _streak_info(user: GitHubUser) -> Dict[str, Any]:
     return {"current": days, "best": best}
 
 
-def get_badge_context(username: str, badge_type: str, animated: bool, request=None) -> Dict[str, Any]:
-    user = get_object_or_404(GitHubUser, github_username__iexact=username)
+def _language_bars(languages):
+    """Add bar geometry (``x``, ``width``) to ``[{'name', 'percent'}]``; templates can't do arithmetic."""
+    if not languages:
+        return []
+    step = 680 / len(languages)
+    return [
+        {**lang, 'x': round(16 + i * step, 1), 'width': round(lang['percent'] / 100.0 * 672, 1)}
+        for i, lang in enumerate(languages)
+    ]
 
+
+def compute_badge_data(user: GitHubUser, badge_type: str) -> Dict[str, Any]:
+    """The render-independent data of one badge (no theme or animation flags)."""
     base = {
         'username': user.github_username,
         'display_name': user.display_name or user.github_username,
         'avatar_url': user.avatar_url,
         'profile_url': user.profile_url,
-        'animated': animated,
         'country': getattr(user.country, 'name', None),
         'country_slug': getattr(user.country, 'slug', None),
     }
@@ -42,26 +60,142 @@ def get_badge_context(username: str, badge_type: str, animated: bool, request=No
             'rank': user.rank,
         })
     elif badge_type == 'rank':
-        # global = user.rank; country position derived from country users
-        country_rank = None
-        if user.country_id:
-            country_rank = GitHubUser.objects.filter(country_id=user.country_id, rank__lte=user.rank).count()
-        base.update({'global_rank': user.rank, 'country_rank': country_rank})
+        # Positions are materialized by the leaderboard rebuild; fall back to the committers.top rank
+        base.update({
+            'global_rank': user.global_rank or user.rank,
+            'country_rank': user.country_rank,
+        })
     elif badge_type == 'streak':
         base.update({'streak': _streak_info(user)})
     elif badge_type == 'impact':
         base.update({'impact': _impact_score(user)})
     elif badge_type == 'langs':
         # Placeholder: if language stats exist elsewhere, wire here. Provide empty for now.
-        base.update({'languages': []})
+        base.update({'languages': _language_bars([])})
     elif badge_type == 'country-top':
-        # Compute percentile in country
-        percentile = None
-        if user.country_id:
-            total = GitHubUser.objects.filter(country_id=user.country_id).count() or 1
-            percentile = round((user.rank / total) * 100, 1)
-        base.update({'country_percentile': percentile})
+        base.update({'country_percentile': user.country_percentile})
     else:
         raise ValueError('Unknown badge type')
 
     return base
+
+
+def _user_key(username: str) -> str:
+    return f"badges:user:{username.lower()}"
+
+
+def _missing_key(username: str) -> str:
+    return f"badges:missing:{username.lower()}"
+
+
+def _data_key(username: str, badge_type: str, version: int) -> str:
+    return f"badges:data:{username.lower()}:{badge_type}:{version}"
+
+
+def data_digest(data: Dict[str, Any]) -> str:
+    """Short digest of a badge's data; equal data gives an equal digest across generations."""
+    payload = json.dumps(data, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _entry(username: str) -> Optional[Dict[str, Any]]:
+    """The user's cached generation ``{'v': version, 'd': {badge_type: digest}}``.
+
+    ``None`` if nothing is cached, a tombstone (``'v'`` is ``None``) right
+    after an invalidation. Raises ``Http404`` for logins recently found
+    missing. One cache round trip; never writes, so unknown logins leave
+    no keys behind beyond the short-lived missing marker.
+    """
+    user_key, missing_key = _user_key(username), _missing_key(username)
+    found = cache.get_many([user_key, missing_key])
+    if found.get(missing_key):
+        raise Http404('No GitHub user matches the given query.')
+    return found.get(user_key)
+
+
+def badge_digest(username: str, badge_type: str) -> Optional[str]:
+    """Digest of a badge's cached data from one cache read, ``None`` if not cached.
+
+    Raises:
+        Http404: The login was recently looked up and does not exist
+    """
+    entry = _entry(username)
+    if not entry or entry.get('v') is None:
+        return None
+    return entry['d'].get(badge_type)
+
+
+def _store(user: GitHubUser, replace: bool) -> Dict[str, Dict[str, Any]]:
+    """Compute and cache the data of every badge type as a new generation.
+
+    Without ``replace`` the generation is only published if the user has no
+    entry yet, so a request that read the row before a concurrent
+    invalidation can't overwrite its tombstone with stale data.
+    """
+    version = time.time_ns()
+    data = {kind: compute_badge_data(user, kind) for kind in BADGE_TYPES}
+    cache.set_many({_data_key(user.github_username, kind, version): value for kind, value in data.items()}, DATA_TIMEOUT)
+    entry = {'v': version, 'd': {kind: data_digest(value) for kind, value in data.items()}}
+    if replace:
+        cache.set(_user_key(user.github_username), entry, DATA_TIMEOUT)
+    else:
+        cache.add(_user_key(user.github_username), entry, DATA_TIMEOUT)
+    return data
+
+
+def get_badge_data(username: str, badge_type: str) -> Dict[str, Any]:
+    """Cached badge data for ``username``, keyed by (user, badge type, generation).
+
+    A hit costs two cache round trips and no query. On a miss the user is
+    loaded once (with country) and the data of every badge type is stored,
+    so the other types and every theme or variant of them are hits.
+    Unknown logins are remembered for ``MISSING_TIMEOUT``.
+    """
+    if badge_type not in BADGE_TYPES:
+        raise ValueError('Unknown badge type')
+    entry = _entry(username)
+    if entry and entry.get('v') is not None:
+        data = cache.get(_data_key(username, badge_type, entry['v']))
+        if data is not None:
+            return data
+
+    user = GitHubUser.objects.select_related('country').filter(github_username__iexact=username).first()
+    if user is None:
+        cache.set(_missing_key(username), True, MISSING_TIMEOUT)
+        raise Http404('No GitHub user matches the given query.')
+    # Seen an entry (tombstone or evicted data): this read is newer than it, so replace it
+    return _store(user, replace=entry is not None)[badge_type]
+
+
+def warm_badge_data(user: GitHubUser) -> Dict[str, Tuple[Dict[str, Any], str]]:
+    """Cached data of every badge type for an already loaded user (with country).
+
+    Reuses the current generation when it is complete, otherwise stores a
+    new one. Returns ``{badge_type: (data, digest)}``.
+    """
+    entry = cache.get(_user_key(user.github_username))
+    if entry and entry.get('v') is not None:
+        keys = {kind: _data_key(user.github_username, kind, entry['v']) for kind in BADGE_TYPES}
+        found = cache.get_many(list(keys.values()))
+        if len(found) == len(keys):
+            return {kind: (found[key], entry['d'][kind]) for kind, key in keys.items()}
+    data = _store(user, replace=entry is not None)
+    return {kind: (value, data_digest(value)) for kind, value in data.items()}
+
+
+def get_badge_context(username: str, badge_type: str, animated: bool, request=None) -> Dict[str, Any]:
+    return {**get_badge_data(username, badge_type), 'animated': animated}
+
+
+def invalidate_badges(usernames: Iterable[str]) -> None:
+    """Drop the cached data of these users after their stats or positions were written.
+
+    A tombstone replaces the entry (rather than a delete) so requests that
+    read the old row concurrently can't publish it again; it also clears
+    any missing marker of newly ingested logins.
+    """
+    usernames = [username for username in usernames if username]
+    if not usernames:
+        return
+    cache.set_many({_user_key(username): {'v': None} for username in usernames}, DATA_TIMEOUT)
+    cache.delete_many([_missing_key(username) for username in usernames])
@@ -0,0 +1,106 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from django.core.cache import cache
+
+from .badge_data import DATA_TIMEOUT
+from ..utils.png_renderer import render_png
+from ..utils.svg_renderer import DEFAULT_THEME, get_renderer
+
+SVG_CONTENT_TYPE = 'image/svg+xml; charset=utf-8'
+PNG_CONTENT_TYPE = 'image/png'
+RENDER_HITS_KEY = 'badges:render-stats:hits'
+RENDER_MISSES_KEY = 'badges:render-stats:misses'
+
+
+@dataclass(frozen=True)
+class BadgeOptions:
+    theme: str = DEFAULT_THEME
+    animated: bool = True
+    text: str = ''
+    fmt: str = 'svg'
+
+    @classmethod
+    def from_request(cls, request) -> 'BadgeOptions':
+        return cls(
+            # Unknown themes render the default one, so they share its entries
+            theme=get_renderer().theme_name(request.GET.get('theme', DEFAULT_THEME)),
+            animated=request.GET.get('animated', 'true').lower() in ('1', 'true', 'yes', 'on'),
+            text=request.GET.get('text', ''),
+            fmt='png' if request.GET.get('format', 'svg').lower() == 'png' else 'svg',
+        )
+
+
+def badge_etag(username: str, badge_type: str, options: BadgeOptions, digest: str) -> str:
+    """Strong ETag of a badge: digest of its data, badge type, options and renderer fingerprint.
+
+    Identical data keeps its ETag across refreshes and cache generations.
+    """
+    parts = (
+        username.lower(), badge_type, digest,
+        options.theme, str(int(options.animated)), options.text, options.fmt,
+        get_renderer().fingerprint,
+    )
+    return '"' + hashlib.sha1('\x1f'.join(parts).encode()).hexdigest() + '"'
+
+
+def render_key(etag: str) -> str:
+    return 'badges:render:' + etag.strip('"')
+
+
+def _count(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                pass
+
+
+def get_rendered(etag: str) -> Optional[Tuple[bytes, str]]:
+    """Previously rendered ``(body, content_type)`` for ``etag``; counted in ``render_stats``."""
+    rendered = cache.get(render_key(etag))
+    _count(RENDER_HITS_KEY if rendered is not None else RENDER_MISSES_KEY)
+    return rendered
+
+
+def store_rendered(etag: str, body: bytes, content_type: str) -> None:
+    cache.set(render_key(etag), (body, content_type), DATA_TIMEOUT)
+
+
+def render_stats(reset: bool = False) -> Dict[str, Any]:
+    """Render cache hits and misses of badge requests since the last reset."""
+    found = cache.get_many([RENDER_HITS_KEY, RENDER_MISSES_KEY])
+    hits, misses = found.get(RENDER_HITS_KEY, 0), found.get(RENDER_MISSES_KEY, 0)
+    if reset:
+        cache.delete_many([RENDER_HITS_KEY, RENDER_MISSES_KEY])
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else None}
+
+
+def render_svg(badge_type: str, data: Dict[str, Any], options: BadgeOptions) -> bytes:
+    return get_renderer().render(badge_type, {
+        **data,
+        'animated': options.animated,
+        'theme_name': options.theme,
+        'text_override': options.text or None,
+    })
+
+
+def render_badge(badge_type: str, data: Dict[str, Any], options: BadgeOptions) -> Tuple[bytes, str, bool]:
+    """Render one badge from its data.
+
+    Returns ``(body, content_type, complete)``; ``complete`` is False when a
+    PNG was asked for but the SVG is served instead, which must be neither
+    cached nor tagged.
+    """
+    svg = render_svg(badge_type, data, options)
+    if options.fmt == 'png':
+        png = render_png(svg)
+        if png is not None:
+            return png, PNG_CONTENT_TYPE, True
+        return svg, SVG_CONTENT_TYPE, False
+    return svg, SVG_CONTENT_TYPE, True
@@ -0,0 +1,116 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from github_management.models import GitHubUser
+from .badge_data import DATA_TIMEOUT, warm_badge_data
+from .badge_render import SVG_CONTENT_TYPE, BadgeOptions, render_key, badge_etag, render_stats, render_svg
+from ..utils.svg_renderer import get_renderer
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'badges:warmup:pending:{}'
+
+
+def top_ranked_users(per_country: int, country_ids: Optional[Iterable[int]] = None) -> List[GitHubUser]:
+    """The ``per_country`` best-ranked users of each country, in one query."""
+    users = GitHubUser.objects.select_related('country').filter(rank__gt=0)
+    if country_ids is not None:
+        users = users.filter(country_id__in=list(country_ids))
+    users = users.annotate(
+        position=Window(RowNumber(), partition_by=F('country_id'), order_by=[F('rank').asc(), F('id').asc()])
+    )
+    return list(users.filter(position__lte=per_country))
+
+
+def schedule_warmup(country_ids: Iterable[int]) -> List[int]:
+    """Queue one ``warm_top_badges`` pass ``BADGE_WARMUP_DEBOUNCE`` seconds from now.
+
+    Countries that already have a pass queued are left to it, so a burst of
+    refresh batches re-renders each country once.
+
+    Returns:
+        The countries this call queued
+    """
+    from ..tasks import warm_top_badges
+
+    debounce = settings.BADGE_WARMUP_DEBOUNCE
+    queued = sorted(
+        cid for cid in set(country_ids)
+        if cid is not None and cache.add(PENDING_KEY.format(cid), 1, debounce + 60)
+    )
+    if not queued:
+        return queued
+    try:
+        warm_top_badges.apply_async((queued,), countdown=debounce)
+    except Exception:
+        cache.delete_many([PENDING_KEY.format(cid) for cid in queued])
+        raise
+    return queued
+
+
+def _coverage(keys: List[str]) -> float:
+    if not keys:
+        return 1.0
+    return len(cache.get_many(keys)) / len(keys)
+
+
+def warm_badges(per_country: Optional[int] = None, country_ids: Optional[Iterable[int]] = None,
+                batch_size: int = 500) -> Dict[str, Any]:
+    """Pre-render every badge type and theme (default options, SVG) for the top users per country.
+
+    Render keys are derived from the data digest and only renders missing
+    from the cache are done, so re-running after an ingest only pays for
+    badges whose data moved. ``coverage_before``/``coverage_after`` are the
+    share of the warmed set already cached; ``requests`` is the live hit
+    ratio of badge requests (see ``render_stats``), which tells whether
+    traffic reaches past the warmed users.
+    """
+    if country_ids is not None:
+        # Changes from here on need a pass of their own
+        cache.delete_many([PENDING_KEY.format(cid) for cid in country_ids])
+    per_country = per_country or settings.BADGE_WARMUP_PER_COUNTRY
+    themes = list(get_renderer().themes)
+    users = top_ranked_users(per_country, country_ids)
+
+    # (render key, badge type, data, options) of every badge in the warmed set
+    plan = []
+    for user in users:
+        for badge_type, (data, digest) in warm_badge_data(user).items():
+            for theme in themes:
+                options = BadgeOptions(theme=theme)
+                etag = badge_etag(user.github_username, badge_type, options, digest=digest)
+                plan.append((render_key(etag), badge_type, data, options))
+
+    keys = [key for key, *_ in plan]
+    requests = render_stats()
+    rendered = 0
+    for start in range(0, len(plan), batch_size):
+        chunk = plan[start:start + batch_size]
+        present = cache.get_many([key for key, *_ in chunk])
+        entries = {
+            key: (render_svg(badge_type, data, options), SVG_CONTENT_TYPE)
+            for key, badge_type, data, options in chunk if key not in present
+        }
+        if entries:
+            cache.set_many(entries, DATA_TIMEOUT)
+        rendered += len(entries)
+
+    coverage_before = (len(plan) - rendered) / len(plan) if plan else 1.0
+    result = {
+        'users': len(users),
+        'badges': len(plan),
+        'rendered': rendered,
+        'coverage_before': coverage_before,
+        'coverage_after': _coverage(keys),
+        'requests': requests,
+    }
+    logger.info(
+        f"Warmed badges for {result['users']} users: {rendered}/{result['badges']} rendered, "
+        f"coverage {coverage_before:.0%} -> {result['coverage_after']:.0%}"
+    )
+    return result
@@ -0,0 +1,24 @@
+# badges/tasks.py
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from .services import badge_warmup
+from .utils.png_renderer import get_png_cache
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def prune_png_cache(max_age_days=None):
+    """Delete on-disk PNG badges not served within ``BADGE_PNG_CACHE_DAYS``."""
+    removed = get_png_cache().prune(max_age_days or settings.BADGE_PNG_CACHE_DAYS)
+    logger.info(f"Pruned {removed} cached PNG badges")
+    return removed
+
+
+@shared_task
+def warm_top_badges(country_ids=None, per_country=None):
+    """Pre-render the badges of the top ``BADGE_WARMUP_PER_COUNTRY`` users of each (or the given) country."""
+    return badge_warmup.warm_badges(per_country=per_country, country_ids=country_ids)
@@ -0,0 +1,311 @@
+import builtins
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import Http404
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from github_management.models import Country, GitHubUser
+from .management.commands.benchmark_badges import SAMPLE, _legacy_render
+from . import tasks
+from .services import badge_render
+from .services.badge_warmup import schedule_warmup, top_ranked_users, warm_badges
+from .utils import png_renderer
+from .utils.png_renderer import PngCache, PngRenderer
+from .utils.svg_renderer import BADGE_TEMPLATES, DEFAULT_THEME, BadgeRenderer, get_renderer
+from .services.badge_data import (
+    BADGE_TYPES, _store, badge_digest, get_badge_data, invalidate_badges, warm_badge_data,
+)
+
+
+class BadgeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.country = Country.objects.create(name='Wonderland', slug='wonderland')
+        self.user = GitHubUser.objects.create(
+            github_username='Alice', first_name='Alice', country=self.country,
+            followers=120, public_repos=30, contributions_last_year=900,
+            global_rank=7, country_rank=1, country_percentile=1.0,
+        )
+
+
+class BadgeDataTests(BadgeTestCase):
+    def test_one_query_fills_every_badge_type(self):
+        with self.assertNumQueries(1):
+            stats = get_badge_data('alice', 'stats')
+        with self.assertNumQueries(0):
+            for badge_type in BADGE_TYPES:
+                get_badge_data('ALICE', badge_type)
+
+        self.assertEqual((stats['username'], stats['followers']), ('Alice', 120))
+        self.assertEqual(get_badge_data('alice', 'rank')['global_rank'], 7)
+        self.assertIsNotNone(badge_digest('alice', 'rank'))
+
+    def test_unknown_logins_are_remembered_until_ingested(self):
+        with self.assertNumQueries(1), self.assertRaises(Http404):
+            get_badge_data('nobody', 'stats')
+        with self.assertNumQueries(0), self.assertRaises(Http404):
+            get_badge_data('nobody', 'rank')
+
+        GitHubUser.objects.create(github_username='nobody', country=self.country)
+        invalidate_badges(['nobody'])
+
+        self.assertEqual(get_badge_data('nobody', 'stats')['username'], 'nobody')
+
+    def test_invalidation_publishes_a_new_generation(self):
+        get_badge_data('alice', 'stats')
+        GitHubUser.objects.filter(pk=self.user.pk).update(followers=500)
+
+        invalidate_badges(['Alice'])
+
+        self.assertIsNone(badge_digest('alice', 'stats'))
+        self.assertEqual(get_badge_data('alice', 'stats')['followers'], 500)
+        self.assertIsNotNone(badge_digest('alice', 'stats'))
+
+    def test_stale_read_cannot_overwrite_a_tombstone(self):
+        # A request loaded the row, then a refresh wrote it and invalidated the badges
+        stale = GitHubUser.objects.select_related('country').get(pk=self.user.pk)
+        GitHubUser.objects.filter(pk=self.user.pk).update(followers=500)
+        invalidate_badges(['Alice'])
+
+        _store(stale, replace=False)
+
+        self.assertIsNone(badge_digest('alice', 'stats'))
+        self.assertEqual(get_badge_data('alice', 'stats')['followers'], 500)
+
+    def test_equal_data_keeps_its_digest_across_generations(self):
+        first = warm_badge_data(self.user)
+        invalidate_badges(['Alice'])
+        second = warm_badge_data(self.user)
+
+        self.assertEqual({kind: digest for kind, (_, digest) in first.items()},
+                         {kind: digest for kind, (_, digest) in second.items()})
+        self.assertEqual(badge_digest('alice', 'impact'), first['impact'][1])
+
+
+class BadgeRendererTests(TestCase):
+    def test_output_matches_the_template_loader_path(self):
+        renderer = get_renderer()
+        for badge_type, template_name in BADGE_TEMPLATES.items():
+            for theme in renderer.themes:
+                with self.subTest(badge_type=badge_type, theme=theme):
+                    context = {**SAMPLE, 'theme_name': theme}
+                    self.assertEqual(renderer.render(badge_type, context), _legacy_render(template_name, context))
+
+    def test_render_does_not_touch_the_filesystem(self):
+        renderer = BadgeRenderer()
+        with mock.patch.object(builtins, 'open', side_effect=AssertionError('file opened')):
+            for badge_type in BADGE_TEMPLATES:
+                renderer.render(badge_type, {**SAMPLE, 'theme_name': DEFAULT_THEME})
+
+    def test_unknown_themes_render_the_default(self):
+        renderer = get_renderer()
+        self.assertEqual(renderer.theme_name('no-such-theme'), DEFAULT_THEME)
+        self.assertEqual(
+            renderer.render('stats', {**SAMPLE, 'theme_name': 'no-such-theme'}),
+            renderer.render('stats', {**SAMPLE, 'theme_name': DEFAULT_THEME}),
+        )
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_badges', iterations=1, stdout=out)
+        self.assertIn('stats', out.getvalue())
+
+
+class PngCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+
+    def age(self, cache, key, days):
+        then = time.time() - days * 24 * 60 * 60
+        os.utime(cache._path(key), (then, then))
+        return os.path.getmtime(cache._path(key))
+
+    def test_memory_is_bounded_and_disk_survives_restarts(self):
+        cache = PngCache(max_bytes=10, directory=self.tmp)
+        cache.set('a' * 64, b'123456')
+        cache.set('b' * 64, b'789012')
+        self.assertEqual(list(cache.entries), ['b' * 64])
+
+        restarted = PngCache(max_bytes=10, directory=self.tmp)
+        self.assertEqual(restarted.get('a' * 64), b'123456')
+        self.assertIsNone(restarted.get('c' * 64))
+
+    def test_disk_hits_keep_entries_from_being_pruned(self):
+        key, unread = 'a' * 64, 'b' * 64
+        cache = PngCache(max_bytes=0, directory=self.tmp)
+        cache.set(key, b'png')
+        cache.set(unread, b'png')
+        self.age(cache, unread, days=10)
+
+        # Read within the last day: the mtime is left alone
+        recent = self.age(cache, key, days=0.5)
+        cache.get(key)
+        self.assertEqual(os.path.getmtime(cache._path(key)), recent)
+
+        self.age(cache, key, days=10)
+        cache.get(key)
+        self.assertEqual(cache.prune(max_age_days=7), 1)
+        self.assertTrue(os.path.exists(cache._path(key)))
+        self.assertFalse(os.path.exists(cache._path(unread)))
+
+
+class PngRendererTests(SimpleTestCase):
+    def renderer(self, rasterize_func=bytes.upper, **kwargs):
+        options = {'workers': 1, 'queue_size': 1, 'timeout': 30, 'queue_wait': 0, **kwargs}
+        renderer = PngRenderer(cache=PngCache(max_bytes=1024), rasterize_func=rasterize_func, **options)
+        self.addCleanup(lambda: renderer.pool and renderer.pool.shutdown(cancel_futures=True))
+        return renderer
+
+    def test_renders_in_the_pool_and_caches_by_content(self):
+        renderer = self.renderer()
+        self.assertEqual(renderer.render(b'<svg/>'), b'<SVG/>')
+
+        renderer.rasterize_func = None  # a second render would fail
+        self.assertEqual(renderer.render(b'<svg/>'), b'<SVG/>')
+
+    def test_saturated_queue_serves_the_svg(self):
+        renderer = self.renderer()
+        renderer.slots.acquire()
+        with self.assertLogs('badges.utils.png_renderer', 'INFO'):
+            self.assertIsNone(renderer.render(b'<svg/>'))
+
+    def test_failed_render_serves_the_svg(self):
+        renderer = self.renderer(rasterize_func=bytes.fromhex)
+        with self.assertLogs('badges.utils.png_renderer', 'WARNING'):
+            self.assertIsNone(renderer.render(b'<svg/>'))
+        # The slot was given back
+        self.assertTrue(renderer.slots.acquire(timeout=1))
+
+    def test_missing_cairosvg_serves_the_svg(self):
+        with mock.patch.object(png_renderer, '_available', False):
+            self.assertIsNone(png_renderer.render_png(b'<svg/>'))
+
+
+class BadgeViewTests(BadgeTestCase):
+    def get(self, badge_type='stats', username='alice', etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(
+            reverse('badges:github_badge', args=[username, badge_type]), params, secure=True, **headers
+        )
+
+    def test_revalidation_is_answered_from_one_cache_read(self):
+        first = self.get(theme='sunset')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['Content-Type'].startswith('image/svg+xml'))
+
+        with self.assertNumQueries(0), mock.patch.object(badge_render, 'render_svg') as render:
+            for etag in (first['ETag'], f"W/{first['ETag']}", f'"other", {first["ETag"]}'):
+                response = self.get(etag=etag, theme='sunset')
+                self.assertEqual((response.status_code, response['ETag']), (304, first['ETag']))
+        render.assert_not_called()
+
+    def test_each_variant_has_its_own_etag(self):
+        etags = {
+            self.get()['ETag'],
+            self.get(theme='sunset')['ETag'],
+            self.get(animated='false')['ETag'],
+            self.get(text='Hi')['ETag'],
+            self.get('rank')['ETag'],
+        }
+        self.assertEqual(len(etags), 5)
+        self.assertEqual(self.get(theme='no-such-theme')['ETag'], self.get()['ETag'])
+
+    def test_repeat_requests_reuse_the_rendered_body(self):
+        first = self.get()
+        with mock.patch.object(badge_render, 'render_svg') as render:
+            second = self.get()
+        render.assert_not_called()
+        self.assertEqual(second.content, first.content)
+
+    def test_etag_follows_the_data_not_the_generation(self):
+        etag = self.get()['ETag']
+        invalidate_badges(['Alice'])
+        self.assertEqual(self.get(etag=etag).status_code, 304)
+
+        GitHubUser.objects.filter(pk=self.user.pk).update(followers=500)
+        invalidate_badges(['Alice'])
+        response = self.get(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_missing_users_and_badge_types(self):
+        self.assertEqual(self.get(username='nobody').status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(username='nobody', etag='"x"').status_code, 404)
+        self.assertEqual(self.get('no-such-badge').status_code, 404)
+
+    def test_svg_standing_in_for_a_png_is_not_tagged(self):
+        with mock.patch.object(png_renderer, '_available', False):
+            response = self.get(format='png')
+        self.assertTrue(response['Content-Type'].startswith('image/svg+xml'))
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('max-age=60', response['Cache-Control'])
+
+
+class BadgeWarmupTests(BadgeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.atlantis = Country.objects.create(name='Atlantis', slug='atlantis')
+        GitHubUser.objects.filter(pk=self.user.pk).update(rank=1)
+        for rank, (login, country) in enumerate(
+            [('bob', self.country), ('carol', self.country), ('dave', self.atlantis), ('erin', self.atlantis)], 2
+        ):
+            GitHubUser.objects.create(github_username=login, country=country, rank=rank)
+        self.badges_per_user = len(BADGE_TYPES) * len(get_renderer().themes)
+
+    def test_top_users_of_each_country(self):
+        self.assertEqual(sorted(user.github_username for user in top_ranked_users(2)), ['Alice', 'bob', 'dave', 'erin'])
+        self.assertEqual([user.github_username for user in top_ranked_users(1, [self.atlantis.pk])], ['dave'])
+
+    def test_warmed_badges_are_served_without_rendering(self):
+        result = warm_badges(per_country=1)
+
+        self.assertEqual((result['users'], result['rendered']), (2, 2 * self.badges_per_user))
+        self.assertEqual((result['coverage_before'], result['coverage_after']), (0.0, 1.0))
+        with mock.patch.object(badge_render, 'render_svg') as render:
+            response = self.client.get(reverse('badges:github_badge', args=['alice', 'rank']), secure=True)
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(badge_render.render_stats()['hits'], 1)
+
+    def test_rerun_only_renders_badges_whose_data_moved(self):
+        warm_badges(per_country=1)
+        GitHubUser.objects.filter(pk=self.user.pk).update(followers=500)
+        invalidate_badges(['Alice'])
+
+        result = warm_badges(per_country=1)
+
+        # Only the stats and impact badges depend on followers
+        self.assertEqual(result['rendered'], 2 * len(get_renderer().themes))
+        self.assertEqual(result['coverage_after'], 1.0)
+
+    def test_bursts_of_ingests_queue_one_pass_per_country(self):
+        with mock.patch.object(tasks.warm_top_badges, 'apply_async') as apply_async:
+            both = sorted([self.country.pk, self.atlantis.pk])
+            self.assertEqual(schedule_warmup(both), both)
+            self.assertEqual(schedule_warmup([self.country.pk, None]), [])
+            apply_async.assert_called_once()
+
+            # A pass that ran lets the next change queue again
+            warm_badges(per_country=1, country_ids=[self.country.pk])
+            self.assertEqual(schedule_warmup([self.country.pk]), [self.country.pk])
+
+    def test_command_reports_and_optionally_resets_the_counters(self):
+        self.client.get(reverse('badges:github_badge', args=['alice', 'rank']), secure=True)
+        out = StringIO()
+
+        call_command('warm_badges', per_country=1, stdout=out)
+        self.assertIn('0 hits, 1 misses', out.getvalue())
+        self.assertEqual(badge_render.render_stats()['misses'], 1)
+
+        call_command('warm_badges', per_country=1, reset_stats=True, stdout=StringIO())
+        self.assertEqual(badge_render.render_stats()['misses'], 0)
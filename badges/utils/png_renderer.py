@@ -0,0 +1,241 @@
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Disk hits refresh an entry's mtime, which prune() ages by, at most this often
+TOUCH_SECONDS = 24 * 60 * 60
+
+
+def rasterize(svg: bytes) -> Optional[bytes]:
+    """SVG to PNG with cairosvg; runs inside a pool worker process."""
+    import cairosvg  # type: ignore
+
+    return cairosvg.svg2png(bytestring=svg)
+
+
+class PngCache:
+    """Content-addressed PNG cache: a byte-bounded in-memory LRU over an on-disk store.
+
+    Keys are SHA-256 digests of the SVG, so identical badges share one entry
+    across variants and users, and entries never go stale.
+    """
+
+    def __init__(self, max_bytes: int, directory: str = ''):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries: OrderedDict = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def _remember(self, key: str, png: bytes) -> None:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return
+            self.entries[key] = png
+            self.size += len(png)
+            while self.size > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            png = self.entries.get(key)
+            if png is not None:
+                self.entries.move_to_end(key)
+                return png
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+                modified = os.fstat(f.fileno()).st_mtime
+        except OSError:
+            return None
+        if time.time() - modified > TOUCH_SECONDS:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        self._remember(key, png)
+        return png
+
+    def set(self, key: str, png: bytes) -> None:
+        self._remember(key, png)
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(png)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not store PNG badge {key}: {e}")
+
+    def prune(self, max_age_days: int) -> int:
+        """Delete on-disk entries not read or written for ``max_age_days``; returns the number removed.
+
+        Reads refresh the mtime only once a day, so ages are accurate to a day.
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return 0
+        cutoff = time.time() - max_age_days * 24 * 60 * 60
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
+
+
+class PngRenderer:
+    """Rasterize badges in a small process pool, off the web worker's CPU.
+
+    At most ``queue_size`` renders are in flight per web process (running or
+    waiting for a pool worker). A request that cannot get a slot within
+    ``queue_wait`` seconds, or whose render exceeds ``timeout``, gets
+    ``None`` and the caller serves the SVG instead. Identical SVGs being
+    rendered concurrently share one job, and results are kept in a
+    ``PngCache``.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float, queue_wait: float,
+                 cache: PngCache, rasterize_func: Callable[[bytes], Optional[bytes]] = rasterize):
+        self.workers = workers
+        self.timeout = timeout
+        self.queue_wait = queue_wait
+        self.cache = cache
+        self.rasterize_func = rasterize_func
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.inflight: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.pool is None:
+                # spawn: forking a threaded web worker can deadlock in the child
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self.pool
+
+    def _reset_pool(self, broken: ProcessPoolExecutor) -> None:
+        with self.lock:
+            if self.pool is broken:
+                self.pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, key: str, svg: bytes) -> Optional[Future]:
+        """The in-flight job for ``key``, starting one if a queue slot frees up in time."""
+        with self.lock:
+            future = self.inflight.get(key)
+        if future is not None:
+            return future
+        if not self.slots.acquire(timeout=self.queue_wait):
+            return None
+
+        pool = self._pool()
+        try:
+            future = pool.submit(self.rasterize_func, svg)
+        except (BrokenProcessPool, RuntimeError):
+            self.slots.release()
+            self._reset_pool(pool)
+            raise
+
+        def done(finished: Future) -> None:
+            self.slots.release()
+            with self.lock:
+                self.inflight.pop(key, None)
+            if not finished.cancelled() and finished.exception() is None and finished.result():
+                self.cache.set(key, finished.result())
+
+        with self.lock:
+            self.inflight[key] = future
+        future.add_done_callback(done)
+        return future
+
+    def render(self, svg: bytes) -> Optional[bytes]:
+        key = hashlib.sha256(svg).hexdigest()
+        png = self.cache.get(key)
+        if png is not None:
+            return png
+        try:
+            future = self._submit(key, svg)
+            if future is None:
+                logger.info("PNG badge queue is full; serving SVG")
+                return None
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # The job keeps its slot until it finishes, and its result is still cached
+            logger.warning(f"PNG badge render exceeded {self.timeout}s; serving SVG")
+        except BrokenProcessPool:
+            logger.error("PNG badge pool broke; it will be restarted")
+            with self.lock:
+                pool = self.pool
+            if pool is not None:
+                self._reset_pool(pool)
+        except Exception as e:
+            logger.warning(f"PNG badge render failed: {e}")
+        return None
+
+
+_renderer: Optional[PngRenderer] = None
+_renderer_lock = threading.Lock()
+_available: Optional[bool] = None
+
+
+def png_available() -> bool:
+    return importlib.util.find_spec('cairosvg') is not None
+
+
+def get_png_cache() -> PngCache:
+    return PngCache(settings.BADGE_PNG_MEMORY_BYTES, settings.BADGE_PNG_CACHE_DIR)
+
+
+def get_png_renderer() -> PngRenderer:
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = PngRenderer(
+                    workers=settings.BADGE_PNG_WORKERS,
+                    queue_size=settings.BADGE_PNG_QUEUE_SIZE,
+                    timeout=settings.BADGE_PNG_TIMEOUT,
+                    queue_wait=settings.BADGE_PNG_QUEUE_WAIT,
+                    cache=get_png_cache(),
+                )
+    return _renderer
+
+
+def render_png(svg: bytes) -> Optional[bytes]:
+    """PNG bytes for ``svg``, or ``None`` if cairosvg is missing or the renderer is saturated."""
+    global _available
+    if _available is None:
+        _available = png_available()
+    if not _available:
+        return None
+    return get_png_renderer().render(svg)
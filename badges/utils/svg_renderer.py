@@ -1,31 +1,80 @@
-from django.template.loader import render_to_string
-from django.conf import settings
-from importlib import resources
+import hashlib
+import threading
 from pathlib import Path
+from typing import Optional
 
+from django.template import Context, Engine
 
-def _load_theme_css(theme_name: str) -> str:
-    base = Path(settings.BASE_DIR) / 'badges' / 'templates' / 'badges' / 'themes'
-    css_path = base / f'{theme_name}.css'
-    if css_path.exists():
-        return css_path.read_text(encoding='utf-8')
-    # default
-    default_path = base / 'cyberpunk.css'
-    return default_path.read_text(encoding='utf-8') if default_path.exists() else ''
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / 'templates'
+THEMES_DIR = TEMPLATES_DIR / 'badges' / 'themes'
+DEFAULT_THEME = 'cyberpunk'
+
+BADGE_TEMPLATES = {
+    'stats': 'badges/stats_badge.svg',
+    'rank': 'badges/rank_badge.svg',
+    'streak': 'badges/streak_badge.svg',
+    'langs': 'badges/langs_badge.svg',
+    'impact': 'badges/impact_badge.svg',
+    'country-top': 'badges/country_top_badge.svg',
+}
+
+
+class BadgeRenderer:
+    """Badge templates and theme CSS, loaded and compiled once per process.
+
+    Templates are compiled by a standalone template engine (no context
+    processors, no loader lookups at render time) and every theme's CSS is
+    held in memory, so a render touches neither the filesystem nor the
+    template loaders.
+    """
+
+    def __init__(self, templates_dir: Path = TEMPLATES_DIR, themes_dir: Path = THEMES_DIR):
+        self.engine = Engine(
+            dirs=[str(templates_dir)],
+            libraries={'static': 'django.templatetags.static'},
+        )
+        self.templates = {name: self.engine.get_template(name) for name in BADGE_TEMPLATES.values()}
+        # {% extends %} parents are only loaded on first render; do it now so they are cached too
+        for template in self.templates.values():
+            template.render(Context({}))
+        self.themes = {path.stem: path.read_text(encoding='utf-8') for path in sorted(themes_dir.glob('*.css'))}
+        # Changes whenever a deploy changes a template or theme, so cached renders and ETags roll over
+        digest = hashlib.sha1()
+        for path in sorted(templates_dir.rglob('*')):
+            if path.is_file():
+                digest.update(path.read_bytes())
+        self.fingerprint = digest.hexdigest()[:12]
+
+    def theme_name(self, theme_name: Optional[str]) -> str:
+        """The theme actually rendered for ``theme_name`` (unknown themes use the default)."""
+        return theme_name if theme_name in self.themes else DEFAULT_THEME
+
+    def theme_css(self, theme_name: Optional[str]) -> str:
+        return self.themes.get(theme_name) or self.themes.get(DEFAULT_THEME, '')
+
+    def render_template(self, template_name: str, context: dict) -> str:
+        template = self.templates.get(template_name) or self.engine.get_template(template_name)
+        theme_css = self.theme_css(context.get('theme_name', DEFAULT_THEME))
+        return template.render(Context({**context, 'theme_css': theme_css}))
+
+    def render(self, badge_type: str, context: dict) -> bytes:
+        """SVG bytes of one badge; ``context`` carries ``theme_name`` and the badge data."""
+        return self.render_template(BADGE_TEMPLATES[badge_type], context).encode('utf-8')
+
+
+_renderer: Optional[BadgeRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> BadgeRenderer:
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = BadgeRenderer()
+    return _renderer
 
 
 def render_svg_with_theme(template_name: str, context: dict) -> str:
-    theme_css = _load_theme_css(context.get('theme_name', 'cyberpunk'))
-    ctx = {**context, 'theme_css': theme_css}
-    return render_to_string(template_name, ctx)
-
-
-def try_render_png(svg_text: str):
-    try:
-        import cairosvg  # type: ignore
-    except Exception:
-        return None
-    try:
-        return cairosvg.svg2png(bytestring=svg_text.encode('utf-8'))
-    except Exception:
-        return None
+    return get_renderer().render_template(template_name, context)
+
@@ -1,54 +1,69 @@
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, HttpResponseNotModified, Http404
 from django.views.decorators.http import require_GET
-from django.views.decorators.cache import cache_page
 from django.utils.cache import patch_response_headers
-from django.template.loader import render_to_string
-from django.utils.module_loading import import_string
-from django.conf import settings
+from django.utils.http import parse_etags
 
-from .services.badge_data import get_badge_context
-from .utils.svg_renderer import render_svg_with_theme, try_render_png
+from .services.badge_data import badge_digest, data_digest, get_badge_data
+from .services.badge_render import BadgeOptions, badge_etag, get_rendered, render_badge, store_rendered
+from .utils.svg_renderer import BADGE_TEMPLATES
 
 CACHE_TIMEOUT = 60 * 60  # 1 hour
 
 
-@require_GET
-@cache_page(CACHE_TIMEOUT)
-def github_badge(request, username: str, badge_type: str):
-    theme = request.GET.get('theme', 'cyberpunk')
-    animated = request.GET.get('animated', 'true').lower() in ('1', 'true', 'yes', 'on')
-    fmt = request.GET.get('format', 'svg').lower()
-    text_color = request.GET.get('text', None)
+def _etag_matches(request, etag: str) -> bool:
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison. "*" is not honoured: whether the user
+    # exists is unknown until the data is loaded.
+    candidates = {tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(header)}
+    return etag in candidates
 
+
+def _load_data(username: str, badge_type: str):
     try:
-        context = get_badge_context(username=username, badge_type=badge_type, animated=animated, request=request)
+        return get_badge_data(username, badge_type)
     except Http404:
         raise
     except Exception:
         raise Http404('Badge data not available')
 
-    template_map = {
-        'stats': 'badges/stats_badge.svg',
-        'rank': 'badges/rank_badge.svg',
-        'streak': 'badges/streak_badge.svg',
-        'langs': 'badges/langs_badge.svg',
-        'impact': 'badges/impact_badge.svg',
-        'country-top': 'badges/country_top_badge.svg',
-    }
-    template_name = template_map.get(badge_type)
-    if not template_name:
+
+@require_GET
+def github_badge(request, username: str, badge_type: str):
+    if badge_type not in BADGE_TEMPLATES:
         raise Http404('Unknown badge type')
+    options = BadgeOptions.from_request(request)
+
+    # One cache read: 404s logins known to be missing, and while the data is cached
+    # answers revalidations before any lookup or render
+    digest = badge_digest(username, badge_type)
+    data = None
+    if digest is None:
+        data = _load_data(username, badge_type)
+        digest = data_digest(data)
 
-    svg = render_svg_with_theme(template_name, context={**context, 'theme_name': theme, 'animated': animated, 'text_override': text_color})
+    etag = badge_etag(username, badge_type, options, digest)
+    if _etag_matches(request, etag):
+        resp = HttpResponseNotModified()
+        resp['ETag'] = etag
+        patch_response_headers(resp, cache_timeout=CACHE_TIMEOUT)
+        return resp
 
-    if fmt == 'png':
-        png_bytes = try_render_png(svg)
-        if png_bytes is not None:
-            resp = HttpResponse(png_bytes, content_type='image/png')
-            patch_response_headers(resp, cache_timeout=CACHE_TIMEOUT)
-            return resp
-        # fallback to SVG if PNG renderer unavailable
+    rendered = get_rendered(etag)
+    complete = True
+    if rendered is not None:
+        body, content_type = rendered
+    else:
+        if data is None:
+            data = _load_data(username, badge_type)
+        body, content_type, complete = render_badge(badge_type, data, options)
+        if complete:
+            store_rendered(etag, body, content_type)
 
-    resp = HttpResponse(svg, content_type='image/svg+xml; charset=utf-8')
-    patch_response_headers(resp, cache_timeout=CACHE_TIMEOUT)
+    resp = HttpResponse(body, content_type=content_type)
+    if complete:
+        resp['ETag'] = etag
+    # An SVG standing in for a PNG that couldn't be rendered is not cached for as long
+    patch_response_headers(resp, cache_timeout=CACHE_TIMEOUT if complete else 60)
     return resp
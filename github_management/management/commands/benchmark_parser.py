@@ -0,0 +1,62 @@
+# github_management/management/commands/benchmark_parser.py
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from github_management.services.committers_parser import PARSERS, lxml_available, parse_users_table
+
+FIXTURES_DIR = Path(__file__).resolve().parents[2] / 'fixtures' / 'committers_top'
+
+# The parser used to sleep this long after every parsed row
+LEGACY_ROW_SLEEP = 0.2
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the committers.top table parsers on recorded HTML fixtures (rows/second)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixtures',
+            type=str,
+            default=str(FIXTURES_DIR),
+            help='Directory of recorded <country>_public.html pages'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='How many times each fixture is parsed per backend (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        fixtures = sorted(Path(options['fixtures']).glob('*.html'))
+        if not fixtures:
+            raise CommandError(f"No HTML fixtures found in {options['fixtures']}")
+        pages = [path.read_text(encoding='utf-8') for path in fixtures]
+        iterations = options['iterations']
+
+        backends = [p for p in PARSERS if p != 'lxml' or lxml_available()]
+        results = {}
+        for backend in backends:
+            rows = 0
+            start = time.perf_counter()
+            for _ in range(iterations):
+                for html in pages:
+                    rows += len(parse_users_table(html, parser=backend))
+            elapsed = time.perf_counter() - start
+            results[backend] = rows / elapsed if elapsed else 0.0
+
+        self.stdout.write(f"{len(fixtures)} fixtures x {iterations} iterations")
+        baseline = results['bs4']
+        for backend, rate in results.items():
+            label = 'before' if backend == 'bs4' else 'after'
+            self.stdout.write(
+                f"  {backend:<7} ({label:<6}) {rate:>12,.0f} rows/s  {rate / baseline:5.1f}x"
+            )
+        legacy_rate = 1 / (1 / baseline + LEGACY_ROW_SLEEP)
+        self.stdout.write(
+            f"  bs4 + {LEGACY_ROW_SLEEP}s/row sleep (previous pipeline): {legacy_rate:,.1f} rows/s"
+        )
+        if 'lxml' not in results:
+            self.stdout.write(self.style.WARNING("  lxml is not installed; skipped the lxml backend"))
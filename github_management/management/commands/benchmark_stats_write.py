@@ -0,0 +1,94 @@
+# github_management/management/commands/benchmark_stats_write.py
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from github_management.models import Country, GitHubUser
+from github_management.services.stats_writer import StatsWriter, apply_github_user_data
+
+
+class Command(BaseCommand):
+    help = 'Benchmark DB time for writing refreshed GitHub stats: per-row save() vs the bulk writer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Number of synthetic users to refresh (default: 1000)'
+        )
+        parser.add_argument(
+            '--change-ratio',
+            type=float,
+            default=0.3,
+            help='Fraction of users whose stats changed since the last refresh (default: 0.3)'
+        )
+
+    def _fake_payload(self, user, changed, rng):
+        followers = user.followers + rng.randint(1, 50) if changed else user.followers
+        data = {
+            'followers': followers,
+            'following': user.following,
+            'contributions': {'last_year': user.contributions_last_year},
+            'public_repos': user.public_repos,
+        }
+        if changed and rng.random() < 0.5:
+            data['contributions'] = {'last_year': user.contributions_last_year + rng.randint(1, 20)}
+        return data
+
+    def _run(self, label, count, change_ratio, write):
+        """Create ``count`` users, refresh them with ``write`` and roll everything back.
+
+        The run happens in one transaction that is always rolled back, so an
+        interrupted or concurrent run leaves no rows behind. Per-row commits
+        are therefore not part of the measurement, only the queries.
+        """
+        rng = random.Random(42)
+        # Unique per run, so concurrent runs don't collide on the unique columns
+        tag = uuid.uuid4().hex[:8]
+        with transaction.atomic():
+            country = Country.objects.create(name=f'Benchmark {tag}', slug=f'bench-stats-{tag}')
+            GitHubUser.objects.bulk_create([
+                GitHubUser(github_username=f'bench-stats-{tag}-{i}', country=country, followers=i,
+                           contributions_last_year=i)
+                for i in range(count)
+            ])
+            users = list(GitHubUser.objects.filter(country=country))
+            payloads = {user.pk: self._fake_payload(user, rng.random() < change_ratio, rng) for user in users}
+
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                write(users, payloads)
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+
+        per_thousand = elapsed / count * 1000
+        self.stdout.write(
+            f"  {label:<10} {per_thousand * 1000:>9.1f} ms / 1,000 users  {len(queries):>6} queries"
+        )
+        return per_thousand
+
+    def handle(self, *args, **options):
+        count = options['users']
+        change_ratio = options['change_ratio']
+
+        def per_row(users, payloads):
+            for user in users:
+                changed = apply_github_user_data(user, payloads[user.pk])
+                if changed:
+                    user.save(update_fields=['fetched_at', *changed])
+
+        def bulk(users, payloads):
+            writer = StatsWriter(GitHubUser)
+            for user in users:
+                writer.add(user, apply_github_user_data(user, payloads[user.pk]))
+            writer.flush()
+
+        self.stdout.write(f"{count} users, {change_ratio:.0%} changed ({connection.vendor})")
+        before = self._run('per-row', count, change_ratio, per_row)
+        after = self._run('bulk', count, change_ratio, bulk)
+        self.stdout.write(f"  speedup    {before / after:.1f}x")
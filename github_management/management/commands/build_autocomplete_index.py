@@ -0,0 +1,12 @@
+# github_management/management/commands/build_autocomplete_index.py
+from django.core.management.base import BaseCommand
+
+from github_management.services.autocomplete import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the memory-mapped login autocomplete index from GitHubUser and internal User rows'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} logins"))
@@ -0,0 +1,70 @@
+# github_management/management/commands/ingest_countries.py
+from django.core.management.base import BaseCommand, CommandError
+
+from github_management.models import Country
+from github_management.services.ingestion import CountryIngestionEngine
+
+
+class Command(BaseCommand):
+    help = 'Concurrently fetch committers.top users for all (or selected) countries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--countries',
+            type=str,
+            default='',
+            help='Comma-separated list of country slugs (default: all countries)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Size of the fetch thread pool (default: settings.INGEST_MAX_WORKERS)'
+        )
+        parser.add_argument(
+            '--per-host',
+            type=int,
+            default=None,
+            help='Maximum concurrent requests per host (default: settings.INGEST_PER_HOST_LIMIT)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Parse and store pages even when their content is unchanged'
+        )
+        parser.add_argument(
+            '--base-url',
+            type=str,
+            default=None,
+            help='Override the committers.top base URL (e.g. a local fake server)'
+        )
+
+    def handle(self, *args, **options):
+        countries = Country.objects.all()
+        slugs = [s.strip() for s in options['countries'].split(',') if s.strip()]
+        if slugs:
+            countries = countries.filter(slug__in=slugs)
+        if not countries.exists():
+            raise CommandError('No matching countries found. Run fetch_countries first.')
+
+        def report(progress):
+            self.stdout.write(
+                f"[{progress.completed + progress.failed}/{progress.total}] "
+                f"{progress.users} users, {progress.unchanged} unchanged, "
+                f"{progress.failed} failed, {progress.elapsed:.1f}s"
+            )
+
+        engine = CountryIngestionEngine(
+            max_workers=options['workers'],
+            per_host_limit=options['per_host'],
+            base_url=options['base_url'],
+            force=options['force'],
+            progress_callback=report,
+        )
+        progress = engine.run(countries)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {progress.users} users from {progress.completed} countries in {progress.elapsed:.1f}s"
+        ))
+        if progress.failed_countries:
+            self.stderr.write(self.style.ERROR(f"Failed: {', '.join(progress.failed_countries)}"))
@@ -0,0 +1,31 @@
+# github_management/management/commands/rebuild_leaderboards.py
+from django.core.management.base import BaseCommand, CommandError
+
+from github_management.models import Country
+from github_management.services.leaderboard import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Materialize country ranks, global ranks and percentiles for the leaderboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--countries',
+            type=str,
+            default='',
+            help='Comma-separated country slugs to re-rank (default: all countries)'
+        )
+
+    def handle(self, *args, **options):
+        slugs = [s.strip() for s in options['countries'].split(',') if s.strip()]
+        country_ids = None
+        if slugs:
+            country_ids = list(Country.objects.filter(slug__in=slugs).values_list('id', flat=True))
+            if len(country_ids) != len(slugs):
+                raise CommandError(f"Unknown country slug in: {', '.join(slugs)}")
+
+        result = rebuild_leaderboards(country_ids=country_ids, full=not slugs)
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-ranked {result['countries']} countries: {result['country_rows']} country ranks "
+            f"and {result['global_rows']} global ranks updated"
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_management', '0006_githubuser_account_type_githubuser_bio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='country',
+            name='page_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_management', '0007_country_page_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='githubuser',
+            name='page_views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='githubuser',
+            index=models.Index(fields=['fetched_at'], name='github_mana_fetched_2b619c_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BRIN_INDEX = 'github_mana_snapshot_day_brin'
+
+
+def create_brin_index(apps, schema_editor):
+    # Snapshot rows arrive in day order, so a BRIN index gives cheap range scans on
+    # very large tables. Only PostgreSQL has BRIN; other backends use the B-tree indexes.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {BRIN_INDEX} ON github_management_githubusersnapshot USING brin (day)'
+    )
+
+
+def drop_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {BRIN_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_management', '0008_githubuser_page_views_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountryStatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('followers', models.BigIntegerField(default=0)),
+                ('contributions_last_year', models.BigIntegerField(default=0)),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats_snapshots', to='github_management.country')),
+            ],
+            options={
+                'ordering': ['country', 'day'],
+                'constraints': [models.UniqueConstraint(fields=('country', 'day'), name='unique_country_stats_snapshot_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GitHubUserSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('followers', models.PositiveIntegerField(default=0)),
+                ('following', models.PositiveIntegerField(default=0)),
+                ('contributions_last_year', models.PositiveIntegerField(default=0)),
+                ('rank', models.PositiveIntegerField(default=0)),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_snapshots', to='github_management.country')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='github_management.githubuser')),
+            ],
+            options={
+                'ordering': ['user', 'day'],
+                'indexes': [models.Index(fields=['country', 'day'], name='github_mana_country_81ce2c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_github_user_snapshot_day')],
+            },
+        ),
+        migrations.RunPython(create_brin_index, drop_brin_index),
+    ]
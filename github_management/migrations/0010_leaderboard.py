@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_management', '0009_stats_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='country',
+            name='leaderboard_size',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='country',
+            name='leaderboard_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='githubuser',
+            name='country_percentile',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='githubuser',
+            name='country_rank',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='githubuser',
+            name='global_rank',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='githubuser',
+            index=models.Index(fields=['country', 'country_rank'], name='github_mana_country_13a45f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='githubuser',
+            index=models.Index(fields=['global_rank'], name='github_mana_global__a0414f_idx'),
+        ),
+    ]
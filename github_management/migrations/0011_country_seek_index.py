@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_management', '0010_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='githubuser',
+            index=models.Index(fields=['country', '-contributions_last_year', 'id'], name='github_user_country_seek_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_EXPR = "lower(coalesce(github_username, '') || ' ' || coalesce(first_name, '') || ' ' || coalesce(last_name, ''))"
+TABLE = 'github_management_githubuser'
+FTS_TABLE = 'github_user_search'
+
+
+def create_search_index(apps, schema_editor):
+    # PostgreSQL: trigram GIN index for substring search, plus a pattern index for
+    # short login prefixes. SQLite: an FTS5 trigram table kept in sync by triggers.
+    # Other backends fall back to unindexed icontains.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS github_user_search_trgm_idx ON {TABLE} '
+            f'USING gin (({SEARCH_EXPR}) gin_trgm_ops)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS github_user_login_prefix_idx ON {TABLE} '
+            f'(lower(github_username) text_pattern_ops)'
+        )
+    elif vendor == 'sqlite':
+        columns = 'github_username, first_name, last_name'
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({columns}, "
+            f"content='{TABLE}', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+            f"VALUES (new.id, new.github_username, new.first_name, new.last_name); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, old.github_username, old.first_name, old.last_name); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, old.github_username, old.first_name, old.last_name); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+            f"VALUES (new.id, new.github_username, new.first_name, new.last_name); END"
+        )
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS github_user_search_trgm_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS github_user_login_prefix_idx')
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_management', '0012_unfollow_job'),
+    ]
+
+    operations = [
+        # Creating pg_trgm needs CREATE privilege on the database; where the
+        # migration role lacks it, install the extension beforehand as a
+        # superuser (CREATE EXTENSION pg_trgm). No-op on other backends.
+        TrigramExtension(),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
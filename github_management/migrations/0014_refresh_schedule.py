@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def schedule_existing_rows(apps, schema_editor):
+    # Existing rows are due in the order they were last fetched, oldest first
+    GitHubUser = apps.get_model('github_management', 'GitHubUser')
+    GitHubUser.objects.update(refresh_due_at=models.F('fetched_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_management', '0013_user_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='githubuser',
+            name='refresh_due_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='githubuser',
+            name='refresh_failures',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='githubuser',
+            index=models.Index(fields=['refresh_due_at'], name='github_mana_refresh_0cc142_idx'),
+        ),
+        migrations.RunPython(schedule_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from importlib import import_module
+
+from django.db import migrations
+
+search_index = import_module('github_management.migrations.0013_user_search_index')
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite rebuilds a table to add columns (0014), dropping its triggers; put
+    # the FTS5 triggers back and rebuild the index from the table
+    if schema_editor.connection.vendor == 'sqlite':
+        search_index.create_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('github_management', '0014_refresh_schedule'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
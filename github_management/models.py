@@ -16,6 +16,11 @@ class Country(models.Model):
     last_updated = models.DateTimeField(null=True, blank=True)
     user_count = models.PositiveIntegerField(default=0)
     is_fetching = models.BooleanField(default=False)
+    # sha256 of the last committers.top page that was parsed and stored
+    page_hash = models.CharField(max_length=64, blank=True, default='')
+    # Materialized by services.leaderboard after each ingest/refresh
+    leaderboard_size = models.PositiveIntegerField(default=0)
+    leaderboard_updated_at = models.DateTimeField(null=True, blank=True)
     
     def get_absolute_url(self):
         return reverse('github_management:country_detail', kwargs={'slug': self.slug})
@@ -34,6 +39,12 @@ class GitHubUser(BaseUser):
     """Model to store GitHub user information and their statistics."""
     country = models.ForeignKey('Country', on_delete=models.CASCADE, related_name='users')
     rank = models.PositiveIntegerField(default=0)
+    # Detail-page views flushed from the Redis buffer; feeds the refresh priority
+    page_views = models.PositiveIntegerField(default=0)
+    # Materialized leaderboard positions (see services.leaderboard)
+    country_rank = models.PositiveIntegerField(null=True, blank=True)
+    global_rank = models.PositiveIntegerField(null=True, blank=True)
+    country_percentile = models.FloatField(null=True, blank=True)
     
     objects = GitHubUserManager()
     
@@ -43,6 +54,12 @@ class GitHubUser(BaseUser):
         indexes = [
             models.Index(fields=['country']),
             models.Index(fields=['rank']),
+            models.Index(fields=['fetched_at']),
+            models.Index(fields=['refresh_due_at']),
+            models.Index(fields=['country', 'country_rank']),
+            models.Index(fields=['global_rank']),
+            # Keyset pagination of country pages in leaderboard order
+            models.Index(fields=['country', '-contributions_last_year', 'id'], name='github_user_country_seek_idx'),
         ]
     
     def __str__(self):
@@ -69,6 +86,7 @@ class GitHubFollowAction(models.Model):
         PENDING = 'pending', 'Pending'
         FOLLOWED_BACK = 'followed_back', 'Followed Back'
         NOT_FOLLOWED_BACK = 'not_followed_back', 'Not Followed Back'
+        UNFOLLOWED = 'unfollowed', 'Unfollowed'
     
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -125,43 +143,142 @@ class GitHubFollowAction(models.Model):
     
     @classmethod
     def follow_github_user(cls, user, github_user):
-        """Create a follow action for a GitHub user."""
-        if not user or not user.is_authenticated or not github_user:
+        """Follow a GitHub user; returns the follow action, or ``None`` if GitHub refused."""
+        if not user or not user.is_authenticated or not github_user or not user.github_access_token:
             return None
-            
-        # Check if already following
-        existing = cls.objects.filter(
-            user=user,
-            github_user=GitHubUser.objects.get(id=github_user.id)
-        ).first()
-        
-        if existing:
-            return existing
-            
-        # Create new follow action
-        follow_action = cls.objects.create(
-            user=user,
-            github_user=GitHubUser.objects.get(id=github_user.id),
-            status=cls.FollowStatus.PENDING
-        )
-        GitHubService.follow_user_on_github(user, GitHubUser.objects.get(id=github_user.id).github_username)
-        return follow_action
+        from .services.bulk_follow import bulk_follow
+
+        result = bulk_follow(user, [github_user], workers=1)[0]
+        if not result.ok:
+            return None
+        return cls.objects.filter(user=user, github_user=github_user).first()
     
     @classmethod
     def unfollow_non_followers(cls, user, days=3):
-        """Unfollow users who haven't followed back after specified days."""
-        cutoff_date = timezone.now() - timedelta(days=days)
-        
-        # Get pending follow actions older than specified days
-        pending_actions = cls.objects.filter(
-            user=user,
-            status=cls.FollowStatus.PENDING,
-            followed_at__lt=cutoff_date
-        )
-        
-        unfollowed_count = 0
-        for action in pending_actions:
-            GitHubService.unfollow_user_on_github(user, action.github_user.github_username)
-            unfollowed_count += 1
-            
-        return unfollowed_count
\ No newline at end of file
+        """Unfollow users who haven't followed back after specified days.
+
+        Runs an ``UnfollowJob`` inline; views enqueue the job instead.
+        """
+        from .services.bulk_unfollow import create_unfollow_job, run_unfollow_job
+
+        job = create_unfollow_job(user, days)
+        run_unfollow_job(job)
+        return job.unfollowed
+
+
+class UnfollowJob(models.Model):
+    """A background run of unfollow-non-followers for one user.
+
+    The candidate actions are snapshotted into ``action_ids`` when the job is
+    created. ``processed`` is the position in that list: actions before it are
+    finished, and counters are saved after every batch, so an interrupted job
+    continues where it stopped when it is run again.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='unfollow_jobs'
+    )
+    days = models.PositiveIntegerField(default=3)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    action_ids = models.JSONField(default=list)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    unfollowed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    # Candidates followed back or removed before their turn came
+    skipped = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    ACTIVE = (Status.QUEUED, Status.RUNNING)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} unfollow job ({self.status}, {self.processed}/{self.total})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'is_active': self.is_active,
+            'days': self.days,
+            'total': self.total,
+            'processed': self.processed,
+            'unfollowed': self.unfollowed,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'percent': round(100 * self.processed / self.total) if self.total else 100,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class GitHubUserSnapshot(models.Model):
+    """Append-only daily history of a GitHub user's stats.
+
+    A row is written only when a refresh changes one of the tracked values,
+    so the series is sparse: a user's value on any day is the value of the
+    latest snapshot on or before it. At most one row exists per user and day.
+    """
+    user = models.ForeignKey(
+        GitHubUser,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        db_index=False,  # Covered by the (user, day) unique index
+    )
+    # Denormalized so country trends never join the users table
+    country = models.ForeignKey('Country', on_delete=models.CASCADE, related_name='user_snapshots')
+    day = models.DateField()
+    followers = models.PositiveIntegerField(default=0)
+    following = models.PositiveIntegerField(default=0)
+    contributions_last_year = models.PositiveIntegerField(default=0)
+    rank = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['user', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_github_user_snapshot_day'),
+        ]
+        indexes = [
+            models.Index(fields=['country', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.day}"
+
+
+class CountryStatsSnapshot(models.Model):
+    """One aggregate row per country and day, so country trends read ~365 rows per year."""
+    country = models.ForeignKey('Country', on_delete=models.CASCADE, related_name='stats_snapshots')
+    day = models.DateField()
+    users = models.PositiveIntegerField(default=0)
+    followers = models.BigIntegerField(default=0)
+    contributions_last_year = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['country', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['country', 'day'], name='unique_country_stats_snapshot_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.country_id} @ {self.day}"
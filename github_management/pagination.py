@@ -0,0 +1,226 @@
+import base64
+import datetime
+import json
+import math
+from typing import Any, Callable, List, Optional, Sequence
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """``DjangoJSONEncoder`` that keeps microseconds; a millisecond cursor would skip rows in the same millisecond."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat(timespec='microseconds')
+        return super().default(o)
+
+
+class KeysetPage:
+    """One page of a keyset listing; quacks enough like ``django.core.paginator.Page`` for templates."""
+
+    def __init__(self, object_list: List[Any], paginator: 'KeysetPaginator', has_next: bool,
+                 has_previous: bool, start_index: Optional[int] = None):
+        # Cursors come from the paginated rows, which ``transform`` may map to other objects
+        self.rows = object_list
+        self.object_list = paginator.transform(object_list) if paginator.transform else object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self._start_index = start_index
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        if not self.has_next_page:
+            return None
+        return self.paginator.encode_cursor(self.rows[-1], 'next')
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        if not self.has_previous_page:
+            return None
+        return self.paginator.encode_cursor(self.rows[0], 'prev')
+
+    @property
+    def number(self) -> Optional[int]:
+        if self._start_index is None:
+            return None
+        return (self._start_index - 1) // self.paginator.per_page + 1
+
+    def previous_page_number(self) -> Optional[int]:
+        return self.number - 1 if self.number else None
+
+    def next_page_number(self) -> Optional[int]:
+        return self.number + 1 if self.number else None
+
+    def start_index(self) -> Optional[int]:
+        return self._start_index
+
+    def end_index(self) -> Optional[int]:
+        if self._start_index is None:
+            return None
+        return self._start_index + len(self.object_list) - 1
+
+
+class KeysetPaginator:
+    """Seek-method pagination over a fixed ordering.
+
+    Pages are addressed by opaque cursors holding the ordering values of the
+    last (or first) row shown, so each page costs one index range scan no
+    matter how deep it is, and rows inserted meanwhile never shift a page.
+
+    Args:
+        queryset: Unordered queryset to paginate
+        ordering: Field names (``-`` for descending); the last one must be unique
+        per_page: Rows per page
+        count: Estimated total, used only for display (``None`` if unknown)
+        position: Optional callable returning an object's 1-based position,
+            used to show page numbers for cursor pages
+        anchor: Optional callable ``offset -> object`` locating the row just
+            before a ``?page=`` offset cheaply; defaults to an OFFSET lookup
+        transform: Optional callable mapping a page's rows to the objects
+            shown (e.g. relationship rows to users)
+    """
+
+    def __init__(self, queryset, ordering: Sequence[str], per_page: int, count: Optional[int] = None,
+                 position: Optional[Callable[[Any], Optional[int]]] = None,
+                 anchor: Optional[Callable[[int], Any]] = None,
+                 transform: Optional[Callable[[List[Any]], List[Any]]] = None):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.count = count
+        self.position = position
+        self.anchor = anchor
+        self.transform = transform
+
+    @property
+    def num_pages(self) -> Optional[int]:
+        if self.count is None:
+            return None
+        return max(1, math.ceil(self.count / self.per_page))
+
+    @property
+    def page_range(self):
+        return range(1, (self.num_pages or 1) + 1)
+
+    def _fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _output_field(self, name):
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.queryset.query.annotations[name].output_field
+
+    def _values(self, obj) -> list:
+        return [getattr(obj, 'pk' if name == 'pk' else name) for name in self._fields()]
+
+    def encode_cursor(self, obj, direction: str) -> str:
+        payload = json.dumps({'d': direction, 'k': self._values(obj)}, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor: str):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            direction, raw = payload['d'], payload['k']
+            if direction not in ('next', 'prev') or len(raw) != len(self.ordering):
+                raise ValueError('cursor does not match this listing')
+            values = [
+                self._output_field('id' if name == 'pk' else name).to_python(value)
+                for name, value in zip(self._fields(), raw)
+            ]
+        except Exception as e:
+            raise InvalidCursor(str(e)) from e
+        return direction, values
+
+    def _seek(self, values, forward: bool) -> Q:
+        """Rows strictly after (``forward``) or before ``values`` in the ordering."""
+        condition = Q()
+        equal = Q()
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def _start_of(self, first) -> Optional[int]:
+        return self.position(first) if (self.position and first is not None) else None
+
+    def page_after(self, values=None) -> KeysetPage:
+        qs = self.queryset.order_by(*self.ordering)
+        if values is not None:
+            qs = qs.filter(self._seek(values, forward=True))
+        rows = list(qs[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        start = self._start_of(rows[0] if rows else None)
+        return KeysetPage(rows, self, has_next=has_next, has_previous=values is not None, start_index=start)
+
+    def page_before(self, values) -> KeysetPage:
+        qs = self.queryset.order_by(*self._reversed_ordering()).filter(self._seek(values, forward=False))
+        rows = list(qs[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = list(reversed(rows[:self.per_page]))
+        start = self._start_of(rows[0] if rows else None)
+        return KeysetPage(rows, self, has_next=True, has_previous=has_previous, start_index=start)
+
+    def page_number(self, number: int) -> KeysetPage:
+        """Compatibility path for ``?page=N`` links."""
+        offset = (max(1, number) - 1) * self.per_page
+        before = None
+        if offset:
+            if self.anchor:
+                before = self.anchor(offset)
+            else:
+                before = next(iter(self.queryset.order_by(*self.ordering)[offset - 1:offset]), None)
+            if before is None:
+                # Past the end: show the first page rather than an empty one
+                offset = 0
+        page = self.page_after(self._values(before) if before is not None else None)
+        if page._start_index is None:
+            page._start_index = offset + 1
+        return page
+
+    def get_page(self, cursor: Optional[str] = None, page: Optional[str] = None) -> KeysetPage:
+        """Resolve request parameters: a cursor wins, then ``?page=``, then the first page."""
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                return self.page_number(1)
+            return self.page_after(values) if direction == 'next' else self.page_before(values)
+        try:
+            return self.page_number(int(page or 1))
+        except (TypeError, ValueError):
+            return self.page_number(1)
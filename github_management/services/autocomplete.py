@@ -0,0 +1,281 @@
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'GHAC'
+VERSION = 1
+HEADER = struct.Struct('<4sII')  # magic, version, record count
+SEP = b'\x00'
+FIELDS = ('github_username', 'name', 'avatar_url', 'url', 'country')
+
+BASE = 'logins.idx'
+DELTA = 'logins.delta.idx'
+# Seconds between checks for a replaced index file
+RELOAD_SECONDS = 1.0
+
+
+class AutocompleteIndex:
+    """Read-only view of one index file: lowercase logins sorted bytewise.
+
+    Layout: a header, ``count + 1`` native ``uint64`` record offsets, then the
+    records, each ``key NUL login NUL name NUL avatar NUL url NUL country``.
+    The file is memory-mapped, so every worker process shares the same
+    page-cache copy, and a prefix lookup is a binary search over the offsets.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns)
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} autocomplete index")
+        table_end = HEADER.size + 8 * (self.count + 1)
+        self.offsets = memoryview(self.mm)[HEADER.size:table_end].cast('Q')
+        self.data = table_end
+
+    def close(self) -> None:
+        self.offsets.release()
+        self.mm.close()
+
+    def _bounds(self, i: int) -> Tuple[int, int]:
+        return self.data + self.offsets[i], self.data + self.offsets[i + 1]
+
+    def key(self, i: int) -> bytes:
+        start, end = self._bounds(i)
+        return self.mm[start:self.mm.find(SEP, start, end)]
+
+    def record(self, i: int) -> bytes:
+        start, end = self._bounds(i)
+        return self.mm[start:end]
+
+    def lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def prefix(self, prefix: bytes, limit: int) -> Iterator[Tuple[bytes, bytes]]:
+        """Up to ``limit`` ``(key, record)`` pairs whose key starts with ``prefix``, in key order."""
+        i = self.lower_bound(prefix)
+        while i < self.count and limit > 0:
+            key = self.key(i)
+            if not key.startswith(prefix):
+                return
+            yield key, self.record(i)
+            i += 1
+            limit -= 1
+
+    def items(self) -> Iterator[Tuple[bytes, bytes]]:
+        for i in range(self.count):
+            yield self.key(i), self.record(i)
+
+
+def _clean(value) -> bytes:
+    return (value or '').replace('\x00', '').encode()
+
+
+def _encode(login: str, name: str, avatar_url: str, url: str, country: str) -> Tuple[bytes, bytes]:
+    key = login.lower().encode()
+    return key, SEP.join((key, _clean(login), _clean(name), _clean(avatar_url), _clean(url), _clean(country)))
+
+
+def _decode(record: bytes) -> Dict[str, str]:
+    return dict(zip(FIELDS, (part.decode() for part in record.split(SEP)[1:])))
+
+
+def _write(path: str, records: Dict[bytes, bytes]) -> None:
+    """Write ``{key: record}`` sorted by key, replacing ``path`` atomically."""
+    keys = sorted(records)
+    offsets = array('Q', [0])
+    for key in keys:
+        offsets.append(offsets[-1] + len(records[key]))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys)))
+        offsets.tofile(f)
+        for key in keys:
+            f.write(records[key])
+    os.replace(tmp, path)
+
+
+def _path(name: str) -> str:
+    return os.path.join(settings.AUTOCOMPLETE_INDEX_DIR, name)
+
+
+@contextmanager
+def _writer_lock():
+    """Serialize index writers across processes (rebuilds and ingest patches)."""
+    os.makedirs(settings.AUTOCOMPLETE_INDEX_DIR, exist_ok=True)
+    with open(_path('.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _github_user_records(users) -> Dict[bytes, bytes]:
+    """Index records for a ``GitHubUser`` queryset (one query, no model instances)."""
+    placeholder = '__login__'
+    url_template = reverse('github_management:user_detail', kwargs={'github_username': placeholder})
+    records = {}
+    rows = users.filter(github_username__isnull=False).values_list(
+        'github_username', 'first_name', 'middle_name', 'last_name', 'avatar_url', 'country__name'
+    )
+    for login, first, middle, last, avatar_url, country in rows.iterator(chunk_size=5000):
+        # Same formatting as BaseUser.full_name
+        name = f"{first or ''} {middle or ''} {last or ''}".strip()
+        key, record = _encode(login, name, avatar_url, url_template.replace(placeholder, login), country)
+        records[key] = record
+    return records
+
+
+def _internal_user_records() -> Dict[bytes, bytes]:
+    from users.models import User
+
+    records = {}
+    rows = User.objects.filter(is_internal=True, github_username__isnull=False).values_list(
+        'github_username', 'first_name', 'middle_name', 'last_name', 'avatar_url', 'profile_url'
+    )
+    for login, first, middle, last, avatar_url, profile_url in rows.iterator(chunk_size=5000):
+        name = f"{first or ''} {middle or ''} {last or ''}".strip()
+        key, record = _encode(login, name, avatar_url, profile_url or f"https://github.com/{login}", '')
+        records[key] = record
+    return records
+
+
+def rebuild_index() -> int:
+    """Write the base index from ``GitHubUser`` and internal ``User`` rows and drop the delta.
+
+    Returns the number of logins indexed.
+    """
+    from ..models import GitHubUser
+
+    with _writer_lock():
+        records = _internal_user_records()
+        # Leaderboard users win: they have a country and a detail page
+        records.update(_github_user_records(GitHubUser.objects.all()))
+        _write(_path(BASE), records)
+        if os.path.exists(_path(DELTA)):
+            os.remove(_path(DELTA))
+    logger.info(f"Autocomplete index rebuilt with {len(records)} logins")
+    return len(records)
+
+
+def patch_index(users) -> int:
+    """Upsert the logins of a ``GitHubUser`` queryset into the delta index.
+
+    The delta is small and rewritten whole; once it grows past
+    ``AUTOCOMPLETE_DELTA_MAX`` records it is folded into a full rebuild.
+    Returns the delta's size (0 after a rebuild).
+    """
+    records = _github_user_records(users)
+    if not records:
+        return 0
+    if not os.path.exists(_path(BASE)):
+        rebuild_index()
+        return 0
+
+    with _writer_lock():
+        delta = {}
+        if os.path.exists(_path(DELTA)):
+            index = AutocompleteIndex(_path(DELTA))
+            try:
+                delta = dict(index.items())
+            finally:
+                index.close()
+        delta.update(records)
+        if len(delta) <= settings.AUTOCOMPLETE_DELTA_MAX:
+            _write(_path(DELTA), delta)
+            return len(delta)
+    rebuild_index()
+    return 0
+
+
+def patch_countries(country_ids: Iterable[int]) -> None:
+    """Patch the index after an ingest; a failure is logged, never raised into the ingest."""
+    from ..models import GitHubUser
+
+    try:
+        patch_index(GitHubUser.objects.filter(country_id__in=list(country_ids)))
+    except OSError as e:
+        logger.warning(f"Autocomplete index patch failed: {e}")
+
+
+# Per-process mapped indexes: {name: (index or None, checked_at)}
+_open: Dict[str, Tuple[Optional[AutocompleteIndex], float]] = {}
+_open_lock = threading.Lock()
+
+
+def _index(name: str) -> Optional[AutocompleteIndex]:
+    """The mapped index file ``name``, remapped when a writer has replaced it."""
+    now = time.monotonic()
+    index, checked_at = _open.get(name, (None, 0.0))
+    if now - checked_at < RELOAD_SECONDS:
+        return index
+    with _open_lock:
+        index, checked_at = _open.get(name, (None, 0.0))
+        if now - checked_at < RELOAD_SECONDS:
+            return index
+        try:
+            stat = os.stat(_path(name))
+            identity = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            identity = None
+        if identity is None:
+            index = None
+        elif index is None or index.identity != identity:
+            try:
+                index = AutocompleteIndex(_path(name))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not map autocomplete index {name}: {e}")
+                index = None
+        # Replaced mappings are left to the garbage collector; a concurrent reader may still hold one
+        _open[name] = (index, now)
+        return index
+
+
+def complete(prefix: str, limit: int = 10) -> Optional[List[Dict[str, str]]]:
+    """Users whose login starts with ``prefix``, in login order, shaped like ``search_result``.
+
+    Returns ``None`` when no index has been built, so callers can fall back
+    to the database.
+    """
+    base, delta = _index(BASE), _index(DELTA)
+    if base is None and delta is None:
+        return None
+    key = prefix.strip().lower().encode()
+    if not key:
+        return []
+    matches = {}
+    for index in (base, delta):  # delta entries override the base
+        if index is not None:
+            matches.update(index.prefix(key, limit))
+    return [_decode(matches[k]) for k in sorted(matches)[:limit]]
+
+
+def index_stats() -> Dict[str, int]:
+    base, delta = _index(BASE), _index(DELTA)
+    return {
+        'base': base.count if base else 0,
+        'delta': delta.count if delta else 0,
+    }
@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from django.conf import settings
+from django.db.models.functions import Lower
+
+from users.services.github_service import GitHubFollowClient
+from ..models import GitHubFollowAction, GitHubUser
+
+logger = logging.getLogger(__name__)
+
+
+class FollowOutcome:
+    FOLLOWED = 'followed'
+    ALREADY_FOLLOWING = 'already_following'
+    NOT_FOUND = 'not_found'
+    RATE_LIMITED = 'rate_limited'
+    FAILED = 'failed'
+
+
+@dataclass
+class FollowResult:
+    github_user_id: int
+    login: str
+    outcome: str
+    detail: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome in (FollowOutcome.FOLLOWED, FollowOutcome.ALREADY_FOLLOWING)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` requests per second, bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# One bucket per access token per process, shared by concurrent bulk follows of the same user
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(access_token: str) -> TokenBucket:
+    key = sha256(access_token.encode()).hexdigest()[:12]
+    with _buckets_lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(settings.GITHUB_FOLLOW_RATE, settings.GITHUB_FOLLOW_BURST)
+        return _buckets[key]
+
+
+class BulkFollower:
+    """Follow many GitHub users for one account.
+
+    Follow actions for all new targets are inserted with a single
+    ``bulk_create``; the GitHub PUTs then run concurrently on the token's
+    keep-alive session, paced by its bucket, with no transaction held open.
+    Targets GitHub refused have their action removed again so they stay
+    eligible, and successful follows are mirrored into ``UserFollowing``.
+    """
+
+    def __init__(self, user, workers: Optional[int] = None):
+        if not user.github_access_token:
+            raise ValueError(f"{user} has no GitHub access token")
+        self.user = user
+        self.workers = workers or settings.GITHUB_FOLLOW_WORKERS
+        self.client = GitHubFollowClient(user.github_access_token)
+        self.bucket = bucket_for(user.github_access_token)
+        self.stop = threading.Event()
+
+    def _own_login(self) -> str:
+        try:
+            return self.client.login().lower()
+        except (requests.RequestException, KeyError, ValueError):
+            return ''
+
+    def _put(self, target: GitHubUser) -> FollowResult:
+        if self.stop.is_set():
+            return FollowResult(target.pk, target.github_username, FollowOutcome.RATE_LIMITED, 'skipped after rate limit')
+        self.bucket.acquire()
+        try:
+            response = self.client.follow(target.github_username)
+        except requests.RequestException as e:
+            return FollowResult(target.pk, target.github_username, FollowOutcome.FAILED, str(e))
+
+        if response.status_code == 204:
+            return FollowResult(target.pk, target.github_username, FollowOutcome.FOLLOWED)
+        if response.status_code == 404:
+            return FollowResult(
+                target.pk, target.github_username, FollowOutcome.NOT_FOUND,
+                "user not found or token lacks the 'user:follow' scope",
+            )
+        if response.status_code in (403, 429):
+            # Primary or secondary rate limit: don't burn the rest of the batch
+            self.stop.set()
+            return FollowResult(target.pk, target.github_username, FollowOutcome.RATE_LIMITED, response.text[:200])
+        return FollowResult(
+            target.pk, target.github_username, FollowOutcome.FAILED,
+            f"{response.status_code}: {response.text[:200]}",
+        )
+
+    def _mirror(self, followed: List[FollowResult]) -> None:
+        """Record successful follows as ``UserFollowing`` rows in bulk."""
+        from users.models import User, UserFollowing
+
+        if not followed:
+            return
+        logins = {result.login.lower(): result.login for result in followed}
+        existing = dict(
+            User.objects.annotate(login=Lower('github_username'))
+            .filter(login__in=logins)
+            .values_list('login', 'pk')
+        )
+        missing = [login for lowered, login in logins.items() if lowered not in existing]
+        if missing:
+            avatars = dict(
+                GitHubUser.objects.filter(github_username__in=missing).values_list('github_username', 'avatar_url')
+            )
+            User.objects.bulk_create([
+                User(
+                    email=f"{login}@users.noreply.github.com",
+                    github_username=login,
+                    avatar_url=avatars.get(login) or '',
+                    password='!',
+                    is_active=False,
+                    is_internal=False,
+                )
+                for login in missing
+            ], ignore_conflicts=True)
+            existing = dict(
+                User.objects.annotate(login=Lower('github_username'))
+                .filter(login__in=logins)
+                .values_list('login', 'pk')
+            )
+        UserFollowing.objects.bulk_create([
+            UserFollowing(from_user=self.user, to_user_id=pk)
+            for pk in existing.values()
+            if pk != self.user.pk
+        ], ignore_conflicts=True)
+
+    def follow(self, targets: Iterable[GitHubUser]) -> List[FollowResult]:
+        """Follow ``targets``; returns one result per distinct target."""
+        targets = list({target.pk: target for target in targets}.values())
+        if not targets:
+            return []
+
+        already = set(
+            GitHubFollowAction.objects.filter(user=self.user, github_user__in=targets)
+            .values_list('github_user_id', flat=True)
+        )
+        results = [
+            FollowResult(target.pk, target.github_username, FollowOutcome.ALREADY_FOLLOWING)
+            for target in targets if target.pk in already
+        ]
+        own_login = self._own_login()
+        results += [
+            FollowResult(target.pk, target.github_username, FollowOutcome.FAILED, 'cannot follow yourself')
+            for target in targets if target.github_username.lower() == own_login
+        ]
+        pending = [
+            target for target in targets
+            if target.pk not in already and target.github_username.lower() != own_login
+        ]
+        if not pending:
+            return results
+
+        GitHubFollowAction.objects.bulk_create([
+            GitHubFollowAction(user=self.user, github_user=target, status=GitHubFollowAction.FollowStatus.PENDING)
+            for target in pending
+        ], ignore_conflicts=True)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results += list(executor.map(self._put, pending))
+
+        failed_ids = [result.github_user_id for result in results if not result.ok]
+        if failed_ids:
+            GitHubFollowAction.objects.filter(user=self.user, github_user_id__in=failed_ids).delete()
+        self._mirror([result for result in results if result.outcome == FollowOutcome.FOLLOWED])
+
+        followed = sum(1 for result in results if result.outcome == FollowOutcome.FOLLOWED)
+        logger.info(f"Bulk follow for {self.user}: {followed}/{len(pending)} followed, {len(failed_ids)} failed")
+        return results
+
+
+def bulk_follow(user, targets: Iterable[GitHubUser], workers: Optional[int] = None) -> List[FollowResult]:
+    """Follow ``targets`` on GitHub for ``user``; see ``BulkFollower``.
+
+    Without an access token nothing is sent or recorded and every target
+    comes back ``FAILED``.
+    """
+    if not user.github_access_token:
+        logger.warning(f"Bulk follow for {user} skipped: no GitHub access token")
+        return [
+            FollowResult(target.pk, target.github_username, FollowOutcome.FAILED, 'no GitHub access token')
+            for target in {target.pk: target for target in targets}.values()
+        ]
+    return BulkFollower(user, workers=workers).follow(targets)
@@ -0,0 +1,190 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+import requests
+from django.conf import settings
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from users.services.github_service import GitHubFollowClient
+from ..models import GitHubFollowAction, UnfollowJob
+from .bulk_follow import bucket_for
+
+logger = logging.getLogger(__name__)
+
+CANDIDATES = (GitHubFollowAction.FollowStatus.PENDING, GitHubFollowAction.FollowStatus.NOT_FOLLOWED_BACK)
+
+# Per-candidate outcomes of a DELETE
+UNFOLLOWED = 'unfollowed'
+FAILED = 'failed'
+RATE_LIMITED = 'rate_limited'
+
+
+def create_unfollow_job(user, days: int) -> UnfollowJob:
+    """Snapshot the user's unfollow candidates into a new queued job."""
+    cutoff = timezone.now() - timedelta(days=days)
+    action_ids = list(
+        GitHubFollowAction.objects.filter(user=user, status__in=CANDIDATES, followed_at__lt=cutoff)
+        .order_by('followed_at', 'pk')
+        .values_list('pk', flat=True)
+    )
+    return UnfollowJob.objects.create(user=user, days=days, action_ids=action_ids, total=len(action_ids))
+
+
+def active_unfollow_job(user) -> Optional[UnfollowJob]:
+    return UnfollowJob.objects.filter(user=user, status__in=UnfollowJob.ACTIVE).first()
+
+
+def is_stalled(job: UnfollowJob) -> bool:
+    """An active job whose worker stopped saving progress (crash, restart, lost message)."""
+    stale = timezone.now() - timedelta(minutes=settings.UNFOLLOW_JOB_STALE_MINUTES)
+    return job.is_active and job.updated_at < stale
+
+
+def prepare_unfollow_job(user, days: int) -> Tuple[UnfollowJob, bool]:
+    """The job to show for a new unfollow request, and whether it must be enqueued.
+
+    An active job is reused rather than snapshotting the same candidates
+    twice; if it has stalled it is set back to ``QUEUED`` to be resumed.
+    """
+    job = active_unfollow_job(user)
+    if job is None:
+        return create_unfollow_job(user, days), True
+    if is_stalled(job):
+        job.status = UnfollowJob.Status.QUEUED
+        job.save(update_fields=['status', 'updated_at'])
+        return job, True
+    return job, False
+
+
+class BulkUnfollower:
+    """Run an ``UnfollowJob`` in batches from its saved position.
+
+    Each batch re-reads its candidates (skipping ones followed back or
+    removed since the snapshot), sends the DELETEs concurrently on the
+    token's keep-alive session paced by the shared bucket, then marks the
+    unfollowed actions ``UNFOLLOWED`` and removes their ``UserFollowing``
+    edges with one statement each. Rate-limited candidates are moved to the
+    front of the unfinished part of the snapshot, so the next run starts
+    with them.
+    """
+
+    def __init__(self, job: UnfollowJob, workers: Optional[int] = None, batch_size: Optional[int] = None):
+        if not job.user.github_access_token:
+            raise ValueError(f"{job.user} has no GitHub access token")
+        self.job = job
+        self.user = job.user
+        self.workers = workers or settings.GITHUB_FOLLOW_WORKERS
+        self.batch_size = batch_size or settings.UNFOLLOW_BATCH_SIZE
+        self.client = GitHubFollowClient(self.user.github_access_token)
+        self.bucket = bucket_for(self.user.github_access_token)
+        self.stop = threading.Event()
+
+    def _delete(self, candidate: Tuple[int, str]) -> Tuple[int, str, str]:
+        pk, login = candidate
+        if self.stop.is_set():
+            return pk, login, RATE_LIMITED
+        self.bucket.acquire()
+        try:
+            response = self.client.unfollow(login)
+        except requests.RequestException as e:
+            logger.warning(f"Unfollowing {login} for {self.user} failed: {e}")
+            return pk, login, FAILED
+
+        if response.status_code == 204:
+            return pk, login, UNFOLLOWED
+        if response.status_code in (403, 429):
+            self.stop.set()
+            return pk, login, RATE_LIMITED
+        logger.warning(f"Unfollowing {login} for {self.user} failed: {response.status_code} {response.text[:200]}")
+        return pk, login, FAILED
+
+    def _mark_unfollowed(self, done: List[Tuple[int, str]]) -> None:
+        from users.models import UserFollowing
+
+        if not done:
+            return
+        GitHubFollowAction.objects.filter(pk__in=[pk for pk, _ in done]).update(
+            status=GitHubFollowAction.FollowStatus.UNFOLLOWED,
+            last_checked=timezone.now(),
+        )
+        UserFollowing.objects.annotate(login=Lower('to_user__github_username')).filter(
+            from_user=self.user, login__in=[login.lower() for _, login in done]
+        ).delete()
+
+    def _run_batch(self, batch: List[int]) -> bool:
+        """Process one slice of the snapshot; returns False when rate limited."""
+        job = self.job
+        candidates = list(
+            GitHubFollowAction.objects.filter(pk__in=batch, user=self.user, status__in=CANDIDATES)
+            .values_list('pk', 'github_user__github_username')
+        )
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self._delete, candidates))
+
+        done = [(pk, login) for pk, login, outcome in results if outcome == UNFOLLOWED]
+        retry = [pk for pk, _, outcome in results if outcome == RATE_LIMITED]
+        failed = sum(1 for _, _, outcome in results if outcome == FAILED)
+        self._mark_unfollowed(done)
+
+        retrying = set(retry)
+        finished = [pk for pk in batch if pk not in retrying]
+        position = job.processed
+        job.action_ids = job.action_ids[:position] + finished + retry + job.action_ids[position + len(batch):]
+        job.processed = position + len(finished)
+        job.unfollowed += len(done)
+        job.failed += failed
+        job.skipped += len(batch) - len(candidates)
+        job.save(update_fields=['action_ids', 'processed', 'unfollowed', 'failed', 'skipped', 'updated_at'])
+        return not retry
+
+    def run(self) -> bool:
+        """Run to completion; returns False if GitHub rate limited the job (left ``QUEUED``)."""
+        job = self.job
+        job.status = UnfollowJob.Status.RUNNING
+        job.started_at = job.started_at or timezone.now()
+        job.error = ''
+        job.save(update_fields=['status', 'started_at', 'error', 'updated_at'])
+
+        while job.processed < job.total:
+            batch = job.action_ids[job.processed:job.processed + self.batch_size]
+            if not self._run_batch(batch):
+                job.status = UnfollowJob.Status.QUEUED
+                job.error = 'Rate limited by GitHub; the job will resume automatically.'
+                job.save(update_fields=['status', 'error', 'updated_at'])
+                logger.info(f"Unfollow job {job.pk} rate limited at {job.processed}/{job.total}")
+                return False
+
+        job.status = UnfollowJob.Status.COMPLETED
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at', 'updated_at'])
+        logger.info(
+            f"Unfollow job {job.pk} for {self.user}: {job.unfollowed} unfollowed, "
+            f"{job.failed} failed, {job.skipped} skipped of {job.total}"
+        )
+        return True
+
+
+def run_unfollow_job(job: UnfollowJob, workers: Optional[int] = None) -> bool:
+    """Run ``job`` from its saved position; see ``BulkUnfollower``.
+
+    A job whose user has no access token is failed without calling GitHub
+    (and not retried).
+    """
+    if not job.user.github_access_token:
+        logger.warning(f"Unfollow job {job.pk} for {job.user} failed: no GitHub access token")
+        UnfollowJob.objects.filter(pk=job.pk).update(
+            status=UnfollowJob.Status.FAILED, error='GitHub token missing.', finished_at=timezone.now()
+        )
+        job.refresh_from_db()
+        return True
+    try:
+        return BulkUnfollower(job, workers=workers).run()
+    except Exception as e:
+        UnfollowJob.objects.filter(pk=job.pk).update(
+            status=UnfollowJob.Status.FAILED, error=str(e)[:500], finished_at=timezone.now()
+        )
+        raise
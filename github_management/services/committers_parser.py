@@ -0,0 +1,308 @@
+"""Parsers for the ``table.users-list`` table on committers.top country pages.
+
+Three interchangeable backends produce identical user dicts:
+
+* ``lxml``   - libxml2 based, fastest; used when ``lxml`` is installed.
+* ``stream`` - incremental ``html.parser`` that skips straight to the users
+  table and stops once enough rows have been read. Pure stdlib.
+* ``bs4``    - the original BeautifulSoup implementation, kept as the
+  reference for ``benchmark_parser``.
+"""
+import logging
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PARSERS = ('lxml', 'stream', 'bs4')
+
+_VOID_ELEMENTS = frozenset(('br', 'img', 'input', 'hr', 'meta', 'link', 'wbr', 'source'))
+
+
+def lxml_available() -> bool:
+    try:
+        import lxml.html  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_parser(parser: Optional[str] = None) -> str:
+    """Return a concrete backend name for ``parser`` (or the configured default)."""
+    parser = parser or getattr(settings, 'COMMITTERS_TOP_PARSER', 'auto')
+    if parser == 'auto':
+        return 'lxml' if lxml_available() else 'stream'
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown committers.top parser: {parser}")
+    if parser == 'lxml' and not lxml_available():
+        logger.warning("lxml is not installed, falling back to the stream parser")
+        return 'stream'
+    return parser
+
+
+def _split_name(name: str):
+    first_name = middle_name = last_name = ''
+    parts = name.split()
+    if len(parts) == 1:
+        first_name = parts[0]
+    elif len(parts) == 2:
+        first_name, last_name = parts
+    elif parts:
+        first_name = parts[0]
+        middle_name = ' '.join(parts[1:-1])
+        last_name = parts[-1]
+    return first_name, middle_name, last_name
+
+
+def build_user_data(rank: int, href: str, name_text: Optional[str],
+                    contributions_text: str, avatar_src: Optional[str]) -> Dict[str, Any]:
+    """Turn the raw cell values of one table row into a user dict."""
+    username = href.strip('/')
+    if 'github.com' in username:
+        username = username.split('github.com/')[-1].split('/')[0]
+
+    # Name is the text after <br>, usually wrapped in parentheses
+    name = None
+    candidate = (name_text or '').strip()
+    if candidate.startswith('(') and candidate.endswith(')'):
+        name = candidate[1:-1].strip()
+    elif candidate:
+        name = candidate
+
+    first_name = middle_name = last_name = ''
+    if name:
+        first_name, middle_name, last_name = _split_name(name)
+
+    contrib_text = contributions_text.replace(',', '')
+    contributions = int(contrib_text) if contrib_text.isdigit() else 0
+
+    avatar_url = avatar_src.split('?')[0] if avatar_src else ''
+
+    user_data = {
+        'username': username,
+        'first_name': first_name,
+        'middle_name': middle_name,
+        'last_name': last_name,
+        'rank': rank,
+        'contributions': contributions,
+        'profile_url': f"https://github.com/{username}",
+        'avatar_url': avatar_url or f"https://github.com/{username}.png"
+    }
+    # Add name if it differs from the username
+    if name and name.lower() != username.lower():
+        name = name.strip()
+        # Handle special cases like "DML" or other initials
+        if len(name) <= 3 and name.isupper():
+            first_name = name
+            last_name = ''
+        else:
+            name_parts = name.split()
+            if len(name_parts) >= 2:
+                first_name = name_parts[0]
+                last_name = ' '.join(name_parts[1:])  # Handle multiple last names
+            else:
+                first_name = name
+                last_name = ''
+        user_data.update({
+            'name': name,
+            'first_name': first_name,
+            'middle_name': middle_name,
+            'last_name': last_name
+        })
+    return user_data
+
+
+class _Cell:
+    __slots__ = ('text', 'href', 'has_link', 'br_seen', 'after_br', 'after_br_done', 'img_src', 'has_img')
+
+    def __init__(self):
+        self.text = []
+        self.href = None
+        self.has_link = False
+        self.br_seen = False
+        self.after_br = []
+        self.after_br_done = False
+        self.img_src = None
+        self.has_img = False
+
+
+class UsersTableParser(HTMLParser):
+    """Incremental parser that only tracks rows of ``table.users-list > tbody``."""
+
+    def __init__(self, max_users: int = 256):
+        super().__init__(convert_charrefs=True)
+        self.max_users = max_users
+        self.rows: List[List[_Cell]] = []
+        self.done = False
+        self._table_depth = 0
+        self._in_tbody = False
+        self._row: Optional[List[_Cell]] = None
+        self._cell: Optional[_Cell] = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'table':
+            if self._table_depth:
+                self._table_depth += 1
+            elif 'users-list' in (dict(attrs).get('class') or '').split():
+                self._table_depth = 1
+            return
+        if self._table_depth != 1:
+            return
+        if tag == 'tbody':
+            self._in_tbody = True
+        elif not self._in_tbody:
+            return
+        elif tag == 'tr':
+            self._row = []
+        elif tag == 'td' and self._row is not None:
+            self._cell = _Cell()
+            self._row.append(self._cell)
+        elif self._cell is not None:
+            cell = self._cell
+            if cell.br_seen:
+                cell.after_br_done = True
+            if tag == 'a' and not cell.has_link:
+                cell.has_link = True
+                cell.href = dict(attrs).get('href')
+            elif tag == 'br' and not cell.br_seen:
+                cell.br_seen = True
+            elif tag == 'img' and not cell.has_img:
+                cell.has_img = True
+                cell.img_src = dict(attrs).get('data-src')
+
+    def handle_endtag(self, tag):
+        if self.done or not self._table_depth:
+            return
+        if tag == 'table':
+            self._table_depth -= 1
+            if not self._table_depth:
+                self.done = True
+            return
+        if self._table_depth != 1 or not self._in_tbody:
+            return
+        if tag == 'tbody':
+            self._in_tbody = False
+        elif tag == 'tr' and self._row is not None:
+            self.rows.append(self._row)
+            self._row = self._cell = None
+            if len(self.rows) >= self.max_users:
+                self.done = True
+        elif tag == 'td':
+            self._cell = None
+        elif self._cell is not None and self._cell.br_seen and tag not in _VOID_ELEMENTS:
+            self._cell.after_br_done = True
+
+    def handle_data(self, data):
+        cell = self._cell
+        if cell is None or self.done:
+            return
+        cell.text.append(data)
+        if cell.br_seen and not cell.after_br_done:
+            cell.after_br.append(data)
+
+
+def _parse_stream(html: str, max_users: int) -> List[Dict[str, Any]]:
+    # Skip everything before the users table; the country list alone is a
+    # large share of the page.
+    marker = html.find('users-list')
+    if marker == -1:
+        return []
+    start = html.rfind('<table', 0, marker)
+    parser = UsersTableParser(max_users=max_users)
+    position = start if start != -1 else 0
+    chunk_size = 64 * 1024
+    while position < len(html) and not parser.done:
+        parser.feed(html[position:position + chunk_size])
+        position += chunk_size
+    parser.close()
+
+    users = []
+    for rank, cells in enumerate(parser.rows, 1):
+        if len(cells) < 4 or not cells[1].has_link or not cells[1].href:
+            continue
+        contrib = ''.join(s.strip() for s in cells[2].text)
+        name_text = ''.join(cells[1].after_br) if cells[1].br_seen else None
+        users.append(build_user_data(rank, cells[1].href, name_text, contrib, cells[3].img_src))
+    return users
+
+
+def _parse_lxml(html: str, max_users: int) -> List[Dict[str, Any]]:
+    import lxml.html
+
+    root = lxml.html.fromstring(html)
+    rows = root.xpath(
+        "//table[contains(concat(' ', normalize-space(@class), ' '), ' users-list ')][1]/tbody/tr"
+    )
+    users = []
+    for rank, row in enumerate(rows[:max_users], 1):
+        cols = list(row.iter('td'))
+        if len(cols) < 4:
+            continue
+        link = next(cols[1].iter('a'), None)
+        href = link.get('href') if link is not None else None
+        if not href:
+            continue
+        br = next(cols[1].iter('br'), None)
+        name_text = (br.tail or '') if br is not None else None
+        contrib = ''.join(s.strip() for s in cols[2].itertext())
+        img = next(cols[3].iter('img'), None)
+        avatar_src = img.get('data-src') if img is not None else None
+        users.append(build_user_data(rank, href, name_text, contrib, avatar_src))
+    return users
+
+
+def _parse_bs4(html: str, max_users: int) -> List[Dict[str, Any]]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    users_table = soup.find('table', class_='users-list')
+    if not users_table or not users_table.find('tbody'):
+        return []
+    users = []
+    for rank, row in enumerate(users_table.find('tbody').find_all('tr')[:max_users], 1):
+        cols = row.find_all('td')
+        if len(cols) < 4:
+            continue
+        user_link = cols[1].find('a')
+        if not user_link or not user_link.get('href'):
+            continue
+        name_text = None
+        br = cols[1].find('br')
+        if br:
+            name_text = ''
+            for sib in br.next_siblings:
+                if isinstance(sib, str):
+                    name_text += sib
+                else:
+                    break
+        img = cols[3].find('img')
+        avatar_src = img.get('data-src') if img else None
+        users.append(build_user_data(
+            rank, user_link.get('href'), name_text, cols[2].get_text(strip=True), avatar_src
+        ))
+    return users
+
+
+_BACKENDS = {
+    'lxml': _parse_lxml,
+    'stream': _parse_stream,
+    'bs4': _parse_bs4,
+}
+
+
+def parse_users_table(html: str, max_users: int = 256, parser: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Extract user rows from a committers.top country page.
+
+    Args:
+        html: Raw page HTML
+        max_users: Maximum number of table rows to read
+        parser: One of ``PARSERS`` or ``'auto'`` (default: settings.COMMITTERS_TOP_PARSER)
+
+    Returns:
+        List of user dicts in table order, ``rank`` being the row position
+    """
+    return _BACKENDS[resolve_parser(parser)](html, max_users)
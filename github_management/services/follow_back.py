@@ -0,0 +1,116 @@
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from ..models import GitHubFollowAction
+
+logger = logging.getLogger(__name__)
+
+# Actions the resolver looks at: still waiting, or given up on but possibly followed back late
+UNRESOLVED = (GitHubFollowAction.FollowStatus.PENDING, GitHubFollowAction.FollowStatus.NOT_FOLLOWED_BACK)
+CHUNK = 5000
+
+
+def _refresh_followers(user) -> None:
+    """Sync the user's follower edges first if they are due (cheap when unchanged)."""
+    from users.services.relationship_sync import RelationshipSync
+
+    if not user.github_access_token:
+        return
+    due = timezone.now() - timedelta(minutes=settings.RELATIONSHIP_SYNC_INTERVAL)
+    if user.last_synced_github_followers_following and user.last_synced_github_followers_following >= due:
+        return
+    try:
+        RelationshipSync(user).run()
+        user.last_synced_github_followers_following = timezone.now()
+        user.save(update_fields=['last_synced_github_followers_following'])
+    except Exception as e:
+        logger.warning(f"Follower sync for {user} failed, resolving against stored followers: {e}")
+
+
+def _follower_logins(user) -> set:
+    from users.models import UserFollowing
+
+    return set(
+        UserFollowing.objects.filter(to_user=user, from_user__github_username__isnull=False)
+        .annotate(login=Lower('from_user__github_username'))
+        .values_list('login', flat=True)
+    )
+
+
+def resolve_user(user, grace_days: Optional[int] = None, now=None, sync: bool = True) -> Dict[str, int]:
+    """Classify all unresolved follow actions of one user against their follower set.
+
+    Followed back -> ``FOLLOWED_BACK``. Not followed back after
+    ``grace_days`` -> ``NOT_FOLLOWED_BACK``. Younger actions stay
+    ``PENDING``. The follower set is loaded once, actions are read in chunks
+    of plain values, and changes are written with ``bulk_update``.
+
+    Returns:
+        Counts of actions checked and moved to each status
+    """
+    now = now or timezone.now()
+    grace_days = settings.FOLLOW_BACK_GRACE_DAYS if grace_days is None else grace_days
+    cutoff = now - timedelta(days=grace_days)
+    if sync:
+        _refresh_followers(user)
+    followers = _follower_logins(user)
+
+    result = {'checked': 0, 'followed_back': 0, 'not_followed_back': 0}
+    actions = (
+        GitHubFollowAction.objects.filter(user=user, status__in=UNRESOLVED)
+        .order_by('pk')
+        .values_list('pk', 'status', 'followed_at', 'github_user__github_username')
+    )
+    changed: List[GitHubFollowAction] = []
+    for pk, status, followed_at, login in actions.iterator(chunk_size=CHUNK):
+        result['checked'] += 1
+        if login and login.lower() in followers:
+            new_status = GitHubFollowAction.FollowStatus.FOLLOWED_BACK
+        elif followed_at < cutoff:
+            new_status = GitHubFollowAction.FollowStatus.NOT_FOLLOWED_BACK
+        else:
+            continue
+        if new_status == status:
+            continue
+        result[new_status] += 1
+        changed.append(GitHubFollowAction(
+            pk=pk,
+            status=new_status,
+            followed_back_at=now if new_status == GitHubFollowAction.FollowStatus.FOLLOWED_BACK else None,
+        ))
+
+    GitHubFollowAction.objects.filter(user=user, status__in=UNRESOLVED).update(last_checked=now)
+    if changed:
+        GitHubFollowAction.objects.bulk_update(changed, ['status', 'followed_back_at'], batch_size=1000)
+    return result
+
+
+def users_with_unresolved_actions() -> List[int]:
+    return list(
+        GitHubFollowAction.objects.filter(status__in=UNRESOLVED)
+        .order_by('user_id')
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+
+
+def resolve_users(user_ids: Iterable[int], grace_days: Optional[int] = None) -> Dict[str, int]:
+    """Run ``resolve_user`` for each of ``user_ids`` and sum the counts."""
+    from users.models import User
+
+    totals = {'users': 0, 'checked': 0, 'followed_back': 0, 'not_followed_back': 0}
+    for user in User.objects.filter(pk__in=list(user_ids)):
+        try:
+            counts = resolve_user(user, grace_days=grace_days)
+        except Exception as e:
+            logger.error(f"Follow-back resolution failed for {user}: {e}")
+            continue
+        totals['users'] += 1
+        for key, value in counts.items():
+            totals[key] += value
+    return totals
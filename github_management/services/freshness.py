@@ -0,0 +1,232 @@
+import heapq
+import logging
+import math
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .refresh_coordinator import RefreshCoordinator, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+PAGE_VIEWS_KEY = 'pageviews:GitHubUser'
+
+def _models():
+    from users.models import User
+    from ..models import GitHubUser
+
+    return {'GitHubUser': GitHubUser, 'User': User}
+
+
+def record_page_view(user_id: int) -> None:
+    """Count a view of a GitHub user's page in a Redis hash.
+
+    This is the only freshness-related work done in request handlers. It
+    never raises: a lost page view only slightly skews priorities.
+    """
+    try:
+        get_redis_client().hincrby(PAGE_VIEWS_KEY, user_id, 1)
+    except Exception as e:
+        logger.debug(f"Could not record page view for user {user_id}: {e}")
+
+
+def flush_page_views() -> int:
+    """Move buffered page views from Redis into ``GitHubUser.page_views``.
+
+    Returns:
+        Number of rows updated
+    """
+    from ..models import GitHubUser
+
+    key = PAGE_VIEWS_KEY
+    pipe = get_redis_client().pipeline(transaction=True)
+    pipe.hgetall(key)
+    pipe.delete(key)
+    counts, _ = pipe.execute()
+
+    # One UPDATE per distinct increment instead of one per user
+    by_increment: Dict[int, List[int]] = defaultdict(list)
+    for pk, views in counts.items():
+        by_increment[int(views)].append(int(pk))
+    updated = 0
+    for views, pks in by_increment.items():
+        updated += GitHubUser.objects.filter(pk__in=pks).update(page_views=F('page_views') + views)
+    _reschedule_viewed([int(pk) for pk in counts])
+    return updated
+
+
+def _reschedule_viewed(pks: List[int], chunk_size: int = 1000) -> None:
+    """Move viewed users' next refresh earlier to match their new popularity."""
+    from ..models import GitHubUser
+
+    for start in range(0, len(pks), chunk_size):
+        users = GitHubUser.objects.filter(pk__in=pks[start:start + chunk_size], refresh_failures=0).only(
+            'pk', 'fetched_at', 'followers', 'page_views', 'rank', 'refresh_due_at'
+        )
+        moved = []
+        for user in users:
+            due_at = user.fetched_at + timedelta(hours=refresh_interval(user))
+            if due_at < user.refresh_due_at:
+                user.refresh_due_at = due_at
+                moved.append(user)
+        GitHubUser.objects.bulk_update(moved, ['refresh_due_at'])
+
+
+def refresh_popularity(page_views: int = 0, followers: int = 0, rank: int = 0) -> float:
+    """How much more often than an unknown user a row is refreshed."""
+    popularity = 1.0 + math.log1p(page_views) + 0.5 * math.log1p(followers)
+    if rank > 0:
+        # Country rank 1 doubles the weight of a never-viewed user, rank 100 barely matters
+        popularity += 2.0 / rank
+    return popularity
+
+
+def refresh_interval(user) -> int:
+    """Whole hours until ``user`` is due again after a successful refresh.
+
+    ``FRESHNESS_BASE_INTERVAL_HOURS`` divided by popularity, no shorter than
+    ``FRESHNESS_MIN_AGE_HOURS``; users inside the top-rank SLA are never
+    scheduled later than ``FRESHNESS_TOP_MAX_AGE_HOURS``.
+    """
+    rank = getattr(user, 'rank', 0) or 0
+    popularity = refresh_popularity(getattr(user, 'page_views', 0) or 0, user.followers or 0, rank)
+    hours = max(settings.FRESHNESS_BASE_INTERVAL_HOURS / popularity, settings.FRESHNESS_MIN_AGE_HOURS)
+    if 1 <= rank <= settings.FRESHNESS_TOP_RANK:
+        hours = min(hours, settings.FRESHNESS_TOP_MAX_AGE_HOURS)
+    return max(1, math.ceil(hours))
+
+
+def back_off_failed(model_class, users: Iterable) -> int:
+    """Push the next refresh of users whose fetch failed back exponentially.
+
+    The delay starts at ``FRESHNESS_RETRY_BASE_MINUTES`` and doubles with
+    each consecutive failure up to ``FRESHNESS_RETRY_MAX_HOURS``; one UPDATE
+    per distinct failure count.
+
+    Returns:
+        Number of rows updated
+    """
+    now = timezone.now()
+    by_failures: Dict[int, List[int]] = defaultdict(list)
+    for user in users:
+        by_failures[user.refresh_failures].append(user.pk)
+    updated = 0
+    for failures, pks in by_failures.items():
+        minutes = min(settings.FRESHNESS_RETRY_BASE_MINUTES * 2 ** min(failures, 16),
+                      settings.FRESHNESS_RETRY_MAX_HOURS * 60)
+        updated += model_class.objects.filter(pk__in=pks).update(
+            refresh_failures=min(failures + 1, 1000),
+            refresh_due_at=now + timedelta(minutes=minutes),
+        )
+    return updated
+
+
+@dataclass
+class RefreshPlan:
+    sla: Dict[str, List[int]] = field(default_factory=lambda: defaultdict(list))
+    priority: Dict[str, List[int]] = field(default_factory=lambda: defaultdict(list))
+    sla_backlog: int = 0
+
+    def user_ids(self, model_name: str) -> List[int]:
+        return self.sla.get(model_name, []) + self.priority.get(model_name, [])
+
+    @property
+    def total(self) -> int:
+        return sum(len(ids) for ids in self.sla.values()) + sum(len(ids) for ids in self.priority.values())
+
+
+class FreshnessScheduler:
+    """Pick which users to refresh on each beat tick.
+
+    Every row carries ``refresh_due_at``, set after each refresh from its
+    popularity (see ``refresh_interval``) or pushed back after a failure
+    (``back_off_failed``). A tick therefore reads the earliest due rows off
+    the ``refresh_due_at`` index, in two passes sharing the budget:
+
+    1. SLA pass: due GitHub users ranked ``top_rank`` or better in their country.
+    2. Priority pass: every other due ``GitHubUser`` and ``User``, earliest first.
+    """
+
+    def __init__(self, budget: Optional[int] = None, top_rank: Optional[int] = None):
+        self.budget = budget if budget is not None else settings.FRESHNESS_USERS_PER_TICK
+        self.top_rank = top_rank if top_rank is not None else settings.FRESHNESS_TOP_RANK
+
+    def _sla_candidates(self, now) -> Tuple[List[int], int]:
+        from ..models import GitHubUser
+
+        due = GitHubUser.objects.due(now).filter(rank__gte=1, rank__lte=self.top_rank)
+        ids = list(due.order_by('refresh_due_at').values_list('pk', flat=True)[:self.budget])
+        backlog = due.count() - len(ids) if len(ids) == self.budget else 0
+        return ids, backlog
+
+    def _due_candidates(self, now, limit: int, exclude: List[int]) -> List[Tuple[str, int]]:
+        rows = []
+        for model_name, model_class in _models().items():
+            due = model_class.objects.due(now)
+            if model_name == 'GitHubUser' and exclude:
+                due = due.exclude(pk__in=exclude)
+            rows.extend(
+                (due_at, model_name, pk)
+                for pk, due_at in due.order_by('refresh_due_at').values_list('pk', 'refresh_due_at')[:limit]
+            )
+        return [(model_name, pk) for _, model_name, pk in heapq.nsmallest(limit, rows)]
+
+    def plan(self, now=None) -> RefreshPlan:
+        now = now or timezone.now()
+        plan = RefreshPlan()
+
+        sla_ids, plan.sla_backlog = self._sla_candidates(now)
+        plan.sla['GitHubUser'] = sla_ids
+        if plan.sla_backlog:
+            logger.warning(
+                f"{plan.sla_backlog} top-ranked users past their freshness target are left for later ticks; "
+                f"FRESHNESS_USERS_PER_TICK={self.budget} cannot cover them this tick"
+            )
+
+        remaining = self.budget - len(sla_ids)
+        if remaining > 0:
+            for model_name, pk in self._due_candidates(now, remaining, sla_ids):
+                plan.priority[model_name].append(pk)
+        return plan
+
+
+def run_freshness_tick(budget: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+    """Flush buffered page views, plan a tick and enqueue the refresh jobs.
+
+    Returns:
+        Summary counts for logging
+    """
+    from ..tasks import update_users_stats_batch
+
+    summary = {'page_views_flushed': 0, 'planned': 0, 'enqueued': 0, 'sla': 0, 'sla_backlog': 0}
+    if not dry_run:
+        try:
+            summary['page_views_flushed'] = flush_page_views()
+        except Exception as e:
+            logger.warning(f"Could not flush page views: {e}")
+
+    plan = FreshnessScheduler(budget=budget).plan()
+    summary['planned'] = plan.total
+    summary['sla'] = len(plan.sla.get('GitHubUser', []))
+    summary['sla_backlog'] = plan.sla_backlog
+    if dry_run:
+        return summary
+
+    batch_size = settings.REFRESH_BATCH_SIZE
+    for model_name in _models():
+        # Skip users a previous tick (or a manual refresh) already has in flight
+        user_ids = RefreshCoordinator(model_name).claim(plan.user_ids(model_name))
+        for start in range(0, len(user_ids), batch_size):
+            update_users_stats_batch.delay(user_ids[start:start + batch_size], model_name)
+        summary['enqueued'] += len(user_ids)
+
+    logger.info(
+        f"Freshness tick: {summary['enqueued']}/{summary['planned']} users enqueued "
+        f"({summary['sla']} for the top-rank SLA), {summary['page_views_flushed']} page view rows flushed"
+    )
+    return summary
@@ -2,12 +2,16 @@ import os
 import time
 import logging
 import re
+import threading
 import requests
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any, Union
 from urllib.parse import urljoin, quote_plus
 from bs4 import BeautifulSoup
 
+from .committers_parser import parse_users_table
+from .http_cache import PageSnapshot, SnapshotCache, content_hash, get_default_cache
+
 logger = logging.getLogger(__name__)
 
 class GitHubAPIClient:
@@ -15,38 +19,100 @@ class GitHubAPIClient:
     
     BASE_API_URL = "https://committers.top"
     
-    def __init__(self, token: str = None):
+    def __init__(self, token: str = None, session: Optional[requests.Session] = None,
+                 base_url: Optional[str] = None, timeout: Optional[float] = None,
+                 cache: Optional[SnapshotCache] = None):
         """Initialize the client.
         
         Args:
             token: Optional GitHub token (not required for committers.top)
+            session: Optional shared session (e.g. from the ingestion engine)
+            base_url: Override for the committers.top base URL
+            timeout: Per-request timeout in seconds
+            cache: Snapshot cache for conditional GETs (default: settings.COMMITTERS_TOP_CACHE_DIR)
         """
-        self.session = requests.Session()
+        from django.conf import settings
+
+        self.base_url = (base_url or getattr(settings, 'COMMITTERS_TOP_URL', self.BASE_API_URL)).rstrip('/')
+        self.timeout = timeout or getattr(settings, 'INGEST_REQUEST_TIMEOUT', 30)
+        # Politeness delay enforced between consecutive requests of this client
+        self.request_delay = getattr(settings, 'COMMITTERS_TOP_REQUEST_DELAY', 0.2)
+        self._last_request_at = 0.0
+        self._throttle_lock = threading.Lock()
+        self.cache = cache if cache is not None else get_default_cache()
+        self.session = session or requests.Session()
         self.session.headers.update({
             'User-Agent': 'GitHub-Management-App/1.0',
             'Accept': 'application/json',
         })
     
-    def _make_request(self, url: str, params: Optional[dict] = None, parse_json: bool = False) -> Any:
+    def _throttle(self) -> None:
+        """Space out requests by ``request_delay`` seconds to be nice to the server."""
+        if not self.request_delay:
+            return
+        with self._throttle_lock:
+            wait = self._last_request_at + self.request_delay - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request_at = time.monotonic()
+
+    def _make_request(self, url: str, params: Optional[dict] = None, parse_json: bool = False,
+                      snapshot: bool = False) -> Any:
         """Make a request to the committers.top website.
         
+        HTML requests are revalidated against the snapshot cache: the stored
+        ETag/Last-Modified are sent as ``If-None-Match``/``If-Modified-Since``
+        and a 304 is answered from the cached body.
+        
         Args:
             url: Full URL or endpoint to request
             params: Optional query parameters
             parse_json: Whether to parse response as JSON
+            snapshot: Return a ``PageSnapshot`` instead of parsed HTML
             
         Returns:
-            Parsed response (JSON or BeautifulSoup)
+            Parsed response (JSON or BeautifulSoup), or a ``PageSnapshot``
         """
         if not url.startswith('http'):
-            url = f"{self.BASE_API_URL}/{url.lstrip('/')}"
+            url = f"{self.base_url}/{url.lstrip('/')}"
             
         try:
-            response = self.session.get(url, params=params)
+            cached = None
+            headers = {}
+            if self.cache and not parse_json and not params:
+                cached = self.cache.get(url)
+                headers = self.cache.conditional_headers(cached)
+
+            self._throttle()
+            response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+
+            if response.status_code == 304 and cached is not None:
+                body = self.cache.read_body(url)
+                if body is None:
+                    # Cached body vanished; fetch unconditionally
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                else:
+                    page = PageSnapshot(url=url, text=body, content_hash=cached.content_hash, not_modified=True)
+                    return page if snapshot else BeautifulSoup(page.text, 'html.parser')
+
             response.raise_for_status()
             
             if parse_json:
                 return response.json()
+
+            if self.cache and not params:
+                entry = self.cache.store(
+                    url,
+                    response.text,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                )
+                page_hash = entry.content_hash
+            else:
+                page_hash = content_hash(response.text)
+
+            if snapshot:
+                return PageSnapshot(url=url, text=response.text, content_hash=page_hash)
                 
             # Parse HTML with BeautifulSoup
             return BeautifulSoup(response.text, 'html.parser')
@@ -59,133 +125,29 @@ class GitHubAPIClient:
     
     def get_users_by_country(self, country: str, max_users: int = 256) -> List[Dict[str, Any]]:
         try:
-            # First try to get the main page for the country
-            soup = self._make_request(f"{country.lower()}_public")
-            
-            # Find the users table
-            users_table = soup.find('table', class_='users-list')
-            if not users_table:
-                logger.warning(f"Could not find users table for country: {country}")
-                return []
-                
-            # Extract user data from the table
-            users = []
-            rows = users_table.find('tbody').find_all('tr')
-            
-            for i, row in enumerate(rows[:max_users], 1):
-                try:
-                    # Extract user data from the row
-                    cols = row.find_all('td')
-                    if len(cols) < 4:  # Ensure we have all columns
-                        continue
-                        
-                    # Get username and profile URL
-                    user_link = cols[1].find('a')
-                    if not user_link:
-                        continue
-                        
-                    username = user_link.get('href').strip('/')
-                    if 'github.com' in username:
-                        username = username.split('github.com/')[-1].split('/')[0]
-                    
-                    # Get user's name (if available)
-                    # Get user's name (text inside parentheses after <br>)
-                    name = None
-                    br = cols[1].find('br')
-                    if br:
-                        following_text = ''
-                        for sib in br.next_siblings:
-                            if isinstance(sib, str):
-                                following_text += sib
-                            else:
-                                break
-                        candidate = (following_text or (br.next_sibling or '')).strip()
-                        if candidate.startswith('(') and candidate.endswith(')'):
-                            name = candidate[1:-1].strip()
-                        elif candidate:
-                            name = candidate.strip()
-
-                    # Extract first, middle, last names if available
-                    first_name = middle_name = last_name = ''
-                    if name:
-                        parts = name.split()
-                        if len(parts) == 1:
-                            first_name = parts[0]
-                        elif len(parts) == 2:
-                            first_name, last_name = parts
-                        else:
-                            first_name = parts[0]
-                            middle_name = ' '.join(parts[1:-1])
-                            last_name = parts[-1]
-
-                    # Get contributions count
-                    contributions = 0
-                    try:
-                        contrib_text = cols[2].get_text(strip=True).replace(',', '')
-                        contributions = int(contrib_text) if contrib_text.isdigit() else 0
-                    except (ValueError, AttributeError):
-                        pass
-                    
-                    # Get avatar URL
-                    avatar_url = ''
-                    img = cols[3].find('img')
-                    if img and 'data-src' in img.attrs:
-                        avatar_url = img['data-src'].split('?')[0]  # Remove query params
-                    
-                    # Create user data dict
-                    user_data = {
-                        'username': username,
-                        'first_name': first_name,
-                        'middle_name': middle_name,
-                        'last_name': last_name,
-                        'rank': i,
-                        'contributions': contributions,
-                        'profile_url': f"https://github.com/{username}",
-                        'avatar_url': avatar_url or f"https://github.com/{username}.png"
-                    }
-                    # Add name if available
-                    if name and name.lower() != username.lower():  # Only add if name is different from username
-                        # Handle different name formats
-                        name = name.strip()
-                        
-                        # Handle special cases like "DML" or other initials
-                        if len(name) <= 3 and name.isupper():
-                            first_name = name
-                            last_name = ''
-                        # Handle names with titles or suffixes (e.g., "Gift Nnko")
-                        else:
-                            name_parts = name.split()
-                            if len(name_parts) >= 2:
-                                first_name = name_parts[0]
-                                last_name = ' '.join(name_parts[1:])  # Handle multiple last names
-                            else:
-                                first_name = name
-                                last_name = ''
-                        print(f"Name: {name}, First Name: {first_name}, Last Name: {last_name}")
-                        user_data.update({
-                            'name': name,
-                            'first_name': first_name,
-                            'middle_name': middle_name,
-                            'last_name': last_name
-                        })
-
-                    print(f"user data: {user_data}")
-
-                    
-                    users.append(user_data)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing user row {i}: {e}")
-                    continue
-                    
-                # Add a small delay to be nice to the server
-                time.sleep(0.2)
-                
-            return users
-            
+            return self.fetch_country_users(country, max_users=max_users)
         except Exception as e:
             logger.error(f"Error getting users for country {country}: {e}")
             return []
+
+    def fetch_country_page(self, country: str) -> PageSnapshot:
+        """Download (or revalidate) the ``<country>_public`` page."""
+        return self._make_request(f"{country.lower()}_public", snapshot=True)
+
+    def fetch_country_users(self, country: str, max_users: int = 256) -> List[Dict[str, Any]]:
+        """Fetch and parse the users table for a country.
+
+        Unlike ``get_users_by_country`` this lets request errors propagate so
+        callers such as the ingestion engine can tell a failed fetch apart
+        from a country with no users.
+        """
+        return self.parse_country_page(self.fetch_country_page(country), max_users=max_users)
+
+    def parse_country_page(self, page: PageSnapshot, max_users: int = 256) -> List[Dict[str, Any]]:
+        users = parse_users_table(page.text, max_users=max_users)
+        if not users:
+            logger.warning(f"Could not find users table at {page.url}")
+        return users
     
     def search_users_by_location(self, location: str, page: int = 1, per_page: int = 100) -> Tuple[List[Dict], bool]:
         """Search users by location.
@@ -427,23 +389,243 @@ class GitHubAPIClient:
 import requests
 from django.conf import settings
 
+from .token_pool import GitHubTokenPool, TokenPoolExhausted
+
+# Appended to every GraphQL query so the token pool learns the real cost
+RATE_LIMIT_FIELDS = "rateLimit { cost remaining resetAt limit }"
+
+USER_FIELDS_FRAGMENT = """
+fragment UserFields on User {
+  login
+  databaseId
+  id
+  name
+  company
+  websiteUrl
+  location
+  email
+  isHireable
+  bio
+  twitterUsername
+  avatarUrl
+  url
+  isSiteAdmin
+  createdAt
+  updatedAt
+  repositories(privacy: PUBLIC, ownerAffiliations: OWNER) { totalCount }
+  gists(privacy: PUBLIC) { totalCount }
+  followers { totalCount }
+  following { totalCount }
+  contributionsCollection { contributionCalendar { totalContributions } }
+}
+"""
+
+
+def build_users_query(logins):
+    """Build one aliased GraphQL query (``u0: user(login: $l0) {...}``) for many logins.
+
+    Logins are passed as variables so they never need escaping.
+    """
+    params = ', '.join(f'$l{i}: String!' for i in range(len(logins)))
+    fields = '\n'.join(f'  u{i}: user(login: $l{i}) {{ ...UserFields }}' for i in range(len(logins)))
+    query = f"query({params}) {{\n{fields}\n  {RATE_LIMIT_FIELDS}\n}}\n{USER_FIELDS_FRAGMENT}"
+    variables = {f'l{i}': login for i, login in enumerate(logins)}
+    return query, variables
+
+
+def graphql_user_to_rest(node):
+    """Map a ``UserFields`` GraphQL node onto the REST ``/users/{login}`` shape."""
+    total_contributions = (
+        (node.get('contributionsCollection') or {})
+        .get('contributionCalendar', {})
+        .get('totalContributions', 0)
+    )
+    return {
+        'login': node.get('login'),
+        'id': node.get('databaseId'),
+        'node_id': node.get('id'),
+        'name': node.get('name'),
+        'company': node.get('company'),
+        'blog': node.get('websiteUrl'),
+        'location': node.get('location'),
+        'email': node.get('email') or None,
+        'hireable': node.get('isHireable'),
+        'bio': node.get('bio'),
+        'twitter_username': node.get('twitterUsername'),
+        'public_repos': (node.get('repositories') or {}).get('totalCount', 0),
+        'public_gists': (node.get('gists') or {}).get('totalCount', 0),
+        'followers': (node.get('followers') or {}).get('totalCount', 0),
+        'following': (node.get('following') or {}).get('totalCount', 0),
+        'avatar_url': node.get('avatarUrl'),
+        'html_url': node.get('url'),
+        'type': 'User',
+        'site_admin': node.get('isSiteAdmin', False),
+        'created_at': node.get('createdAt'),
+        'updated_at': node.get('updatedAt'),
+        'contributions': {
+            'last_year': total_contributions,
+            'total': total_contributions,
+        },
+    }
+
+
+class GitHubRateLimited(Exception):
+    """GitHub still answered with a rate limit after rotating through the token pool."""
+
 
 class GitHubAPI:
-    def __init__(self, token=None):
+    # Status codes GitHub uses for primary and secondary rate limits
+    RATE_LIMIT_STATUSES = (403, 429)
+
+    def __init__(self, token=None, pool=None):
+        """Initialize the client.
+
+        Args:
+            token: Pin every request to this token. When omitted, requests are
+                spread over the shared token pool instead.
+            pool: Optional ``GitHubTokenPool`` (default: built from settings)
+        """
         self.base_url = "https://api.github.com"
         self.graphql_url = "https://api.github.com/graphql"
-        self.token = token or settings.GITHUB_TOKEN
+        self.token = token
+        self.pool = None if token else (pool or GitHubTokenPool.from_settings())
         self.headers = {
-            "Authorization": f"Bearer {self.token}",
             "Accept": "application/vnd.github+json"
         }
+        self.session = requests.Session()
+        self.batch_size = getattr(settings, 'GITHUB_GRAPHQL_BATCH_SIZE', 100)
+        # Set by get_users when it stopped on a rate limit: when to try the rest again
+        self.rate_limited_until = None
+
+    def _is_rate_limited(self, response):
+        if response.status_code not in self.RATE_LIMIT_STATUSES:
+            return False
+        if response.headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in response.headers:
+            return True
+        return 'rate limit' in response.text.lower()
+
+    def _request(self, method, url, resource='core', **kwargs):
+        """Send a request with the best available token.
+
+        Rate-limited responses mark the token as drained and the request is
+        retried on the next token, so one exhausted token never fails a job.
+
+        Returns:
+            Tuple of (response, token used)
+        """
+        attempts = len(self.pool) + 1 if self.pool else 1
+        for _ in range(attempts):
+            token = self.pool.acquire(resource) if self.pool else self.token
+            headers = dict(self.headers)
+            if token:
+                headers["Authorization"] = f"Bearer {token}"
+            response = self.session.request(method, url, headers=headers, **kwargs)
+            if not self.pool:
+                break
+            self.pool.record_headers(token, response.headers, resource)
+            if not self._is_rate_limited(response):
+                break
+            reset = response.headers.get('X-RateLimit-Reset')
+            if reset is None and response.headers.get('Retry-After', '').isdigit():
+                reset = time.time() + int(response.headers['Retry-After'])
+            self.pool.mark_exhausted(token, resource, reset)
+            logger.warning(f"GitHub token rate limited on {resource} ({response.status_code}); rotating")
+        return response, token
+
+    def _graphql(self, query, variables, timeout=60):
+        """POST a GraphQL query and feed its ``rateLimit`` node back to the pool."""
+        resp, token = self._request(
+            'POST', self.graphql_url, resource='graphql',
+            json={"query": query, "variables": variables}, timeout=timeout,
+        )
+        resp.raise_for_status()
+        payload = resp.json()
+        if self.pool:
+            self.pool.record_graphql_rate_limit(token, (payload.get('data') or {}).get('rateLimit'))
+        return payload
+
+    def get_users(self, logins):
+        """Fetch profile, follower counts and contributions for many users.
+
+        Logins are sent ``batch_size`` at a time as one aliased GraphQL query
+        each. Returns a dict keyed by lower-cased login; users that could not
+        be resolved (unknown login, organization, per-alias error) map to
+        ``None``. Users whose request failed (rate limit, network error) are
+        left out, so they stay stale and are retried later.
+        """
+        results = {}
+        # Logins are case-insensitive; one alias per user
+        unique = {}
+        for login in logins:
+            if login:
+                unique.setdefault(login.lower(), login)
+        logins = list(unique.values())
+        for start in range(0, len(logins), self.batch_size):
+            try:
+                results.update(self._get_users_chunk(logins[start:start + self.batch_size]))
+            except (TokenPoolExhausted, GitHubRateLimited) as e:
+                # Leave the rest stale for the next run rather than failing them one by one
+                logger.warning(f"{e}; skipping {len(logins) - start} remaining users")
+                retry_at = getattr(e, 'retry_at', None) or (self.pool and self.pool.next_reset('graphql'))
+                self.rate_limited_until = retry_at or time.time() + 60
+                break
+        return results
+
+    def _get_users_chunk(self, logins):
+        query, variables = build_users_query(logins)
+        try:
+            payload = self._graphql(query, variables)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status in self.RATE_LIMIT_STATUSES:
+                # Every token is spent; splitting would only multiply the rejected requests
+                raise GitHubRateLimited(f"GitHub rate limited a batch of {len(logins)} users") from e
+            if status is None or status < 500:
+                logger.error(f"GraphQL batch of {len(logins)} users failed ({e}); leaving them stale")
+                return {}
+            return self._split_users_chunk(logins, e)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            return self._split_users_chunk(logins, e)
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"GraphQL batch of {len(logins)} users failed ({e}); leaving them stale")
+            return {}
+
+        data = payload.get('data') or {}
+        errors_by_alias = {}
+        for error in payload.get('errors') or []:
+            path = error.get('path') or []
+            if path:
+                errors_by_alias[path[0]] = error.get('message')
+            else:
+                logger.error(f"GraphQL error for batch of {len(logins)} users: {error.get('message')}")
+
+        results = {}
+        for i, login in enumerate(logins):
+            alias = f'u{i}'
+            node = data.get(alias)
+            if node is None:
+                if alias in errors_by_alias:
+                    logger.warning(f"Could not fetch GitHub user {login}: {errors_by_alias[alias]}")
+                results[login.lower()] = None
+            else:
+                results[login.lower()] = graphql_user_to_rest(node)
+        return results
+
+    def _split_users_chunk(self, logins, error):
+        """Retry a timed out or 5xx batch in halves; large aliased queries occasionally time out upstream."""
+        if len(logins) == 1:
+            logger.error(f"Error fetching GitHub user {logins[0]}: {error}")
+            return {}
+        logger.warning(f"GraphQL batch of {len(logins)} users failed ({error}); splitting")
+        middle = len(logins) // 2
+        return {**self._get_users_chunk(logins[:middle]), **self._get_users_chunk(logins[middle:])}
 
     def get_user(self, username):
         """Get user data including contribution statistics."""
         try:
             # Get basic user info
             user_url = f"{self.base_url}/users/{username}"
-            response = requests.get(user_url, headers=self.headers)
+            response, _ = self._request('GET', user_url, timeout=30)
             response.raise_for_status()
             user_data = response.json()
 
@@ -456,8 +638,8 @@ class GitHubAPI:
                 "contributions": contributions
             }
 
-        except requests.RequestException as e:
-            print(f"Error fetching GitHub user {username}: {e}")
+        except (requests.RequestException, TokenPoolExhausted) as e:
+            logger.error(f"Error fetching GitHub user {username}: {e}")
             return None
 
     def get_contributions(self, username):
@@ -471,19 +653,13 @@ class GitHubAPI:
               }
             }
           }
+          %s
         }
-        """
+        """ % RATE_LIMIT_FIELDS
         variables = {"login": username}
 
         try:
-            resp = requests.post(
-                self.graphql_url,
-                json={"query": query, "variables": variables},
-                headers=self.headers
-            )
-            resp.raise_for_status()
-
-            data = resp.json()
+            data = self._graphql(query, variables, timeout=30)
             total_contributions = (
                 data.get("data", {})
                 .get("user", {})
@@ -498,5 +674,5 @@ class GitHubAPI:
             }
 
         except Exception as e:
-            print(f"Error fetching contributions for {username}: {e}")
+            logger.error(f"Error fetching contributions for {username}: {e}")
             return {"last_year": 0, "total": 0}
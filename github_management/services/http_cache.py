@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(body: str) -> str:
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class PageSnapshot:
+    """A downloaded (or revalidated) page body."""
+    url: str
+    text: str
+    content_hash: str
+    not_modified: bool = False
+
+
+@dataclass
+class CachedPage:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    stored_at: float
+
+
+class SnapshotCache:
+    """On-disk cache of page bodies plus their validators, one entry per URL.
+
+    Each entry is a small JSON metadata file (ETag, Last-Modified, content
+    hash) next to a gzip-compressed body. Writes go through a temporary
+    file and ``os.replace`` so concurrent workers never see partial files.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+        return self.directory / f'{key}.json', self.directory / f'{key}.html.gz'
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        meta_path, body_path = self._paths(url)
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            return CachedPage(
+                url=url,
+                etag=meta.get('etag'),
+                last_modified=meta.get('last_modified'),
+                content_hash=meta['content_hash'],
+                stored_at=meta.get('stored_at', 0.0),
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring corrupt cache entry for {url}: {e}")
+            return None
+
+    def read_body(self, url: str) -> Optional[str]:
+        """The cached body, or ``None`` if it is missing or corrupt (the caller refetches)."""
+        _, body_path = self._paths(url)
+        try:
+            return gzip.decompress(body_path.read_bytes()).decode('utf-8')
+        except (OSError, EOFError, zlib.error, UnicodeDecodeError) as e:
+            logger.warning(f"Could not read cached body for {url}: {e}")
+            return None
+
+    def store(self, url: str, body: str, etag: Optional[str] = None,
+              last_modified: Optional[str] = None) -> CachedPage:
+        entry = CachedPage(
+            url=url,
+            etag=etag,
+            last_modified=last_modified,
+            content_hash=content_hash(body),
+            stored_at=time.time(),
+        )
+        meta_path, body_path = self._paths(url)
+        # Body first, so metadata never points at a missing body
+        self._write_atomic(body_path, gzip.compress(body.encode('utf-8')))
+        self._write_atomic(meta_path, json.dumps({
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_hash': entry.content_hash,
+            'stored_at': entry.stored_at,
+        }).encode('utf-8'))
+        return entry
+
+    def conditional_headers(self, entry: Optional[CachedPage]) -> dict:
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+
+def get_default_cache() -> Optional[SnapshotCache]:
+    """Return the configured committers.top snapshot cache, if enabled."""
+    from django.conf import settings
+
+    directory = getattr(settings, 'COMMITTERS_TOP_CACHE_DIR', None)
+    return SnapshotCache(directory) if directory else None
@@ -0,0 +1,260 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from badges.services.badge_data import invalidate_badges
+from badges.services.badge_warmup import schedule_warmup
+from ..models import Country, GitHubUser
+from .github_api import GitHubAPIClient
+from .http_cache import PageSnapshot
+from . import autocomplete
+from .leaderboard import rebuild_leaderboards
+from .stats_history import record_user_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_changed_country_users(client: GitHubAPIClient, country: Country, max_users: int = 256,
+                                force: bool = False) -> Optional[Tuple[PageSnapshot, List[Dict[str, Any]]]]:
+    """Fetch a country page and parse it only if its content changed.
+
+    Returns ``None`` when committers.top answered 304 or served a body whose
+    hash matches the last page stored for the country, so callers can skip
+    the parse-and-upsert pipeline entirely.
+    """
+    page = client.fetch_country_page(country.slug)
+    if not force and country.page_hash and page.content_hash == country.page_hash:
+        return None
+    return page, client.parse_country_page(page, max_users=max_users)
+
+
+def upsert_country_users(country: Country, users: List[Dict[str, Any]], page_hash: Optional[str] = None) -> int:
+    """Create or update the ``GitHubUser`` rows parsed from a country page.
+
+    ``page_hash`` is recorded on the country once the rows are written so the
+    next unchanged download can be skipped.
+
+    Returns the number of users written.
+    """
+    user_objs = []
+    for user_data in users:
+        user_objs.append(GitHubUser(
+            github_username=user_data['username'],
+            first_name=user_data.get('first_name', ''),
+            middle_name=user_data.get('middle_name', ''),
+            last_name=user_data.get('last_name', ''),
+            followers=user_data.get('followers', 0),
+            contributions_last_year=user_data.get('contributions', 0),
+            country=country,
+            rank=user_data.get('rank', 0),
+            profile_url=user_data.get('profile_url', f"https://github.com/{user_data['username']}"),
+            avatar_url=user_data.get('avatar_url', f"https://github.com/{user_data['username']}.png")
+        ))
+
+    existing = GitHubUser.objects.filter(
+        github_username__in=[obj.github_username for obj in user_objs]
+    )
+    existing_map = {user.github_username: user for user in existing}
+
+    to_create = []
+    to_update = []
+
+    for obj in user_objs:
+        if obj.github_username in existing_map:
+            existing_user = existing_map[obj.github_username]
+            # Update existing fields
+            existing_user.followers = obj.followers
+            existing_user.contributions_last_year = obj.contributions_last_year
+            existing_user.rank = obj.rank
+            existing_user.profile_url = obj.profile_url
+            existing_user.avatar_url = obj.avatar_url
+            # Update name fields only if provided (non-empty)
+            if obj.first_name:
+                existing_user.first_name = obj.first_name
+            if obj.middle_name:
+                existing_user.middle_name = obj.middle_name
+            if obj.last_name:
+                existing_user.last_name = obj.last_name
+            to_update.append(existing_user)  # now includes PK
+        else:
+            to_create.append(obj)
+
+    if to_create:
+        GitHubUser.objects.bulk_create(to_create)
+
+    if to_update:
+        GitHubUser.objects.bulk_update(
+            to_update,
+            ['followers', 'contributions_last_year', 'rank', 'profile_url', 'avatar_url', 'first_name', 'middle_name', 'last_name']
+        )
+
+    record_user_snapshots(
+        GitHubUser.objects.filter(github_username__in=[obj.github_username for obj in user_objs])
+    )
+    invalidate_badges(obj.github_username for obj in user_objs)
+
+    # Update country stats
+    country.user_count = len(user_objs)
+    country.last_updated = timezone.now()
+    update_fields = ['user_count', 'last_updated']
+    if page_hash is not None:
+        country.page_hash = page_hash
+        update_fields.append('page_hash')
+    country.save(update_fields=update_fields)
+    return len(user_objs)
+
+
+class HostLimitedAdapter(HTTPAdapter):
+    """HTTP adapter that caps the number of in-flight requests per host.
+
+    The cap is global to every thread sharing the session, so a large worker
+    pool cannot open more than ``per_host_limit`` connections to one server.
+    """
+
+    def __init__(self, per_host_limit: int, **kwargs):
+        self.per_host_limit = per_host_limit
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._semaphores_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def _semaphore_for(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._semaphores_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+
+    def send(self, request, **kwargs):
+        with self._semaphore_for(request.url):
+            return super().send(request, **kwargs)
+
+
+def build_shared_session(pool_size: int, per_host_limit: int) -> requests.Session:
+    """Build one keep-alive session to be shared by every ingestion worker."""
+    session = requests.Session()
+    adapter = HostLimitedAdapter(
+        per_host_limit=per_host_limit,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+@dataclass
+class IngestionProgress:
+    """Running totals for an ingestion run."""
+    total: int
+    completed: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    users: int = 0
+    failed_countries: List[str] = field(default_factory=list)
+    updated_country_ids: List[int] = field(default_factory=list)
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'completed': self.completed,
+            'unchanged': self.unchanged,
+            'failed': self.failed,
+            'users': self.users,
+            'failed_countries': self.failed_countries,
+            'elapsed': round(self.elapsed, 2),
+        }
+
+
+class CountryIngestionEngine:
+    """Fetch committers.top pages for many countries concurrently.
+
+    Pages are downloaded and parsed on a bounded thread pool that shares a
+    single connection pool; database writes happen on the calling thread as
+    each page completes, so worker threads never touch the ORM.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        per_host_limit: Optional[int] = None,
+        base_url: Optional[str] = None,
+        max_users: int = 256,
+        force: bool = False,
+        progress_callback: Optional[Callable[[IngestionProgress], None]] = None,
+    ):
+        self.max_workers = max_workers or settings.INGEST_MAX_WORKERS
+        self.per_host_limit = per_host_limit or settings.INGEST_PER_HOST_LIMIT
+        self.max_users = max_users
+        self.force = force
+        self.progress_callback = progress_callback
+        self.session = build_shared_session(self.max_workers, self.per_host_limit)
+        self.client = GitHubAPIClient(session=self.session, base_url=base_url)
+
+    def _fetch(self, country: Country):
+        return fetch_changed_country_users(self.client, country, max_users=self.max_users, force=self.force)
+
+    def _report(self, progress: IngestionProgress) -> None:
+        if self.progress_callback:
+            try:
+                self.progress_callback(progress)
+            except Exception as e:
+                logger.warning(f"Ingestion progress callback failed: {e}")
+
+    def run(self, countries: Optional[Iterable[Country]] = None) -> IngestionProgress:
+        countries = list(countries if countries is not None else Country.objects.all())
+        progress = IngestionProgress(total=len(countries))
+        if not countries:
+            return progress
+
+        Country.objects.filter(id__in=[c.id for c in countries]).update(is_fetching=True)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ingest') as executor:
+                futures = {executor.submit(self._fetch, country): country for country in countries}
+                for future in as_completed(futures):
+                    country = futures[future]
+                    try:
+                        result = future.result()
+                        if result is None:
+                            progress.unchanged += 1
+                        else:
+                            page, users = result
+                            progress.users += upsert_country_users(country, users, page_hash=page.content_hash)
+                            progress.updated_country_ids.append(country.id)
+                        progress.completed += 1
+                    except Exception as e:
+                        logger.error(f"Error ingesting users for {country.name}: {e}")
+                        progress.failed += 1
+                        progress.failed_countries.append(country.slug)
+                    finally:
+                        Country.objects.filter(id=country.id).update(is_fetching=False)
+                    self._report(progress)
+        finally:
+            Country.objects.filter(id__in=[c.id for c in countries]).update(is_fetching=False)
+            self.session.close()
+
+        if progress.updated_country_ids:
+            rebuild_leaderboards(progress.updated_country_ids)
+            autocomplete.patch_countries(progress.updated_country_ids)
+            schedule_warmup(progress.updated_country_ids)
+
+        logger.info(
+            f"Ingested {progress.users} users from {progress.completed}/{progress.total} countries "
+            f"in {progress.elapsed:.1f}s ({progress.unchanged} unchanged, {progress.failed} failed)"
+        )
+        return progress
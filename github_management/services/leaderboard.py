@@ -0,0 +1,163 @@
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Country, GitHubUser
+from .stats_writer import supports_update_from_values, update_from_values
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard order; the primary key keeps ties stable between rebuilds and
+# doubles as the keyset pagination key of country pages
+LEADERBOARD_ORDER = ('-contributions_last_year', 'pk')
+
+WRITE_CHUNK = 1000
+
+GLOBAL_PENDING_KEY = 'leaderboard:global:pending'
+GLOBAL_LOCK_KEY = 'leaderboard:global:lock'
+# Upper bound of one global pass; the lock is released earlier when it finishes
+GLOBAL_LOCK_TIMEOUT = 30 * 60
+
+
+def _write(rows: List[GitHubUser], fields: List[str]) -> None:
+    for start in range(0, len(rows), WRITE_CHUNK):
+        chunk = rows[start:start + WRITE_CHUNK]
+        if supports_update_from_values():
+            update_from_values(GitHubUser, chunk, fields)
+        else:
+            GitHubUser.objects.bulk_update(chunk, fields)
+
+
+def _invalidate_badges(usernames: List[str]) -> None:
+    """Drop the cached badges of rows that moved, once the new ranks are committed.
+
+    Invalidating earlier would let a request re-read and re-cache the old ranks.
+    """
+    from badges.services.badge_data import invalidate_badges
+
+    if usernames:
+        transaction.on_commit(lambda: invalidate_badges(usernames))
+
+
+def _percentile(rank: int, size: int) -> float:
+    """Share of the country ranked at or above ``rank`` (1.0 = top 1%)."""
+    return round(rank / size * 100, 1) if size else 100.0
+
+
+def rank_country(country: Country) -> int:
+    """Recompute ``country_rank``/``country_percentile`` for one country.
+
+    Only rows whose values moved are written, and only their badges invalidated.
+
+    Returns:
+        Number of rows written
+    """
+    rows = list(
+        GitHubUser.objects.filter(country=country)
+        .order_by(*LEADERBOARD_ORDER)
+        .values_list('pk', 'github_username', 'country_rank', 'country_percentile')
+    )
+    size = len(rows)
+    changed, moved = [], []
+    for position, (pk, username, old_rank, old_percentile) in enumerate(rows, start=1):
+        percentile = _percentile(position, size)
+        if old_rank != position or old_percentile != percentile:
+            changed.append(GitHubUser(pk=pk, country_rank=position, country_percentile=percentile))
+            moved.append(username)
+    _write(changed, ['country_rank', 'country_percentile'])
+    _invalidate_badges(moved)
+
+    Country.objects.filter(pk=country.pk).update(
+        leaderboard_size=size,
+        leaderboard_updated_at=timezone.now(),
+    )
+    return len(changed)
+
+
+def rank_global() -> int:
+    """Recompute ``global_rank`` across all countries, writing (and invalidating) only rows that moved."""
+    changed, moved = [], []
+    rows = GitHubUser.objects.order_by(*LEADERBOARD_ORDER).values_list('pk', 'github_username', 'global_rank')
+    for position, (pk, username, old_rank) in enumerate(rows.iterator(chunk_size=5000), start=1):
+        if old_rank != position:
+            changed.append(GitHubUser(pk=pk, global_rank=position))
+            moved.append(username)
+    _write(changed, ['global_rank'])
+    _invalidate_badges(moved)
+    return len(changed)
+
+
+def schedule_global_rank() -> bool:
+    """Queue one ``rank_global`` pass ``LEADERBOARD_GLOBAL_DEBOUNCE`` seconds from now.
+
+    Calls within that window share the queued pass, so bursts of country
+    rebuilds cost a single scan of the users table.
+
+    Returns:
+        Whether this call queued the pass
+    """
+    from ..tasks import rebuild_global_ranks
+
+    if not cache.add(GLOBAL_PENDING_KEY, 1, settings.LEADERBOARD_GLOBAL_DEBOUNCE + 60):
+        return False
+    try:
+        rebuild_global_ranks.apply_async(countdown=settings.LEADERBOARD_GLOBAL_DEBOUNCE)
+    except Exception:
+        cache.delete(GLOBAL_PENDING_KEY)
+        raise
+    return True
+
+
+def run_global_rank() -> Optional[int]:
+    """Run the queued global pass; ``None`` if another one is still running."""
+    if not cache.add(GLOBAL_LOCK_KEY, 1, GLOBAL_LOCK_TIMEOUT):
+        return None
+    try:
+        # Changes from here on need another pass
+        cache.delete(GLOBAL_PENDING_KEY)
+        moved = rank_global()
+    finally:
+        cache.delete(GLOBAL_LOCK_KEY)
+    logger.info(f"Global leaderboard rebuilt: {moved} global ranks moved")
+    return moved
+
+
+def rebuild_leaderboards(country_ids: Optional[Iterable[int]] = None, full: bool = False) -> Dict[str, int]:
+    """Materialize leaderboard positions.
+
+    Args:
+        country_ids: Countries whose users changed; only these are locked and
+            re-ranked, and the global pass is debounced into
+            ``rebuild_global_ranks`` (incremental mode). Ignored when ``full``
+            is set.
+        full: Re-rank every country and the global leaderboard inline
+
+    Returns:
+        Counts of countries re-ranked and rows written
+    """
+    result = {'countries': 0, 'country_rows': 0, 'global_rows': 0}
+    full = full or country_ids is None
+    with transaction.atomic():
+        # Row locks (taken in pk order) serialize rebuilds of the same country
+        countries = Country.objects.select_for_update().order_by('pk')
+        if not full:
+            countries = countries.filter(pk__in=list(country_ids))
+        for country in countries:
+            result['country_rows'] += rank_country(country)
+            result['countries'] += 1
+
+    if full:
+        result['global_rows'] = rank_global()
+    elif result['countries']:
+        # Any country's changes can shift everyone's global position
+        schedule_global_rank()
+
+    logger.info(
+        f"Leaderboards rebuilt for {result['countries']} countries: "
+        f"{result['country_rows']} country ranks and {result['global_rows']} global ranks moved"
+    )
+    return result
@@ -0,0 +1,173 @@
+import logging
+import time
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+
+
+def get_redis_client(url: Optional[str] = None):
+    """Return a shared Redis client for ``url`` (default: REFRESH_COORDINATOR_URL)."""
+    import redis
+
+    url = url or settings.REFRESH_COORDINATOR_URL
+    client = _clients.get(url)
+    if client is None:
+        client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        _clients[url] = client
+    return client
+
+
+class RefreshCoordinator:
+    """Coalesce stats-refresh requests for one user model into windowed batches.
+
+    Page views call :meth:`request` with the stale IDs they saw. IDs are added
+    to a Redis set, so repeated requests for the same user collapse into one
+    entry, and users that are already queued, in flight or were refreshed
+    within ``cooldown`` seconds are skipped. The first request of a window
+    schedules a single flush task ``window`` seconds later which drains the
+    set into ``update_users_stats_batch`` jobs. The broker therefore only sees
+    one job per batch of distinct stale users, regardless of traffic.
+
+    If Redis is unreachable the request falls back to enqueueing directly.
+    """
+
+    KEY_PREFIX = 'refresh'
+
+    def __init__(self, model_name: str, client=None, window: Optional[int] = None,
+                 cooldown: Optional[int] = None, inflight_ttl: Optional[int] = None):
+        self.model_name = model_name
+        self._client = client
+        self.window = window if window is not None else settings.REFRESH_COALESCE_WINDOW
+        self.cooldown = cooldown if cooldown is not None else settings.REFRESH_COOLDOWN
+        self.inflight_ttl = inflight_ttl if inflight_ttl is not None else settings.REFRESH_INFLIGHT_TTL
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_redis_client()
+        return self._client
+
+    def _key(self, name: str) -> str:
+        return f'{self.KEY_PREFIX}:{self.model_name}:{name}'
+
+    def request(self, user_ids: Iterable[int]) -> int:
+        """Ask for a refresh of ``user_ids``.
+
+        Returns:
+            Number of users newly queued by this call
+        """
+        import redis
+
+        user_ids = list(dict.fromkeys(int(pk) for pk in user_ids))
+        if not user_ids:
+            return 0
+        try:
+            return self._request(user_ids)
+        except redis.RedisError as e:
+            logger.warning(f"Refresh coordinator unavailable ({e}); enqueueing {len(user_ids)} users directly")
+            from ..tasks import update_users_stats_batch
+            update_users_stats_batch.delay(user_ids, self.model_name)
+            return len(user_ids)
+
+    def _available(self, user_ids: List[int]) -> List[int]:
+        """Drop IDs that are in flight or inside their cooldown."""
+        now = time.time()
+        inflight, recent = self._key('inflight'), self._key('recent')
+
+        pipe = self.client.pipeline()
+        # Forget finished cooldowns and in-flight entries whose task apparently died
+        pipe.zremrangebyscore(recent, '-inf', now - self.cooldown)
+        pipe.zremrangebyscore(inflight, '-inf', now - self.inflight_ttl)
+        pipe.zmscore(inflight, user_ids)
+        pipe.zmscore(recent, user_ids)
+        _, _, inflight_scores, recent_scores = pipe.execute()
+
+        return [
+            pk for pk, busy, fresh in zip(user_ids, inflight_scores, recent_scores)
+            if busy is None and fresh is None
+        ]
+
+    def _request(self, user_ids: List[int]) -> int:
+        candidates = self._available(user_ids)
+        if not candidates:
+            return 0
+
+        added = self.client.sadd(self._key('pending'), *candidates)
+        # Only the first request of a window schedules the flush
+        if added and self.client.set(self._key('flush_lock'), 1, nx=True, ex=self.window + 60):
+            from ..tasks import flush_refresh_queue
+            try:
+                flush_refresh_queue.apply_async(args=[self.model_name], countdown=self.window)
+            except Exception:
+                # Let the next request retry scheduling instead of waiting out the lock
+                self.client.delete(self._key('flush_lock'))
+                raise
+        return added
+
+    def claim(self, user_ids: Iterable[int]) -> List[int]:
+        """Mark ``user_ids`` in flight for a caller that enqueues them itself.
+
+        Returns:
+            The IDs that were not already in flight or cooling down (all of
+            them if Redis is unreachable)
+        """
+        import redis
+
+        user_ids = list(dict.fromkeys(int(pk) for pk in user_ids))
+        if not user_ids:
+            return []
+        try:
+            claimed = self._available(user_ids)
+            if claimed:
+                self.client.zadd(self._key('inflight'), {pk: time.time() for pk in claimed})
+            return claimed
+        except redis.RedisError as e:
+            logger.warning(f"Refresh coordinator unavailable ({e}); not deduplicating {len(user_ids)} users")
+            return user_ids
+
+    def drain(self) -> List[int]:
+        """Pop every pending ID and mark it in flight."""
+        # Release the window first so requests arriving during the drain schedule a new flush
+        self.client.delete(self._key('flush_lock'))
+        pipe = self.client.pipeline(transaction=True)
+        pipe.smembers(self._key('pending'))
+        pipe.delete(self._key('pending'))
+        members, _ = pipe.execute()
+        user_ids = sorted(int(pk) for pk in members)
+        if user_ids:
+            now = time.time()
+            self.client.zadd(self._key('inflight'), {pk: now for pk in user_ids})
+        return user_ids
+
+    def mark_refreshed(self, user_ids: Iterable[int]) -> None:
+        """Move ``user_ids`` from in flight to the cooldown set."""
+        import redis
+
+        user_ids = [int(pk) for pk in user_ids]
+        if not user_ids:
+            return
+        try:
+            now = time.time()
+            pipe = self.client.pipeline()
+            pipe.zrem(self._key('inflight'), *user_ids)
+            pipe.zadd(self._key('recent'), {pk: now for pk in user_ids})
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not record refreshed {self.model_name} users: {e}")
+
+    def stats(self) -> dict:
+        pipe = self.client.pipeline()
+        pipe.scard(self._key('pending'))
+        pipe.zcard(self._key('inflight'))
+        pipe.zcard(self._key('recent'))
+        pending, inflight, recent = pipe.execute()
+        return {'pending': pending, 'inflight': inflight, 'recent': recent}
+
+
+def request_refresh(user_ids: Iterable[int], model_name: str = 'GitHubUser') -> int:
+    """Convenience wrapper used by managers and views."""
+    return RefreshCoordinator(model_name).request(user_ids)
@@ -0,0 +1,109 @@
+import logging
+import random
+from typing import List, Optional
+
+from django.db.models import Max
+
+from ..models import Country, GitHubFollowAction, GitHubUser
+
+logger = logging.getLogger(__name__)
+
+# Ranks drawn per missing user; covers rows excluded or renumbered since the last rebuild
+OVERSAMPLE = 2
+MAX_ROUNDS = 4
+
+
+class RandomUserSampler:
+    """Draw random GitHub users without sorting the table.
+
+    The materialized leaderboard numbers users densely (``global_rank`` from
+    1 to N, ``country_rank`` from 1 to the country's ``leaderboard_size``),
+    so a uniform sample is a handful of random ranks looked up through their
+    indexes. Users the requester already has a follow action for are
+    rejected and replaced in further rounds, so the cost grows with the
+    number of users asked for, not with the table.
+
+    When the rounds still come up short (the requester already follows most
+    of the population) the rest is filled by the unsorted scan, so a page is
+    only short if there really aren't enough unfollowed users.
+    """
+
+    def __init__(self, user=None, country: Optional[Country] = None):
+        self.user = user if getattr(user, 'is_authenticated', False) else None
+        self.country = country
+
+    def _rank_field(self) -> str:
+        return 'country_rank' if self.country else 'global_rank'
+
+    def _population(self) -> int:
+        if self.country:
+            return self.country.leaderboard_size
+        # MAX over an indexed column is a single index probe
+        return GitHubUser.objects.aggregate(size=Max('global_rank'))['size'] or 0
+
+    def _queryset(self):
+        qs = GitHubUser.objects.select_related('country')
+        if self.country:
+            qs = qs.filter(country=self.country)
+        return qs
+
+    def _excluded(self, ids) -> set:
+        if not self.user or not ids:
+            return set()
+        return set(
+            GitHubFollowAction.objects.filter(user=self.user, github_user_id__in=ids)
+            .values_list('github_user_id', flat=True)
+        )
+
+    def _fallback(self, count: int, exclude_ids: set) -> List[GitHubUser]:
+        """Unsorted scan, for trees whose leaderboard was never built or requesters who followed most users."""
+        qs = self._queryset().exclude(pk__in=exclude_ids)
+        if self.user:
+            qs = qs.exclude(follow_actions__user=self.user)
+        return list(qs.order_by('?')[:count])
+
+    def sample(self, count: int) -> List[GitHubUser]:
+        """Return up to ``count`` random users the requester has not followed yet."""
+        population = self._population()
+        if not population:
+            return self._fallback(count, set())
+
+        rank_field = self._rank_field()
+        tried = set()
+        picked: List[GitHubUser] = []
+        for _ in range(MAX_ROUNDS):
+            missing = count - len(picked)
+            if missing <= 0:
+                break
+            untried = population - len(tried)
+            if untried <= 0:
+                break
+            wanted = min(missing * OVERSAMPLE, untried)
+            if untried <= wanted * 4:
+                # Small or nearly exhausted population: draw from what is left directly
+                ranks = set(random.sample(sorted(set(range(1, population + 1)) - tried), wanted))
+            else:
+                ranks = set()
+                while len(ranks) < wanted:
+                    rank = random.randint(1, population)
+                    if rank not in tried:
+                        ranks.add(rank)
+            tried |= ranks
+
+            candidates = list(self._queryset().filter(**{f'{rank_field}__in': ranks}))
+            excluded = self._excluded([user.pk for user in candidates])
+            picked += [user for user in candidates if user.pk not in excluded][:missing]
+
+        if len(picked) < count:
+            logger.debug(
+                f"Sampler found {len(picked)}/{count} unfollowed users in {MAX_ROUNDS} rounds "
+                f"(population {population}); filling up with a scan"
+            )
+            picked += self._fallback(count - len(picked), {user.pk for user in picked})
+        random.shuffle(picked)
+        return picked
+
+
+def sample_users(count: int, user=None, country: Optional[Country] = None) -> List[GitHubUser]:
+    """Shortcut for ``RandomUserSampler(user, country).sample(count)``."""
+    return RandomUserSampler(user=user, country=country).sample(count)
@@ -0,0 +1,156 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from django.db import DatabaseError, OperationalError, connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from ..models import GitHubUser
+
+logger = logging.getLogger(__name__)
+
+# Must match the indexed expressions created by migration 0013_user_search_index
+SEARCH_EXPR = "lower(coalesce(github_username, '') || ' ' || coalesce(first_name, '') || ' ' || coalesce(last_name, ''))"
+LOGIN_EXPR = "lower(github_username)"
+FTS_TABLE = 'github_user_search'
+# Trigram indexes only help from three characters; shorter queries are login prefixes
+MIN_TRIGRAM_LENGTH = 3
+
+
+def _like_escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_result(user) -> Dict[str, Any]:
+    """The JSON shape returned by the search endpoints for one user."""
+    return {
+        'github_username': user.github_username,
+        'name': user.full_name,
+        'avatar_url': user.avatar_url or '',
+        'url': user.get_absolute_url(),
+        'country': user.country.name if user.country else '',
+    }
+
+
+class ContainsSearch:
+    """Unindexed ``icontains`` search, for databases without a search index."""
+    name = 'contains'
+
+    def search(self, query: str, limit: int) -> List[GitHubUser]:
+        return list(
+            GitHubUser.objects.select_related('country').filter(
+                Q(github_username__icontains=query) |
+                Q(first_name__icontains=query) |
+                Q(last_name__icontains=query)
+            ).order_by('-contributions_last_year')[:limit]
+        )
+
+
+class TrigramSearch:
+    """PostgreSQL ``pg_trgm`` search over login and name.
+
+    Substring matches use the GIN trigram index on ``SEARCH_EXPR`` and are
+    ranked exact login, then login prefix, then trigram similarity. Queries
+    shorter than a trigram are login prefixes served by the
+    ``text_pattern_ops`` index in login order.
+    """
+    name = 'trigram'
+
+    def search(self, query: str, limit: int) -> List[GitHubUser]:
+        needle = query.lower()
+        users = GitHubUser.objects.select_related('country')
+        if len(needle) < MIN_TRIGRAM_LENGTH:
+            users = users.filter(
+                RawSQL(f"{LOGIN_EXPR} LIKE %s", (f"{_like_escape(needle)}%",), output_field=BooleanField())
+            ).annotate(search_login=RawSQL(LOGIN_EXPR, ()))
+            return list(users.order_by('search_login')[:limit])
+
+        users = users.filter(
+            RawSQL(f"{SEARCH_EXPR} LIKE %s", (f"%{_like_escape(needle)}%",), output_field=BooleanField())
+        ).annotate(search_rank=RawSQL(
+            f"CASE WHEN {LOGIN_EXPR} = %s THEN 2 WHEN {LOGIN_EXPR} LIKE %s THEN 1 ELSE 0 END"
+            f" + similarity({SEARCH_EXPR}, %s)",
+            (needle, f"{_like_escape(needle)}%", needle),
+            output_field=FloatField(),
+        ))
+        return list(users.order_by('-search_rank', '-contributions_last_year')[:limit])
+
+
+class FTS5Search:
+    """SQLite FTS5 search (trigram tokenizer) for local development.
+
+    The external-content table ``github_user_search`` is kept in step with
+    ``GitHubUser`` by triggers; an exact login comes first, other matches
+    are ranked by bm25 with the login weighted over the name columns, then
+    loaded with their country in one query.
+    """
+    name = 'fts5'
+
+    def search(self, query: str, limit: int) -> List[GitHubUser]:
+        users = GitHubUser.objects.select_related('country')
+        if len(query) < MIN_TRIGRAM_LENGTH:
+            return list(users.filter(github_username__istartswith=query).order_by('github_username')[:limit])
+
+        phrase = '"' + query.replace('"', '""') + '"'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY github_username = %s COLLATE NOCASE DESC, bm25({FTS_TABLE}, 10.0, 1.0, 1.0) LIMIT %s",
+                [phrase, query, limit],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        found = users.in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
+
+
+_backend = None
+
+
+def _fts_index_ready() -> bool:
+    """The FTS5 table and the triggers that keep it current both exist.
+
+    SQLite drops a table's triggers when a migration rebuilds the table; a
+    stale index would silently miss users, so without them search falls back.
+    """
+    names = [FTS_TABLE] + [f'{FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au')]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names
+            )
+            return cursor.fetchone()[0] == len(names)
+    except OperationalError:
+        return False
+
+
+def _trigram_available() -> bool:
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            return cursor.fetchone() is not None
+    except DatabaseError:
+        return False
+
+
+def get_search_backend():
+    """The search backend for the default database (resolved once per process)."""
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'postgresql' and _trigram_available():
+            _backend = TrigramSearch()
+        elif connection.vendor == 'sqlite' and _fts_index_ready():
+            _backend = FTS5Search()
+        else:
+            _backend = ContainsSearch()
+            if connection.vendor == 'postgresql':
+                logger.warning("pg_trgm is not installed; user search falls back to unindexed icontains")
+        logger.info(f"User search backend: {_backend.name}")
+    return _backend
+
+
+def search_users(query: str, limit: int = 10, backend: Optional[object] = None) -> List[GitHubUser]:
+    """Ranked ``GitHubUser`` matches for ``query``, with ``country`` loaded."""
+    query = query.strip()
+    if not query:
+        return []
+    return (backend or get_search_backend()).search(query, limit)
@@ -0,0 +1,148 @@
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db.models import Count, Exists, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from ..models import CountryStatsSnapshot, GitHubUser, GitHubUserSnapshot
+
+logger = logging.getLogger(__name__)
+
+TRACKED_FIELDS = ('followers', 'following', 'contributions_last_year', 'rank')
+
+
+def record_user_snapshots(users: Iterable[GitHubUser], day: Optional[date] = None) -> int:
+    """Append today's stats for ``users`` whose tracked values changed.
+
+    Each user is compared with its latest snapshot; users without history
+    always get a first row. A second change on the same day overwrites that
+    day's row.
+
+    Returns:
+        Number of snapshot rows written
+    """
+    users = [user for user in users if user.pk]
+    if not users:
+        return 0
+    day = day or timezone.localdate()
+
+    latest_day = GitHubUserSnapshot.objects.filter(user_id=OuterRef('user_id')).order_by('-day').values('day')[:1]
+    latest = {
+        row[0]: row[1:]
+        for row in GitHubUserSnapshot.objects.filter(
+            user_id__in=[user.pk for user in users],
+            day=Subquery(latest_day),
+        ).values_list('user_id', *TRACKED_FIELDS)
+    }
+
+    rows = []
+    for user in users:
+        values = tuple(getattr(user, name) for name in TRACKED_FIELDS)
+        if latest.get(user.pk) == values:
+            continue
+        rows.append(GitHubUserSnapshot(
+            user_id=user.pk,
+            country_id=user.country_id,
+            day=day,
+            **dict(zip(TRACKED_FIELDS, values)),
+        ))
+
+    if rows:
+        GitHubUserSnapshot.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user', 'day'],
+            update_fields=list(TRACKED_FIELDS),
+            batch_size=500,
+        )
+    return len(rows)
+
+
+def record_country_snapshots(day: Optional[date] = None) -> int:
+    """Store today's per-country totals (one aggregate query for all countries)."""
+    day = day or timezone.localdate()
+    totals = GitHubUser.objects.values('country_id').annotate(
+        user_total=Count('id'),
+        follower_total=Sum('followers'),
+        contribution_total=Sum('contributions_last_year'),
+    )
+    rows = [
+        CountryStatsSnapshot(
+            country_id=row['country_id'],
+            day=day,
+            users=row['user_total'],
+            followers=row['follower_total'] or 0,
+            contributions_last_year=row['contribution_total'] or 0,
+        )
+        for row in totals
+    ]
+    CountryStatsSnapshot.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['country', 'day'],
+        update_fields=['users', 'followers', 'contributions_last_year'],
+    )
+    return len(rows)
+
+
+def _thin(queryset, trunc) -> int:
+    """Delete every snapshot that is not the last one of its user and period."""
+    later_in_period = GitHubUserSnapshot.objects.filter(
+        user_id=OuterRef('user_id'),
+        day__gt=OuterRef('day'),
+    ).annotate(period=trunc('day')).filter(period=OuterRef('period'))
+    doomed = queryset.annotate(period=trunc('day')).filter(Exists(later_in_period))
+    deleted, _ = GitHubUserSnapshot.objects.filter(pk__in=doomed.values('pk')).delete()
+    return deleted
+
+
+def downsample_user_snapshots(today: Optional[date] = None) -> Dict[str, int]:
+    """Apply the snapshot retention policy.
+
+    Rows younger than ``STATS_HISTORY_DAILY_DAYS`` stay daily, rows up to
+    ``STATS_HISTORY_WEEKLY_DAYS`` old are thinned to the last row of each
+    week, and older rows to the last row of each month.
+    """
+    today = today or timezone.localdate()
+    daily_cutoff = today - timedelta(days=settings.STATS_HISTORY_DAILY_DAYS)
+    weekly_cutoff = today - timedelta(days=settings.STATS_HISTORY_WEEKLY_DAYS)
+
+    result = {'weekly': 0, 'monthly': 0}
+    # Work through users in id ranges to keep each DELETE short
+    max_id = GitHubUserSnapshot.objects.aggregate(m=Max('user_id'))['m'] or 0
+    step = settings.STATS_HISTORY_DOWNSAMPLE_CHUNK
+    for start in range(0, max_id + 1, step):
+        users = GitHubUserSnapshot.objects.filter(user_id__gte=start, user_id__lt=start + step)
+        result['weekly'] += _thin(users.filter(day__lt=daily_cutoff, day__gte=weekly_cutoff), TruncWeek)
+        result['monthly'] += _thin(users.filter(day__lt=weekly_cutoff), TruncMonth)
+    return result
+
+
+def _series(rows, fields) -> List[Dict[str, Any]]:
+    return [{'day': row['day'].isoformat(), **{name: row[name] for name in fields}} for row in rows]
+
+
+def user_trend(user: GitHubUser, days: int = 365) -> List[Dict[str, Any]]:
+    """Change points for one user over the last ``days`` days (a range scan on the (user, day) index).
+
+    The point just before the window is included so the series starts with
+    the value the user had on the first day.
+    """
+    since = timezone.localdate() - timedelta(days=days)
+    snapshots = GitHubUserSnapshot.objects.filter(user=user)
+    rows = list(snapshots.filter(day__gte=since).order_by('day').values('day', *TRACKED_FIELDS))
+    before = snapshots.filter(day__lt=since).order_by('-day').values('day', *TRACKED_FIELDS).first()
+    if before:
+        rows.insert(0, before)
+    return _series(rows, TRACKED_FIELDS)
+
+
+def country_trend(country, days: int = 365) -> List[Dict[str, Any]]:
+    """Daily totals for one country over the last ``days`` days."""
+    since = timezone.localdate() - timedelta(days=days)
+    fields = ('users', 'followers', 'contributions_last_year')
+    rows = CountryStatsSnapshot.objects.filter(country=country, day__gte=since).order_by('day').values('day', *fields)
+    return _series(rows, fields)
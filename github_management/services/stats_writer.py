@@ -0,0 +1,211 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .freshness import refresh_interval
+
+logger = logging.getLogger(__name__)
+
+# (model field, REST API field) pairs copied verbatim when they differ
+PROFILE_FIELD_MAP = [
+    ('github_id', 'id'),
+    ('github_node_id', 'node_id'),
+    ('display_name', 'name'),
+    ('company', 'company'),
+    ('blog', 'blog'),
+    ('location', 'location'),
+    ('email_public', 'email'),
+    ('hireable', 'hireable'),
+    ('bio', 'bio'),
+    ('twitter_username', 'twitter_username'),
+    ('public_repos', 'public_repos'),
+    ('public_gists', 'public_gists'),
+    ('account_type', 'type'),
+    ('user_view_type', 'user_view_type'),
+    ('site_admin', 'site_admin'),
+]
+
+DATETIME_FIELD_MAP = [
+    ('github_created_at', 'created_at'),
+    ('github_updated_at', 'updated_at'),
+]
+
+
+def apply_github_user_data(user, user_data: Dict[str, Any]) -> List[str]:
+    """Copy fetched GitHub data onto ``user`` without saving it.
+
+    Returns:
+        Names of the fields whose value actually changed
+    """
+    changed = []
+
+    if user_data.get('followers') is not None and user.followers != user_data['followers']:
+        user.followers = user_data['followers']
+        changed.append('followers')
+
+    if user_data.get('following') is not None and user.following != user_data['following']:
+        user.following = user_data['following']
+        changed.append('following')
+
+    contributions = user_data.get('contributions', {})
+    contributions_last_year = contributions.get('last_year', 0)
+    if user.contributions_last_year != contributions_last_year:
+        user.contributions_last_year = contributions_last_year
+        changed.append('contributions_last_year')
+
+    if user_data.get('avatar_url') and user.avatar_url != user_data['avatar_url']:
+        user.avatar_url = user_data['avatar_url']
+        changed.append('avatar_url')
+
+    if user_data.get('html_url') and user.profile_url != user_data['html_url']:
+        user.profile_url = user_data['html_url']
+        changed.append('profile_url')
+
+    for model_field, api_field in PROFILE_FIELD_MAP:
+        if api_field in user_data and getattr(user, model_field, None) != user_data.get(api_field):
+            setattr(user, model_field, user_data.get(api_field))
+            changed.append(model_field)
+
+    for model_field, api_field in DATETIME_FIELD_MAP:
+        if user_data.get(api_field):
+            dt = parse_datetime(user_data[api_field])
+            if dt and getattr(user, model_field) != dt:
+                setattr(user, model_field, dt)
+                changed.append(model_field)
+
+    return changed
+
+
+def supports_update_from_values() -> bool:
+    """Whether the backend accepts ``UPDATE ... FROM (VALUES ...)``."""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        import sqlite3
+        return sqlite3.sqlite_version_info >= (3, 33, 0)
+    return False
+
+
+def update_from_values(model_class, objs, fields: List[str]) -> int:
+    """Write ``fields`` of ``objs`` in one ``UPDATE ... FROM (VALUES ...)`` statement.
+
+    Unlike ``bulk_update``'s ``CASE WHEN pk = ...`` per column, the database
+    joins the VALUES list on the primary key, so the cost stays linear in the
+    number of rows.
+
+    Returns:
+        Number of rows updated
+    """
+    if not objs:
+        return 0
+    meta = model_class._meta
+    qn = connection.ops.quote_name
+    pk_field = meta.pk
+    columns = [meta.get_field(name) for name in fields]
+
+    if connection.vendor == 'postgresql':
+        # Untyped parameters in VALUES default to text; cast them to the column types
+        placeholders = [f'CAST(%s AS {pk_field.rel_db_type(connection)})'] + [
+            f'CAST(%s AS {field.db_type(connection)})' for field in columns
+        ]
+    else:
+        placeholders = ['%s'] * (len(columns) + 1)
+    row_sql = f"({', '.join(placeholders)})"
+
+    params = []
+    for obj in objs:
+        params.append(pk_field.get_db_prep_value(obj.pk, connection))
+        params.extend(field.get_db_prep_save(getattr(obj, field.attname), connection) for field in columns)
+
+    values = f"(VALUES {', '.join([row_sql] * len(objs))})"
+    if connection.vendor == 'postgresql':
+        names = [pk_field.column] + [field.column for field in columns]
+        source = f"{values} AS v ({', '.join(qn(name) for name in names)})"
+    else:
+        # SQLite can't alias VALUES columns; they are column1, column2, ...
+        names = [f'column{i}' for i in range(1, len(columns) + 2)]
+        source = f"{values} AS v"
+    assignments = ', '.join(f'{qn(field.column)} = v.{qn(name)}' for field, name in zip(columns, names[1:]))
+    table = qn(meta.db_table)
+    # A statement starting with UPDATE (not WITH) so every driver reports the rowcount
+    sql = f"UPDATE {table} SET {assignments} FROM {source} WHERE {table}.{qn(pk_field.column)} = v.{qn(names[0])}"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+@dataclass
+class StatsWriteResult:
+    refreshed: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    # Primary keys of the rows whose values changed
+    changed_ids: List[Any] = field(default_factory=list)
+
+
+class StatsWriter:
+    """Collect refreshed user rows and write them with as few queries as possible.
+
+    Changed rows are grouped by the exact set of fields that changed and
+    flushed one UPDATE per group and chunk (``UPDATE ... FROM (VALUES ...)``
+    where supported, ``bulk_update`` elsewhere); rows with no changes only
+    get their ``fetched_at`` bumped in an ``UPDATE ... WHERE id IN`` per
+    refresh interval. Every written row is scheduled for its next refresh
+    (``refresh_due_at``) and has its failure count cleared.
+    """
+
+    def __init__(self, model_class, batch_size: Optional[int] = None):
+        self.model_class = model_class
+        self.batch_size = batch_size or getattr(settings, 'STATS_WRITE_BATCH_SIZE', 500)
+        self._changed: Dict[Tuple[str, ...], list] = defaultdict(list)
+        # Unchanged row ids by refresh interval (hours), so each group is one UPDATE
+        self._unchanged: Dict[int, list] = defaultdict(list)
+
+    def add(self, user, changed_fields: List[str]) -> None:
+        if changed_fields:
+            self._changed[tuple(sorted(set(changed_fields)))].append(user)
+        else:
+            self._unchanged[refresh_interval(user)].append(user.pk)
+
+    def _update(self, users, fields: List[str]) -> None:
+        if not supports_update_from_values():
+            self.model_class.objects.bulk_update(users, fields, batch_size=self.batch_size)
+            return
+        for start in range(0, len(users), self.batch_size):
+            update_from_values(self.model_class, users[start:start + self.batch_size], fields)
+
+    def flush(self, fetched_at=None) -> StatsWriteResult:
+        """Write everything collected so far and reset the writer."""
+        fetched_at = fetched_at or timezone.now()
+        result = StatsWriteResult(unchanged=sum(len(ids) for ids in self._unchanged.values()))
+
+        with transaction.atomic():
+            for fields, users in self._changed.items():
+                for user in users:
+                    # Neither write path runs auto_now, so set the timestamp ourselves
+                    user.fetched_at = fetched_at
+                    user.refresh_due_at = fetched_at + timedelta(hours=refresh_interval(user))
+                    user.refresh_failures = 0
+                self._update(users, [*fields, 'fetched_at', 'refresh_due_at', 'refresh_failures'])
+                result.changed += len(users)
+                result.changed_ids.extend(user.pk for user in users)
+
+            for hours, ids in self._unchanged.items():
+                for start in range(0, len(ids), self.batch_size):
+                    self.model_class.objects.filter(pk__in=ids[start:start + self.batch_size]).update(
+                        fetched_at=fetched_at,
+                        refresh_due_at=fetched_at + timedelta(hours=hours),
+                        refresh_failures=0,
+                    )
+
+        result.refreshed = result.changed + result.unchanged
+        self._changed.clear()
+        self._unchanged.clear()
+        return result
@@ -0,0 +1,302 @@
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Hourly budgets GitHub grants an authenticated token per resource
+DEFAULT_LIMITS = {
+    'core': 5000,
+    'graphql': 5000,
+}
+
+
+class TokenPoolExhausted(Exception):
+    """Raised when no token regains budget within the pool's maximum wait.
+
+    ``retry_at`` is the epoch second the earliest token resets, if known.
+    """
+
+    def __init__(self, message: str, retry_at: Optional[float] = None):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+
+# Bumped whenever a user's shared token changes, so every process reloads them
+USER_TOKENS_VERSION_KEY = 'github_token_pool:user_tokens_version'
+
+
+@dataclass(frozen=True)
+class PooledToken:
+    token: str
+    label: str
+
+    @property
+    def fingerprint(self) -> str:
+        # Identifies the token in cache keys and metrics without exposing it
+        return hashlib.sha256(self.token.encode('utf-8')).hexdigest()[:12]
+
+
+def _cache_is_shared() -> bool:
+    return 'locmem' not in settings.CACHES['default']['BACKEND'].lower()
+
+
+_user_tokens = {'version': None, 'loaded_at': None, 'tokens': []}
+_user_tokens_lock = threading.Lock()
+
+
+def shared_user_tokens() -> List[PooledToken]:
+    """Tokens users opted in to share, reloaded at most every ``GITHUB_TOKEN_POOL_REFRESH`` seconds.
+
+    Costs one cache read while the process copy is current, instead of a
+    users query for every ``GitHubAPI`` built by a refresh task.
+    """
+    from users.models import User
+
+    version = cache.get(USER_TOKENS_VERSION_KEY)
+    now = time.monotonic()
+    with _user_tokens_lock:
+        loaded_at = _user_tokens['loaded_at']
+        if (loaded_at is not None and _user_tokens['version'] == version
+                and now - loaded_at < settings.GITHUB_TOKEN_POOL_REFRESH):
+            return _user_tokens['tokens']
+
+    shared = User.objects.filter(
+        share_token_for_refresh=True,
+        github_access_token__isnull=False,
+    ).exclude(github_access_token='').values_list('id', 'github_access_token')
+    tokens = [PooledToken(token=token, label=f'user:{user_id}') for user_id, token in shared]
+    with _user_tokens_lock:
+        _user_tokens.update(version=version, loaded_at=now, tokens=tokens)
+    return tokens
+
+
+def user_tokens_changed() -> None:
+    """Make every process reload the shared user tokens on its next pool build."""
+    cache.set(USER_TOKENS_VERSION_KEY, time.time_ns(), None)
+
+
+def _parse_reset(value) -> Optional[int]:
+    """Normalise an epoch (REST header) or ISO-8601 (GraphQL) reset time to epoch seconds."""
+    if value in (None, ''):
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return None
+
+
+class GitHubTokenPool:
+    """Route GitHub API calls to whichever token has the most budget left.
+
+    Budgets are read from ``X-RateLimit-*`` response headers and the GraphQL
+    ``rateLimit`` object and kept in the Django cache. Remaining budgets are
+    counters reserved with atomic ``decr``, so concurrent workers can't
+    spend the same budget twice. They are only shared between processes
+    when the default cache is (Redis via ``CACHE_URL``); with the
+    ``LocMemCache`` fallback every process tracks its own budgets.
+
+    When every token is drained the pool waits up to ``max_wait`` seconds
+    for a reset and then raises ``TokenPoolExhausted``, so tasks can be
+    re-scheduled for ``retry_at`` instead of sleeping in a worker.
+    """
+
+    CACHE_PREFIX = 'github_token_pool'
+
+    def __init__(self, tokens: List[PooledToken], max_wait: Optional[float] = None):
+        # Deduplicate while keeping the first label seen for a token
+        unique = {}
+        for pooled in tokens:
+            if pooled.token and pooled.token not in unique:
+                unique[pooled.token] = pooled
+        self.tokens = list(unique.values())
+        self.max_wait = max_wait if max_wait is not None else getattr(settings, 'GITHUB_TOKEN_POOL_MAX_WAIT', 5)
+        self._by_token = {pooled.token: pooled for pooled in self.tokens}
+
+    @classmethod
+    def from_settings(cls, include_user_tokens: bool = True) -> 'GitHubTokenPool':
+        """Build a pool from ``GITHUB_TOKENS``/``GITHUB_TOKEN`` plus opted-in user tokens."""
+        tokens = []
+        configured = list(getattr(settings, 'GITHUB_TOKENS', []) or [])
+        if getattr(settings, 'GITHUB_TOKEN', None):
+            configured.insert(0, settings.GITHUB_TOKEN)
+        for i, token in enumerate(configured):
+            tokens.append(PooledToken(token=token, label=f'settings:{i}'))
+
+        if include_user_tokens:
+            tokens.extend(shared_user_tokens())
+        if len(tokens) > 1 and not _cache_is_shared():
+            logger.warning(
+                "GitHub token pool budgets are tracked in a per-process LocMemCache; "
+                "set CACHE_URL to share them between workers"
+            )
+        return cls(tokens)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def _key(self, pooled: PooledToken, resource: str) -> str:
+        return f'{self.CACHE_PREFIX}:{pooled.fingerprint}:{resource}'
+
+    def _remaining_key(self, pooled: PooledToken, resource: str) -> str:
+        return f'{self._key(pooled, resource)}:remaining'
+
+    def _budgets(self, resource: str) -> Dict[PooledToken, Dict[str, Any]]:
+        now = time.time()
+        keys = {}
+        for pooled in self.tokens:
+            keys[pooled] = (self._key(pooled, resource), self._remaining_key(pooled, resource))
+        stored = cache.get_many([key for pair in keys.values() for key in pair])
+        budgets = {}
+        for pooled, (key, remaining_key) in keys.items():
+            state = dict(stored.get(key) or {})
+            state['limit'] = state.get('limit') or DEFAULT_LIMITS.get(resource, 5000)
+            if state.get('reset') and state['reset'] <= now:
+                state['reset'] = None
+            # The counter expires at the reset, so a missing one means the full budget
+            remaining = stored.get(remaining_key)
+            state['remaining'] = state['limit'] if remaining is None else remaining
+            budgets[pooled] = state
+        return budgets
+
+    def _store(self, pooled: PooledToken, resource: str, state: Dict[str, Any]) -> None:
+        state = dict(state)
+        remaining = state.pop('remaining')
+        ttl, remaining_ttl = 3600, 3600
+        if state.get('reset'):
+            remaining_ttl = int(state['reset'] - time.time())
+            ttl = max(remaining_ttl, 0) + 60
+        cache.set(self._key(pooled, resource), state, ttl)
+        if remaining_ttl > 0:
+            cache.set(self._remaining_key(pooled, resource), remaining, remaining_ttl)
+        else:
+            # Already reset: the next reservation starts from the full budget
+            cache.delete(self._remaining_key(pooled, resource))
+
+    def _reserve(self, pooled: PooledToken, resource: str, limit: int, cost: int) -> bool:
+        """Atomically take ``cost`` from a token's remaining budget."""
+        key = self._remaining_key(pooled, resource)
+        try:
+            remaining = cache.decr(key, cost)
+        except ValueError:
+            # Not tracked yet, or its window has reset
+            cache.add(key, limit, 3600)
+            try:
+                remaining = cache.decr(key, cost)
+            except ValueError:
+                return False
+        if remaining < 0:
+            # Another worker got there first; give the budget back
+            cache.incr(key, cost)
+            return False
+        return True
+
+    def next_reset(self, resource: str = 'core') -> Optional[float]:
+        """Epoch second the earliest drained token regains budget, if known."""
+        resets = [
+            state['reset'] for state in self._budgets(resource).values()
+            if state.get('reset') and state['remaining'] <= 0
+        ]
+        return min(resets) if resets else None
+
+    def acquire(self, resource: str = 'core', cost: int = 1) -> Optional[str]:
+        """Return the token with the most remaining budget for ``resource``.
+
+        Blocks until a token resets when all are drained; raises
+        ``TokenPoolExhausted`` if that would take longer than ``max_wait``.
+        Returns ``None`` when the pool is empty (unauthenticated requests).
+        """
+        if not self.tokens:
+            return None
+        deadline = time.time() + self.max_wait
+        while True:
+            budgets = self._budgets(resource)
+            candidates = sorted(budgets.items(), key=lambda item: item[1]['remaining'], reverse=True)
+            for pooled, state in candidates:
+                if state['remaining'] < cost:
+                    break
+                # Reserve the budget up front; the response headers correct it
+                if self._reserve(pooled, resource, state['limit'], cost):
+                    return pooled.token
+            else:
+                continue
+
+            resets = [s['reset'] for s in budgets.values() if s.get('reset')]
+            wake_at = min(resets) if resets else None
+            if wake_at is None or wake_at > deadline:
+                raise TokenPoolExhausted(
+                    f"All {len(self.tokens)} GitHub tokens are out of {resource} budget",
+                    retry_at=wake_at,
+                )
+            pause = max(1.0, wake_at - time.time())
+            logger.warning(f"All GitHub tokens drained for {resource}; pausing {pause:.0f}s until reset")
+            time.sleep(pause)
+
+    def record_headers(self, token: Optional[str], headers, resource: str = 'core') -> None:
+        """Update a token's budget from ``X-RateLimit-*`` response headers."""
+        pooled = self._by_token.get(token)
+        if pooled is None or headers.get('X-RateLimit-Remaining') is None:
+            return
+        resource = headers.get('X-RateLimit-Resource') or resource
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            limit = int(headers.get('X-RateLimit-Limit') or DEFAULT_LIMITS.get(resource, 5000))
+        except ValueError:
+            return
+        self._store(pooled, resource, {
+            'limit': limit,
+            'remaining': remaining,
+            'reset': _parse_reset(headers.get('X-RateLimit-Reset')),
+        })
+
+    def record_graphql_rate_limit(self, token: Optional[str], rate_limit: Optional[Dict[str, Any]]) -> None:
+        """Update a token's GraphQL budget from a ``rateLimit { cost remaining resetAt limit }`` node."""
+        pooled = self._by_token.get(token)
+        if pooled is None or not rate_limit or rate_limit.get('remaining') is None:
+            return
+        self._store(pooled, 'graphql', {
+            'limit': rate_limit.get('limit') or DEFAULT_LIMITS['graphql'],
+            'remaining': int(rate_limit['remaining']),
+            'reset': _parse_reset(rate_limit.get('resetAt')),
+            'last_cost': rate_limit.get('cost'),
+        })
+
+    def mark_exhausted(self, token: Optional[str], resource: str, reset=None) -> None:
+        """Record that a token hit its rate limit (e.g. a 403 with no headers)."""
+        pooled = self._by_token.get(token)
+        if pooled is None:
+            return
+        reset_at = _parse_reset(reset) or int(time.time()) + 60
+        state = self._budgets(resource)[pooled]
+        self._store(pooled, resource, {**state, 'remaining': 0, 'reset': reset_at})
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current budget per token and resource, safe to expose (no token values)."""
+        tokens = []
+        totals = {}
+        for resource in DEFAULT_LIMITS:
+            for pooled, state in self._budgets(resource).items():
+                tokens.append({
+                    'label': pooled.label,
+                    'fingerprint': pooled.fingerprint,
+                    'resource': resource,
+                    'limit': state['limit'],
+                    'remaining': state['remaining'],
+                    'reset': state.get('reset'),
+                    'last_cost': state.get('last_cost'),
+                })
+                total = totals.setdefault(resource, {'limit': 0, 'remaining': 0})
+                total['limit'] += state['limit']
+                total['remaining'] += state['remaining']
+        return {'tokens': tokens, 'totals': totals}
@@ -53,8 +53,8 @@ class CountrySitemap(Sitemap):
             # Add the base country detail URL
             items.append((country.slug, 0))
             
-            # Add paginated versions
-            user_count = country.users.count()
+            # Add paginated versions; ?page=N links seek by leaderboard rank
+            user_count = country.leaderboard_size or country.users.count()
             num_pages = (user_count + self.items_per_page - 1) // self.items_per_page
             for page in range(1, num_pages + 1):
                 items.append((country.slug, page))
@@ -1,12 +1,19 @@
 # github_management/tasks.py
 import logging
+import time
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 from django.core.management import call_command
 from django.db import transaction
-from django.utils.dateparse import parse_datetime
 from .models import Country, GitHubUser
 from .services.github_api import GitHubAPIClient
+from .services.ingestion import CountryIngestionEngine, fetch_changed_country_users, upsert_country_users
+from .services import autocomplete, leaderboard
+from .services.refresh_coordinator import RefreshCoordinator
+from .services.freshness import back_off_failed
+from .services.stats_history import downsample_user_snapshots, record_country_snapshots, record_user_snapshots
+from badges.services.badge_warmup import schedule_warmup
 
 logger = logging.getLogger(__name__)
 
@@ -21,72 +28,45 @@ def fetch_all_countries_users(self):
     return f"Started fetching users for {countries.count()} countries"
 
 @shared_task(bind=True)
-def fetch_users_for_country(self, country_id):
+def ingest_all_countries(self, country_ids=None, max_workers=None, per_host_limit=None, force=False):
+    """Fetch every country page concurrently through one shared connection pool.
+
+    Progress is published as the task's ``PROGRESS`` state so it can be
+    polled through the result backend while the run is in flight.
+    """
+    countries = Country.objects.all()
+    if country_ids:
+        countries = countries.filter(id__in=country_ids)
+
+    def report(progress):
+        self.update_state(state='PROGRESS', meta=progress.as_dict())
+
+    engine = CountryIngestionEngine(
+        max_workers=max_workers,
+        per_host_limit=per_host_limit,
+        force=force,
+        progress_callback=report,
+    )
+    return engine.run(countries).as_dict()
+
+@shared_task(bind=True)
+def fetch_users_for_country(self, country_id, force=False):
     """Background task to fetch users for a specific country"""
     try:
         country = Country.objects.get(id=country_id)
         client = GitHubAPIClient()
-        users = client.get_users_by_country(country.slug)
-        
-        # Rest of your existing code remains the same...
-        user_objs = []
-        for user_data in users:
-            user_objs.append(GitHubUser(
-                github_username=user_data['username'],
-                first_name=user_data.get('first_name', ''),
-                middle_name=user_data.get('middle_name', ''),
-                last_name=user_data.get('last_name', ''),
-                followers=user_data.get('followers', 0),
-                contributions_last_year=user_data.get('contributions', 0),
-                country=country,
-                rank=user_data.get('rank', 0),
-                profile_url=user_data.get('profile_url', f"https://github.com/{user_data['username']}"),
-                avatar_url=user_data.get('avatar_url', f"https://github.com/{user_data['username']}.png")
-            ))
-        
-        existing = GitHubUser.objects.filter(
-            github_username__in=[obj.github_username for obj in user_objs]
-        )
-        existing_map = {user.github_username: user for user in existing}
-
-        to_create = []
-        to_update = []
-
-        for obj in user_objs:
-            if obj.github_username in existing_map:
-                existing_user = existing_map[obj.github_username]
-                # Update existing fields
-                existing_user.followers = obj.followers
-                existing_user.contributions_last_year = obj.contributions_last_year
-                existing_user.rank = obj.rank
-                existing_user.profile_url = obj.profile_url
-                existing_user.avatar_url = obj.avatar_url
-                # Update name fields only if provided (non-empty)
-                if obj.first_name:
-                    existing_user.first_name = obj.first_name
-                if obj.middle_name:
-                    existing_user.middle_name = obj.middle_name
-                if obj.last_name:
-                    existing_user.last_name = obj.last_name
-                to_update.append(existing_user)  # now includes PK
-            else:
-                to_create.append(obj)
-
-        if to_create:
-            GitHubUser.objects.bulk_create(to_create)
-
-        if to_update:
-            GitHubUser.objects.bulk_update(
-                to_update,
-                ['followers', 'contributions_last_year', 'rank', 'profile_url', 'avatar_url', 'first_name', 'middle_name', 'last_name']
-            )
-
-        # Update country stats
-        country.user_count = len(user_objs)
-        country.last_updated = timezone.now()
-        country.save()
+        result = fetch_changed_country_users(client, country, force=force)
+        if result is None:
+            logger.info(f"committers.top page for {country.name} is unchanged; skipping")
+            return
+
+        page, users = result
+        count = upsert_country_users(country, users, page_hash=page.content_hash)
+        leaderboard.rebuild_leaderboards([country.id])
+        autocomplete.patch_countries([country.id])
+        schedule_warmup([country.id])
         
-        logger.info(f"Successfully fetched {len(user_objs)} users for {country.name}")
+        logger.info(f"Successfully fetched {count} users for {country.name}")
         
     except Exception as e:
         logger.error(f"Error fetching users for country {country_id}: {e}", exc_info=True)
@@ -103,7 +83,7 @@ def update_users_stats_batch(user_ids, model_name):
     from .models import GitHubUser
     from users.models import User
     from .services.github_api import GitHubAPI
-    from django.utils import timezone
+    from .services.stats_writer import StatsWriter, apply_github_user_data
 
     github_api = GitHubAPI()
 
@@ -120,71 +100,153 @@ def update_users_stats_batch(user_ids, model_name):
     # Get all users at once to minimize database queries
     users = model_class.objects.in_bulk(user_ids)
 
+    # One aliased GraphQL request per batch_size users instead of two calls per user
+    users_data = github_api.get_users(
+        user.github_username for user in users.values() if user.github_username
+    )
+
+    writer = StatsWriter(model_class)
+    missing, failed = [], []
     for user_id, user in users.items():
         try:
-            user_data = github_api.get_user(user.github_username)
-            print(user_data)
+            login = (user.github_username or '').lower()
+            user_data = users_data.get(login)
             if user_data:
-                update_fields = ['fetched_at']
-                user.fetched_at = timezone.now()
-                
-                if user_data.get('followers') is not None and user.followers != user_data['followers']:
-                    user.followers = user_data['followers']
-                    update_fields.append('followers')
-                    
-                if user_data.get('following') is not None and user.following != user_data['following']:
-                    user.following = user_data['following']
-                    update_fields.append('following')
-                    
-                contributions = user_data.get('contributions', {})
-                contributions_last_year = contributions.get('last_year', 0)
-                print(f"Contributions last year: {contributions_last_year}")
-                if user.contributions_last_year != contributions_last_year:
-                    user.contributions_last_year = contributions_last_year
-                    update_fields.append('contributions_last_year')
-                    
-                if user_data.get('avatar_url') and user.avatar_url != user_data['avatar_url']:
-                    user.avatar_url = user_data['avatar_url']
-                    update_fields.append('avatar_url')
-                    
-                if user_data.get('html_url') and user.profile_url != user_data['html_url']:
-                    user.profile_url = user_data['html_url']
-                    update_fields.append('profile_url')
-                
-                # Additional profile fields from REST API
-                mapping = [
-                    ('github_id', 'id'),
-                    ('github_node_id', 'node_id'),
-                    ('display_name', 'name'),
-                    ('company', 'company'),
-                    ('blog', 'blog'),
-                    ('location', 'location'),
-                    ('email_public', 'email'),
-                    ('hireable', 'hireable'),
-                    ('bio', 'bio'),
-                    ('twitter_username', 'twitter_username'),
-                    ('public_repos', 'public_repos'),
-                    ('public_gists', 'public_gists'),
-                    ('account_type', 'type'),
-                    ('user_view_type', 'user_view_type'),
-                    ('site_admin', 'site_admin'),
-                ]
-                for model_field, api_field in mapping:
-                    if api_field in user_data and getattr(user, model_field, None) != user_data.get(api_field):
-                        setattr(user, model_field, user_data.get(api_field))
-                        update_fields.append(model_field)
-
-                # Datetime fields
-                for model_field, api_field in [('github_created_at', 'created_at'), ('github_updated_at', 'updated_at')]:
-                    if api_field in user_data and user_data.get(api_field):
-                        dt = parse_datetime(user_data.get(api_field))
-                        if dt and getattr(user, model_field) != dt:
-                            setattr(user, model_field, dt)
-                            update_fields.append(model_field)
-                
-                if len(update_fields) > 1:  # More than just fetched_at
-                    user.save(update_fields=update_fields)
-                
+                writer.add(user, apply_github_user_data(user, user_data))
+            elif login in users_data:
+                # Renamed or deleted account: mark it checked so it isn't retried every tick
+                writer.add(user, [])
+            elif login:
+                missing.append(user)
         except Exception as e:
             logger.error(f"Error updating user {user.github_username}: {e}")
-            continue  # Continue with next user even if one fails
\ No newline at end of file
+            failed.append(user)
+            continue  # Continue with next user even if one fails
+
+    result = writer.flush()
+    RefreshCoordinator(model_name).mark_refreshed(users.keys())
+    if github_api.rate_limited_until and missing:
+        # Pick the skipped users up again once a token resets, instead of waiting in this worker
+        countdown = max(1, int(github_api.rate_limited_until - time.time()))
+        update_users_stats_batch.apply_async(([user.pk for user in missing], model_name), countdown=countdown)
+        logger.info(f"Re-scheduled {len(missing)} {model_name} refreshes in {countdown}s after a rate limit")
+    else:
+        failed += missing
+    if failed:
+        # Retried later and later instead of on every tick
+        back_off_failed(model_class, failed)
+    if model_class is GitHubUser:
+        from badges.services.badge_data import invalidate_badges
+
+        # Unchanged rows keep their cached badges (and ETags)
+        invalidate_badges(users[pk].github_username for pk in result.changed_ids)
+        record_user_snapshots(users.values())
+        if result.changed:
+            # Only the countries of changed users can have moved ranks or badges
+            country_ids = {users[pk].country_id for pk in result.changed_ids}
+            leaderboard.rebuild_leaderboards(country_ids)
+            schedule_warmup(country_ids)
+    logger.info(
+        f"Refreshed {result.refreshed}/{len(user_ids)} {model_name} rows "
+        f"({result.changed} changed, {result.unchanged} unchanged)"
+    )
+    return {'refreshed': result.refreshed, 'changed': result.changed, 'unchanged': result.unchanged}
+
+
+@shared_task
+def flush_refresh_queue(model_name="GitHubUser"):
+    """Drain the coalesced refresh queue into ``update_users_stats_batch`` jobs."""
+    coordinator = RefreshCoordinator(model_name)
+    user_ids = coordinator.drain()
+    batch_size = settings.REFRESH_BATCH_SIZE
+    for start in range(0, len(user_ids), batch_size):
+        update_users_stats_batch.delay(user_ids[start:start + batch_size], model_name)
+    if user_ids:
+        logger.info(f"Flushed {len(user_ids)} queued {model_name} refreshes")
+    return len(user_ids)
+
+
+@shared_task
+def freshness_tick(budget=None):
+    """Beat entry point: refresh the highest-priority stale users within the tick budget."""
+    from .services.freshness import run_freshness_tick
+
+    return run_freshness_tick(budget=budget)
+
+
+@shared_task
+def maintain_stats_history():
+    """Daily: store per-country totals and downsample old user snapshots."""
+    countries = record_country_snapshots()
+    thinned = downsample_user_snapshots()
+    logger.info(
+        f"Stats history: {countries} country snapshots stored, "
+        f"{thinned['weekly']} rows thinned to weekly, {thinned['monthly']} to monthly"
+    )
+    return {'countries': countries, **thinned}
+
+
+@shared_task
+def rebuild_leaderboards(country_ids=None, full=False):
+    """Re-rank the given countries (or all of them with ``full``) and refresh global ranks."""
+    return leaderboard.rebuild_leaderboards(country_ids=country_ids, full=full)
+
+
+@shared_task(bind=True)
+def rebuild_global_ranks(self):
+    """Debounced global pass queued by incremental leaderboard rebuilds."""
+    moved = leaderboard.run_global_rank()
+    if moved is None:
+        # A pass is still running; run again after it so these changes are included
+        raise self.retry(countdown=settings.LEADERBOARD_GLOBAL_DEBOUNCE, max_retries=None)
+    return moved
+
+
+@shared_task
+def resolve_follow_backs(batch_size=100):
+    """Beat entry point: fan follow-back resolution out over users with unresolved actions."""
+    from .services.follow_back import users_with_unresolved_actions
+
+    user_ids = users_with_unresolved_actions()
+    for start in range(0, len(user_ids), batch_size):
+        resolve_follow_backs_for_users.delay(user_ids[start:start + batch_size])
+    return len(user_ids)
+
+
+@shared_task
+def resolve_follow_backs_for_users(user_ids, grace_days=None):
+    """Classify the unresolved follow actions of ``user_ids`` against their followers."""
+    from .services.follow_back import resolve_users
+
+    totals = resolve_users(user_ids, grace_days=grace_days)
+    logger.info(
+        f"Follow-backs resolved for {totals['users']} users: {totals['checked']} actions checked, "
+        f"{totals['followed_back']} followed back, {totals['not_followed_back']} not followed back"
+    )
+    return totals
+
+
+@shared_task(bind=True, acks_late=True)
+def process_unfollow_job(self, job_id):
+    """Run or resume an unfollow job; re-enqueues itself after a GitHub rate limit."""
+    from .models import UnfollowJob
+    from .services.bulk_unfollow import run_unfollow_job
+
+    # Claim the job so a duplicate delivery doesn't run it twice
+    claimed = UnfollowJob.objects.filter(pk=job_id, status=UnfollowJob.Status.QUEUED).update(
+        status=UnfollowJob.Status.RUNNING, updated_at=timezone.now()
+    )
+    if not claimed:
+        logger.info(f"Unfollow job {job_id} is not queued; skipping")
+        return None
+
+    job = UnfollowJob.objects.select_related('user').get(pk=job_id)
+    if not run_unfollow_job(job):
+        process_unfollow_job.apply_async((job_id,), countdown=settings.UNFOLLOW_RETRY_SECONDS)
+    return job.as_dict()
+
+
+@shared_task
+def rebuild_autocomplete_index():
+    """Rewrite the login autocomplete index from the database, folding in the delta."""
+    return autocomplete.rebuild_index()
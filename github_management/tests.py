@@ -1,3 +1,1210 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from github_management_project.celery import app as celery_app
+from badges.services.badge_data import badge_digest, warm_badge_data
+from users.models import User, UserFollowing
+from users.services.github_service import GitHubFollowClient
+from . import tasks
+from .pagination import KeysetPaginator
+from .models import (
+    Country, CountryStatsSnapshot, GitHubFollowAction, GitHubUser, GitHubUserSnapshot, UnfollowJob,
+)
+from .services.committers_parser import PARSERS, parse_users_table, resolve_parser
+from .services import autocomplete, leaderboard, search
+from .services.bulk_follow import FollowOutcome, TokenBucket, bulk_follow
+from .services.bulk_unfollow import prepare_unfollow_job, run_unfollow_job
+from .services.follow_back import resolve_user
+from .services.freshness import FreshnessScheduler, back_off_failed, refresh_interval
+from .services.github_api import GitHubAPI, build_users_query
+from .services.http_cache import SnapshotCache
+from .services.ingestion import CountryIngestionEngine
+from .services.refresh_coordinator import RefreshCoordinator
+from .services.sampler import RandomUserSampler
+from .services.stats_history import (
+    downsample_user_snapshots, record_country_snapshots, record_user_snapshots, user_trend,
+)
+from .services.stats_writer import StatsWriter, apply_github_user_data, update_from_values
+from .services.token_pool import GitHubTokenPool, PooledToken, TokenPoolExhausted, user_tokens_changed
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def country_page(rows):
+    """A committers.top country page with one ``users-list`` row per ``(login, name, contributions)``."""
+    body = ''.join(
+        f'<tr><td>{rank}.</td>'
+        f'<td><a href="https://github.com/{login}">{login}</a><br>({name})</td>'
+        f'<td>{contributions}</td>'
+        f'<td><img data-src="https://avatars.githubusercontent.com/{login}?s=40"></td></tr>'
+        for rank, (login, name, contributions) in enumerate(rows, 1)
+    )
+    return (
+        '<html><body><ul class="countries"><li><a href="/elsewhere_public">Elsewhere</a></li></ul>'
+        '<table class="users-list"><thead><tr><th>#</th><th>Name</th><th>Contribs</th><th></th></tr></thead>'
+        f'<tbody>{body}</tbody></table></body></html>'
+    )
+
+
+PAGE_ROWS = [
+    ('Alice', 'Alice Liddell', '1,234'),
+    ('bob', 'bob', '987'),
+    ('carol-dev', 'Carol Ann Smith', '12'),
+]
+
+
+class CommittersParserTests(SimpleTestCase):
+    def test_backends_agree(self):
+        html = country_page(PAGE_ROWS)
+        reference = parse_users_table(html, parser='bs4')
+        for parser in PARSERS:
+            with self.subTest(parser=parser):
+                self.assertEqual(parse_users_table(html, parser=parser), reference)
+
+    def test_row_fields(self):
+        users = parse_users_table(country_page(PAGE_ROWS), parser='stream')
+        self.assertEqual([u['username'] for u in users], ['Alice', 'bob', 'carol-dev'])
+        self.assertEqual([u['rank'] for u in users], [1, 2, 3])
+        self.assertEqual(users[0]['contributions'], 1234)
+        self.assertEqual((users[0]['first_name'], users[0]['last_name']), ('Alice', 'Liddell'))
+        self.assertEqual(users[0]['avatar_url'], 'https://avatars.githubusercontent.com/Alice')
+        # A name equal to the login is not stored as a name
+        self.assertNotIn('name', users[1])
+
+    def test_max_users_and_missing_table(self):
+        for parser in PARSERS:
+            with self.subTest(parser=parser):
+                self.assertEqual(len(parse_users_table(country_page(PAGE_ROWS), max_users=2, parser=parser)), 2)
+                self.assertEqual(parse_users_table('<html><body></body></html>', parser=parser), [])
+
+    def test_unknown_parser_is_rejected(self):
+        with self.assertRaises(ValueError):
+            resolve_parser('regex')
+
+
+class SnapshotCacheTests(SimpleTestCase):
+    url = 'https://committers.top/wonderland_public'
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.cache = SnapshotCache(self.tmp)
+
+    def test_round_trip_and_validators(self):
+        entry = self.cache.store(self.url, '<html>ü</html>', etag='"abc"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+        self.assertEqual(self.cache.read_body(self.url), '<html>ü</html>')
+        self.assertEqual(self.cache.get(self.url).content_hash, entry.content_hash)
+        self.assertEqual(self.cache.conditional_headers(self.cache.get(self.url)), {
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT',
+        })
+
+    def test_corrupt_bodies_read_as_missing(self):
+        body_path = self.cache._paths(self.url)[1]
+        valid = gzip.compress('<html></html>'.encode('utf-8'))
+        for label, data in [
+            ('truncated', valid[:len(valid) // 2]),
+            ('not gzip', b'<html>'),
+            ('bad deflate stream', valid[:10] + b'\xff' * 20 + valid[-8:]),
+            ('not utf-8', gzip.compress(b'\xff\xfe<html>')),
+        ]:
+            with self.subTest(label):
+                self.cache.store(self.url, '<html></html>')
+                body_path.write_bytes(data)
+                with self.assertLogs('github_management.services.http_cache', 'WARNING'):
+                    self.assertIsNone(self.cache.read_body(self.url))
+
+
+class LocalServerMixin:
+    """Serve ``handler_class`` on a local port for the test class; its URL is ``cls.base_url``."""
+
+    handler_class = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), cls.handler_class)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+
+class EagerCeleryMixin:
+    """Run tasks queued by the code under test inline instead of sending them to a broker."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+
+    @classmethod
+    def tearDownClass(cls):
+        celery_app.conf.task_always_eager = cls._eager
+        super().tearDownClass()
+
+
+class FakeCommittersTop(BaseHTTPRequestHandler):
+    """Serves ``/<slug>_public`` from ``pages`` and answers matching ``If-None-Match`` with a 304."""
+
+    pages = {}
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get('If-None-Match')))
+        html = self.pages.get(self.path.strip('/'))
+        if html is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = f'"{len(html)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        body = html.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGitHubREST(BaseHTTPRequestHandler):
+    """The follow endpoints of the GitHub REST API for the token owner ``login``.
+
+    ``PUT``/``DELETE /user/following/<login>`` answer 204 for logins in
+    ``known`` and 404 otherwise; once ``limit`` writes were made every
+    further write is rate limited (429). Writes are logged in ``writes``.
+    """
+
+    login = 'me'
+    known = set()
+    limit = None
+    writes = []
+
+    def _send(self, status, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write(self):
+        cls = type(self)
+        target = self.path.rsplit('/', 1)[-1]
+        if cls.limit is not None and len(cls.writes) >= cls.limit:
+            return self._send(429, {'message': 'secondary rate limit'})
+        cls.writes.append((self.command, target))
+        self._send(204 if target.lower() in cls.known else 404)
+
+    def do_GET(self):
+        if self.path == '/user':
+            return self._send(200, {'login': self.login})
+        self._send(404, {'message': 'Not Found'})
+
+    do_PUT = do_DELETE = _write
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGitHubMixin(LocalServerMixin):
+    """Point ``GitHubFollowClient`` at ``FakeGitHubREST`` and reset it for every test."""
+
+    handler_class = FakeGitHubREST
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        FakeGitHubREST.known, FakeGitHubREST.limit, FakeGitHubREST.writes = set(), None, []
+        patcher = mock.patch.object(GitHubFollowClient, 'API_URL', self.base_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class CountryIngestionEngineTests(LocalServerMixin, EagerCeleryMixin, TestCase):
+    handler_class = FakeCommittersTop
+
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.settings = override_settings(
+            COMMITTERS_TOP_CACHE_DIR=f'{self.tmp}/pages',
+            AUTOCOMPLETE_INDEX_DIR=f'{self.tmp}/autocomplete',
+            COMMITTERS_TOP_REQUEST_DELAY=0,
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        FakeCommittersTop.pages = {'wonderland_public': country_page(PAGE_ROWS)}
+        FakeCommittersTop.requests = []
+        self.wonderland = Country.objects.create(name='Wonderland', slug='wonderland')
+        self.atlantis = Country.objects.create(name='Atlantis', slug='atlantis')
+
+    def run_engine(self, countries, **kwargs):
+        return CountryIngestionEngine(max_workers=2, per_host_limit=2, base_url=self.base_url, **kwargs).run(countries)
+
+    def test_ingests_pages_and_reports_failures(self):
+        progress = self.run_engine([self.wonderland, self.atlantis])
+
+        self.assertEqual((progress.completed, progress.failed, progress.users), (1, 1, 3))
+        self.assertEqual(progress.failed_countries, ['atlantis'])
+        users = GitHubUser.objects.filter(country=self.wonderland).order_by('rank')
+        self.assertEqual(
+            [(u.github_username, u.rank, u.contributions_last_year) for u in users],
+            [('Alice', 1, 1234), ('bob', 2, 987), ('carol-dev', 3, 12)],
+        )
+        self.wonderland.refresh_from_db()
+        self.assertEqual(self.wonderland.user_count, 3)
+        self.assertFalse(Country.objects.filter(is_fetching=True).exists())
+
+    def test_progress_callback_sees_every_country(self):
+        seen = []
+        self.run_engine([self.wonderland, self.atlantis], progress_callback=lambda p: seen.append(p.completed + p.failed))
+        self.assertEqual(seen, [1, 2])
+
+    def test_unchanged_page_is_revalidated_and_skipped(self):
+        self.run_engine([self.wonderland])
+        GitHubUser.objects.filter(github_username='bob').update(contributions_last_year=1)
+
+        progress = self.run_engine([self.wonderland])
+
+        self.assertEqual((progress.completed, progress.unchanged, progress.users), (1, 1, 0))
+        self.assertIsNotNone(FakeCommittersTop.requests[-1][1])
+        self.assertEqual(GitHubUser.objects.get(github_username='bob').contributions_last_year, 1)
+
+    def test_corrupt_snapshot_is_refetched(self):
+        self.run_engine([self.wonderland])
+        for body_path in Path(self.tmp, 'pages').glob('*.html.gz'):
+            body_path.write_bytes(body_path.read_bytes()[:20])
+
+        progress = self.run_engine([self.wonderland])
+
+        self.assertEqual((progress.failed, progress.unchanged), (0, 1))
+        # The 304 couldn't be served from disk, so the page was fetched again unconditionally
+        self.assertEqual([etag is None for _, etag in FakeCommittersTop.requests[-2:]], [False, True])
+
+    def test_changed_page_updates_rows(self):
+        self.run_engine([self.wonderland])
+        FakeCommittersTop.pages['wonderland_public'] = country_page([('bob', 'bob', '2,000')] + PAGE_ROWS[:1])
+
+        progress = self.run_engine([self.wonderland])
+
+        self.assertEqual(progress.users, 2)
+        bob = GitHubUser.objects.get(github_username='bob')
+        self.assertEqual((bob.rank, bob.contributions_last_year), (1, 2000))
+
+
+class FakeGitHubGraphQL(BaseHTTPRequestHandler):
+    """Answers aliased ``user(login:)`` queries for ``known`` logins.
+
+    ``status`` maps a batch size to the HTTP status returned for batches that
+    large; every request's login list is recorded in ``batches``.
+    """
+
+    known = set()
+    status = {}
+    batches = []
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        logins = [payload['variables'][f'l{i}'] for i in range(len(payload['variables']))]
+        type(self).batches.append(logins)
+        status = self.status.get(len(logins), 200)
+        if status != 200:
+            body = b'{"message": "API rate limit exceeded"}' if status in (403, 429) else b'{}'
+            self.send_response(status)
+            if status in (403, 429):
+                self.send_header('X-RateLimit-Remaining', '0')
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        data, errors = {}, []
+        for i, login in enumerate(logins):
+            if login.lower() in self.known:
+                data[f'u{i}'] = {
+                    'login': login, 'databaseId': i, 'name': login.title(),
+                    'followers': {'totalCount': 10 + i}, 'following': {'totalCount': 1},
+                    'repositories': {'totalCount': 3},
+                    'contributionsCollection': {'contributionCalendar': {'totalContributions': 100 + i}},
+                }
+            else:
+                data[f'u{i}'] = None
+                errors.append({'path': [f'u{i}'], 'message': f'Could not resolve to a User with the login of {login}.'})
+        body = json.dumps({'data': data, 'errors': errors}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GitHubGraphQLBatchTests(LocalServerMixin, SimpleTestCase):
+    handler_class = FakeGitHubGraphQL
+
+    def setUp(self):
+        FakeGitHubGraphQL.known = {'alice', 'bob', 'carol', 'dave'}
+        FakeGitHubGraphQL.status = {}
+        FakeGitHubGraphQL.batches = []
+        self.api = GitHubAPI(token='test-token')
+        self.api.graphql_url = self.base_url
+        self.api.batch_size = 2
+
+    def test_query_aliases_logins_as_variables(self):
+        query, variables = build_users_query(['alice', 'b"ob'])
+        self.assertIn('u1: user(login: $l1)', query)
+        self.assertEqual(variables, {'l0': 'alice', 'l1': 'b"ob'})
+
+    def test_users_are_fetched_in_batches(self):
+        with self.assertLogs('github_management.services.github_api', 'WARNING'):
+            users = self.api.get_users(['Alice', 'bob', 'carol', 'ghost', 'dave', 'alice'])
+
+        self.assertEqual([len(batch) for batch in FakeGitHubGraphQL.batches], [2, 2, 1])
+        self.assertEqual(set(users), {'alice', 'bob', 'carol', 'ghost', 'dave'})
+        self.assertIsNone(users['ghost'])
+        self.assertEqual(users['alice']['followers'], 10)
+        self.assertEqual(users['bob']['contributions']['last_year'], 101)
+
+    def test_server_errors_split_the_batch(self):
+        self.api.batch_size = 4
+        FakeGitHubGraphQL.status = {4: 502, 1: 502}
+        with self.assertLogs('github_management.services.github_api', 'WARNING'):
+            users = self.api.get_users(['alice', 'bob', 'carol', 'dave'])
+
+        # 4 -> 2 + 2, both succeed
+        self.assertEqual([len(batch) for batch in FakeGitHubGraphQL.batches], [4, 2, 2])
+        self.assertEqual(set(users), {'alice', 'bob', 'carol', 'dave'})
+
+    def test_single_failing_login_is_left_out(self):
+        FakeGitHubGraphQL.status = {2: 502, 1: 502}
+        with self.assertLogs('github_management.services.github_api', 'WARNING'):
+            users = self.api.get_users(['alice', 'bob'])
+        self.assertEqual(users, {})
+        self.assertEqual(len(FakeGitHubGraphQL.batches), 3)
+
+    def test_rate_limit_stops_without_splitting(self):
+        FakeGitHubGraphQL.status = {2: 429}
+        with self.assertLogs('github_management.services.github_api', 'WARNING'):
+            users = self.api.get_users(['alice', 'bob', 'carol', 'dave'])
+        self.assertEqual(users, {})
+        self.assertEqual(len(FakeGitHubGraphQL.batches), 1)
+        self.assertIsNotNone(self.api.rate_limited_until)
+
+    def test_client_errors_are_not_retried(self):
+        FakeGitHubGraphQL.status = {2: 400}
+        with self.assertLogs('github_management.services.github_api', 'ERROR'):
+            users = self.api.get_users(['alice', 'bob'])
+        self.assertEqual(users, {})
+        self.assertEqual(len(FakeGitHubGraphQL.batches), 1)
+
+
+class GitHubTokenPoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_tokens_changed()
+        self.reset = int(time.time()) + 3600
+        self.pool = GitHubTokenPool([PooledToken('token-a', 'a'), PooledToken('token-b', 'b')], max_wait=0)
+
+    def record(self, token, remaining):
+        self.pool.record_headers(token, {
+            'X-RateLimit-Limit': '5000',
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(self.reset),
+        })
+
+    def test_prefers_token_with_most_budget(self):
+        self.record('token-a', 10)
+        self.record('token-b', 100)
+        self.assertEqual(self.pool.acquire(), 'token-b')
+
+    def test_never_hands_out_more_than_the_budget(self):
+        self.record('token-a', 2)
+        self.record('token-b', 1)
+        granted = [self.pool.acquire() for _ in range(3)]
+        self.assertEqual(sorted(granted), ['token-a', 'token-a', 'token-b'])
+        with self.assertRaises(TokenPoolExhausted) as raised:
+            self.pool.acquire()
+        self.assertEqual(raised.exception.retry_at, self.reset)
+
+    def test_exhausted_token_is_skipped(self):
+        self.record('token-a', 50)
+        self.record('token-b', 100)
+        self.pool.mark_exhausted('token-b', 'core', reset=self.reset)
+        self.assertEqual(self.pool.acquire(), 'token-a')
+        self.assertEqual(self.pool.next_reset('core'), self.reset)
+
+    def test_budgets_are_shared_between_pool_instances(self):
+        self.record('token-a', 1)
+        self.record('token-b', 0)
+        other = GitHubTokenPool([PooledToken('token-a', 'a'), PooledToken('token-b', 'b')], max_wait=0)
+        self.assertEqual(other.acquire(), 'token-a')
+        with self.assertRaises(TokenPoolExhausted):
+            self.pool.acquire()
+
+    @override_settings(GITHUB_TOKEN=None, GITHUB_TOKENS=['settings-token'])
+    def test_shared_user_tokens_are_loaded_once_per_change(self):
+        user = User.objects.create_user(
+            email='sharer@example.com', github_username='sharer',
+            github_access_token='user-token', share_token_for_refresh=True,
+        )
+        User.objects.create_user(email='private@example.com', github_username='private', github_access_token='secret')
+        self.assertEqual([p.token for p in GitHubTokenPool.from_settings().tokens], ['settings-token', 'user-token'])
+        with self.assertNumQueries(0):
+            GitHubTokenPool.from_settings()
+
+        self.client.force_login(user, backend='django.contrib.auth.backends.ModelBackend')
+        self.client.post(reverse('add_github_token'), {'access_token': 'newtoken', 'share_for_refresh': 'on'}, secure=True)
+
+        self.assertEqual([p.token for p in GitHubTokenPool.from_settings().tokens], ['settings-token', 'newtoken'])
+
+
+class StatsWriterTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='Wonderland', slug='wonderland')
+        self.users = [
+            GitHubUser.objects.create(github_username=f'user{i}', country=self.country, followers=i,
+                                      contributions_last_year=i, refresh_failures=2)
+            for i in range(6)
+        ]
+
+    def payload(self, user, followers=None, contributions=None, **extra):
+        return {
+            'followers': user.followers if followers is None else followers,
+            'following': user.following,
+            'contributions': {'last_year': user.contributions_last_year if contributions is None else contributions},
+            **extra,
+        }
+
+    def test_apply_reports_changed_fields_only(self):
+        user = self.users[1]
+        self.assertEqual(apply_github_user_data(user, self.payload(user)), [])
+        changed = apply_github_user_data(user, self.payload(user, followers=50, bio='Hi', created_at='2020-01-02T03:04:05Z'))
+        self.assertEqual(changed, ['followers', 'bio', 'github_created_at'])
+        self.assertEqual(user.followers, 50)
+
+    def test_update_from_values_writes_each_row(self):
+        for i, user in enumerate(self.users[:3]):
+            user.followers = 100 + i
+        self.assertEqual(update_from_values(GitHubUser, self.users[:3], ['followers']), 3)
+        self.assertEqual(
+            list(GitHubUser.objects.order_by('pk').values_list('followers', flat=True)),
+            [100, 101, 102, 3, 4, 5],
+        )
+
+    def test_flush_groups_writes_and_reports_changed_rows(self):
+        writer = StatsWriter(GitHubUser, batch_size=2)
+        for user in self.users:
+            data = self.payload(user, followers=user.followers + 10) if user.pk % 2 else self.payload(user)
+            writer.add(user, apply_github_user_data(user, data))
+        fetched_at = timezone.now()
+        intervals = {refresh_interval(user) for user in self.users if not user.pk % 2}
+
+        # A savepoint pair, the changed rows in 2 chunks, then one UPDATE per refresh interval
+        with self.assertNumQueries(2 + 2 + len(intervals)):
+            result = writer.flush(fetched_at=fetched_at)
+
+        changed_ids = sorted(user.pk for user in self.users if user.pk % 2)
+        self.assertEqual((result.refreshed, result.changed, result.unchanged), (6, 3, 3))
+        self.assertEqual(sorted(result.changed_ids), changed_ids)
+        for user in GitHubUser.objects.all():
+            self.assertEqual(user.fetched_at, fetched_at)
+            self.assertGreater(user.refresh_due_at, fetched_at)
+            self.assertEqual(user.refresh_failures, 0)
+            expected = int(user.github_username[4:]) + (10 if user.pk in changed_ids else 0)
+            self.assertEqual(user.followers, expected)
+
+    def test_benchmark_leaves_no_rows_behind(self):
+        call_command('benchmark_stats_write', users=20, stdout=StringIO())
+        self.assertEqual(Country.objects.count(), 1)
+        self.assertEqual(GitHubUser.objects.count(), len(self.users))
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+class RefreshCoordinatorTests(SimpleTestCase):
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.flush = mock.patch.object(tasks.flush_refresh_queue, 'apply_async').start()
+        self.direct = mock.patch.object(tasks.update_users_stats_batch, 'delay').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def coordinator(self, **kwargs):
+        kwargs = {'window': 30, 'cooldown': 600, 'inflight_ttl': 900, **kwargs}
+        return RefreshCoordinator('GitHubUser', client=fakeredis.FakeRedis(server=self.server), **kwargs)
+
+    def test_requests_coalesce_into_one_flush(self):
+        coordinator = self.coordinator()
+        self.assertEqual(coordinator.request([1, 2, 2]), 2)
+        self.assertEqual(coordinator.request([2, 3]), 1)
+        self.flush.assert_called_once_with(args=['GitHubUser'], countdown=30)
+
+        self.assertEqual(coordinator.drain(), [1, 2, 3])
+        self.assertEqual(coordinator.stats(), {'pending': 0, 'inflight': 3, 'recent': 0})
+
+    def test_in_flight_and_recent_users_are_skipped(self):
+        coordinator = self.coordinator()
+        coordinator.request([1, 2])
+        coordinator.drain()
+        self.assertEqual(coordinator.request([1, 2]), 0)
+
+        coordinator.mark_refreshed([1])
+        self.assertEqual(coordinator.request([1]), 0)
+        self.assertEqual(self.coordinator(cooldown=0).request([1]), 1)
+
+    def test_drain_opens_a_new_window(self):
+        coordinator = self.coordinator()
+        coordinator.request([1])
+        coordinator.drain()
+        coordinator.request([2])
+        self.assertEqual(self.flush.call_count, 2)
+
+    def test_claim_marks_users_in_flight(self):
+        coordinator = self.coordinator()
+        self.assertEqual(coordinator.claim([1, 2]), [1, 2])
+        self.assertEqual(coordinator.claim([2, 3]), [3])
+        self.assertEqual(coordinator.request([1, 2, 3]), 0)
+
+    def test_unreachable_redis_enqueues_directly(self):
+        self.server.connected = False
+        with self.assertLogs('github_management.services.refresh_coordinator', 'WARNING'):
+            self.assertEqual(self.coordinator().request([4, 5]), 2)
+        self.direct.assert_called_once_with([4, 5], 'GitHubUser')
+        self.flush.assert_not_called()
+
+
+class FreshnessSchedulerTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.country = Country.objects.create(name='Wonderland', slug='wonderland')
+
+    def github_user(self, login, due_in_hours, rank=0, **kwargs):
+        return GitHubUser.objects.create(
+            github_username=login, country=self.country, rank=rank,
+            refresh_due_at=self.now + timedelta(hours=due_in_hours), **kwargs
+        )
+
+    def test_popular_and_top_ranked_users_are_refreshed_sooner(self):
+        unknown = GitHubUser(followers=0, page_views=0, rank=0)
+        popular = GitHubUser(followers=5000, page_views=200, rank=0)
+        top = GitHubUser(followers=0, page_views=0, rank=1)
+        self.assertLess(refresh_interval(popular), refresh_interval(unknown))
+        self.assertLessEqual(refresh_interval(top), 6)
+        self.assertGreaterEqual(refresh_interval(popular), 6)
+
+    def test_failures_back_off_exponentially(self):
+        first = self.github_user('first', -1)
+        second = self.github_user('second', -1, refresh_failures=1)
+
+        self.assertEqual(back_off_failed(GitHubUser, [first, second]), 2)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.refresh_failures, second.refresh_failures), (1, 2))
+        self.assertAlmostEqual((first.refresh_due_at - self.now).total_seconds() / 60, 30, delta=1)
+        self.assertAlmostEqual((second.refresh_due_at - self.now).total_seconds() / 60, 60, delta=1)
+
+    def test_plan_serves_the_top_rank_sla_first_then_earliest_due(self):
+        top = self.github_user('top', -1, rank=3)
+        oldest = self.github_user('oldest', -48)
+        older = self.github_user('older', -24)
+        self.github_user('recent', -2)
+        self.github_user('not-due', 5, rank=1)
+        member = User.objects.create_user(email='member@example.com', github_username='member')
+        User.objects.filter(pk=member.pk).update(refresh_due_at=self.now - timedelta(hours=30))
+
+        plan = FreshnessScheduler(budget=4, top_rank=10).plan(now=self.now)
+
+        self.assertEqual(plan.sla['GitHubUser'], [top.pk])
+        self.assertEqual(plan.priority['GitHubUser'], [oldest.pk, older.pk])
+        self.assertEqual(plan.priority['User'], [member.pk])
+        self.assertEqual(plan.sla_backlog, 0)
+
+    def test_backed_off_users_are_not_picked_again(self):
+        failing = self.github_user('failing', -1)
+        back_off_failed(GitHubUser, [failing])
+        plan = FreshnessScheduler(budget=10).plan(now=self.now)
+        self.assertEqual(plan.total, 0)
+
+    def test_sla_backlog_is_reported(self):
+        for rank in range(1, 4):
+            self.github_user(f'top{rank}', -rank, rank=rank)
+        with self.assertLogs('github_management.services.freshness', 'WARNING'):
+            plan = FreshnessScheduler(budget=2, top_rank=10).plan(now=self.now)
+        self.assertEqual(len(plan.sla['GitHubUser']), 2)
+        self.assertEqual(plan.sla_backlog, 1)
+
+
+class StatsHistoryTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='Wonderland', slug='wonderland')
+        self.user = GitHubUser.objects.create(github_username='alice', country=self.country, followers=10)
+
+    def test_only_changes_are_recorded(self):
+        monday, tuesday = date(2026, 3, 2), date(2026, 3, 3)
+        self.assertEqual(record_user_snapshots([self.user], day=monday), 1)
+        self.assertEqual(record_user_snapshots([self.user], day=tuesday), 0)
+
+        self.user.followers = 12
+        self.assertEqual(record_user_snapshots([self.user], day=tuesday), 1)
+        self.user.followers = 13
+        # A second change on the same day overwrites that day's row
+        self.assertEqual(record_user_snapshots([self.user], day=tuesday), 1)
+        self.assertEqual(
+            list(GitHubUserSnapshot.objects.order_by('day').values_list('day', 'followers')),
+            [(monday, 10), (tuesday, 13)],
+        )
+
+    def test_trend_starts_with_the_value_before_the_window(self):
+        today = timezone.localdate()
+        for days_ago, followers in [(400, 1), (100, 2), (10, 3)]:
+            self.user.followers = followers
+            record_user_snapshots([self.user], day=today - timedelta(days=days_ago))
+        self.assertEqual([point['followers'] for point in user_trend(self.user, days=365)], [1, 2, 3])
+
+    @override_settings(STATS_HISTORY_DAILY_DAYS=30, STATS_HISTORY_WEEKLY_DAYS=180)
+    def test_downsampling_keeps_the_last_row_per_period(self):
+        today = date(2026, 10, 15)
+        # Every day of two weeks in the weekly range, and of one month in the monthly range
+        weekly_days = [date(2026, 7, 6) + timedelta(days=n) for n in range(14)]
+        monthly_days = [date(2026, 1, 1) + timedelta(days=n) for n in range(31)]
+        for n, day in enumerate(weekly_days + monthly_days):
+            self.user.followers = n
+            record_user_snapshots([self.user], day=day)
+        recent = today - timedelta(days=3)
+        self.user.followers = 1000
+        record_user_snapshots([self.user], day=recent)
+
+        result = downsample_user_snapshots(today=today)
+
+        self.assertEqual(result, {'weekly': 12, 'monthly': 30})
+        self.assertEqual(
+            list(GitHubUserSnapshot.objects.order_by('day').values_list('day', flat=True)),
+            [date(2026, 1, 31), date(2026, 7, 12), date(2026, 7, 19), recent],
+        )
+
+    def test_country_totals(self):
+        GitHubUser.objects.create(github_username='bob', country=self.country, followers=5, contributions_last_year=7)
+        self.assertEqual(record_country_snapshots(day=date(2026, 3, 2)), 1)
+        snapshot = CountryStatsSnapshot.objects.get()
+        self.assertEqual((snapshot.users, snapshot.followers, snapshot.contributions_last_year), (2, 15, 7))
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.wonderland = Country.objects.create(name='Wonderland', slug='wonderland')
+        self.atlantis = Country.objects.create(name='Atlantis', slug='atlantis')
+        self.alice = GitHubUser.objects.create(github_username='alice', country=self.wonderland, contributions_last_year=30)
+        self.bob = GitHubUser.objects.create(github_username='bob', country=self.wonderland, contributions_last_year=20)
+        self.carol = GitHubUser.objects.create(github_username='carol', country=self.atlantis, contributions_last_year=25)
+        self.global_pass = mock.patch.object(tasks.rebuild_global_ranks, 'apply_async').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def ranks(self):
+        return {
+            user.github_username: (user.country_rank, user.country_percentile, user.global_rank)
+            for user in GitHubUser.objects.all()
+        }
+
+    def test_full_rebuild_ranks_countries_and_globally(self):
+        result = leaderboard.rebuild_leaderboards(full=True)
+        self.assertEqual(result, {'countries': 2, 'country_rows': 3, 'global_rows': 3})
+        self.assertEqual(self.ranks(), {
+            'alice': (1, 50.0, 1), 'bob': (2, 100.0, 3), 'carol': (1, 100.0, 2),
+        })
+        self.wonderland.refresh_from_db()
+        self.assertEqual(self.wonderland.leaderboard_size, 2)
+
+    def test_only_moved_rows_are_written(self):
+        leaderboard.rebuild_leaderboards(full=True)
+        GitHubUser.objects.filter(pk=self.bob.pk).update(contributions_last_year=40)
+
+        self.assertEqual(leaderboard.rank_country(self.wonderland), 2)
+        self.assertEqual(leaderboard.rank_country(self.atlantis), 0)
+        # bob passes both others globally
+        self.assertEqual(leaderboard.rank_global(), 3)
+        self.assertEqual(leaderboard.rank_global(), 0)
+
+    def test_incremental_rebuilds_share_one_debounced_global_pass(self):
+        first = leaderboard.rebuild_leaderboards([self.wonderland.pk])
+        leaderboard.rebuild_leaderboards([self.atlantis.pk])
+
+        self.assertEqual((first['countries'], first['global_rows']), (1, 0))
+        self.global_pass.assert_called_once_with(countdown=300)
+        self.assertIsNone(GitHubUser.objects.get(pk=self.alice.pk).global_rank)
+
+        self.assertEqual(leaderboard.run_global_rank(), 3)
+        # The pass released the debounce window
+        leaderboard.rebuild_leaderboards([self.wonderland.pk])
+        self.assertEqual(self.global_pass.call_count, 2)
+
+    def test_global_pass_waits_for_a_running_one(self):
+        cache.add(leaderboard.GLOBAL_LOCK_KEY, 1)
+        self.assertIsNone(leaderboard.run_global_rank())
+
+    def test_badges_of_moved_rows_are_invalidated_after_commit(self):
+        leaderboard.rebuild_leaderboards(full=True)
+        for user in GitHubUser.objects.all():
+            warm_badge_data(user)
+        GitHubUser.objects.filter(pk=self.bob.pk).update(contributions_last_year=40)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            leaderboard.rebuild_leaderboards([self.wonderland.pk])
+            # Before the commit a request would still re-cache the old ranks
+            self.assertIsNotNone(badge_digest('bob', 'rank'))
+        for callback in callbacks:
+            callback()
+
+        self.assertIsNone(badge_digest('bob', 'rank'))
+        self.assertIsNone(badge_digest('alice', 'rank'))
+        self.assertIsNotNone(badge_digest('carol', 'rank'))
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', github_username='owner')
+        # Several edges share a millisecond, some the exact same instant
+        moment = timezone.now().replace(microsecond=500000)
+        for n, offset in enumerate([0, 0, 100, 250, 250, 999, 1000, 5000]):
+            other = User.objects.create_user(email=f'user{n}@example.com', github_username=f'user{n}')
+            edge = UserFollowing.objects.create(from_user=self.owner, to_user=other)
+            UserFollowing.objects.filter(pk=edge.pk).update(created_at=moment + timedelta(microseconds=offset))
+        self.edges = UserFollowing.objects.filter(from_user=self.owner)
+        self.expected = list(self.edges.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def paginator(self):
+        return KeysetPaginator(self.edges, ('-created_at', '-id'), per_page=3)
+
+    def test_forward_cursors_visit_every_row_once(self):
+        seen = []
+        page = self.paginator().get_page()
+        while True:
+            seen += [edge.id for edge in page]
+            if not page.next_cursor:
+                break
+            page = self.paginator().get_page(cursor=page.next_cursor)
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = self.paginator().get_page()
+        second = self.paginator().get_page(cursor=first.next_cursor)
+        back = self.paginator().get_page(cursor=second.previous_cursor)
+        self.assertEqual([edge.id for edge in back], self.expected[:3])
+        self.assertFalse(back.has_previous())
+
+    def test_page_numbers_and_bad_cursors(self):
+        self.assertEqual([edge.id for edge in self.paginator().get_page(page='2')], self.expected[3:6])
+        self.assertEqual([edge.id for edge in self.paginator().get_page(cursor='not-a-cursor')], self.expected[:3])
+        # Past the end shows the first page rather than an empty one
+        self.assertEqual([edge.id for edge in self.paginator().get_page(page='9')], self.expected[:3])
+
+
+class CountryDetailPaginationTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='Wonderland', slug='wonderland')
+        GitHubUser.objects.bulk_create([
+            GitHubUser(github_username=f'user{n}', country=self.country, contributions_last_year=100 - n % 40)
+            for n in range(60)
+        ])
+        leaderboard.rank_country(self.country)
+        self.url = reverse('github_management:country_detail', kwargs={'slug': 'wonderland'})
+
+    def ranks(self, response):
+        return [user.country_rank for user in response.context['page_obj']]
+
+    def test_cursor_and_page_links_agree(self):
+        first = self.client.get(self.url, secure=True)
+        self.assertEqual(self.ranks(first), list(range(1, 26)))
+        by_cursor = self.client.get(self.url, {'cursor': first.context['page_obj'].next_cursor}, secure=True)
+        by_number = self.client.get(self.url, {'page': 2}, secure=True)
+        self.assertEqual(self.ranks(by_cursor), list(range(26, 51)))
+        self.assertEqual(self.ranks(by_number), self.ranks(by_cursor))
+        self.assertEqual(by_number.context['page_obj'].number, 2)
+
+
+class RandomUserSamplerTests(TestCase):
+    def setUp(self):
+        self.wonderland = Country.objects.create(name='Wonderland', slug='wonderland')
+        self.atlantis = Country.objects.create(name='Atlantis', slug='atlantis')
+        GitHubUser.objects.bulk_create([
+            GitHubUser(github_username=f'user{n}', country=self.wonderland if n % 2 else self.atlantis,
+                       contributions_last_year=n)
+            for n in range(100)
+        ])
+        self.requester = User.objects.create_user(email='me@example.com', github_username='me')
+
+    def follow(self, users):
+        GitHubFollowAction.objects.bulk_create(
+            [GitHubFollowAction(user=self.requester, github_user=user) for user in users]
+        )
+
+    def test_samples_distinct_unfollowed_users(self):
+        leaderboard.rebuild_leaderboards(full=True)
+        followed = list(GitHubUser.objects.all()[:30])
+        self.follow(followed)
+
+        picked = RandomUserSampler(self.requester).sample(20)
+
+        self.assertEqual(len({user.pk for user in picked}), 20)
+        self.assertFalse({user.pk for user in picked} & {user.pk for user in followed})
+
+    def test_page_is_filled_when_most_users_are_followed(self):
+        leaderboard.rebuild_leaderboards(full=True)
+        unfollowed = list(GitHubUser.objects.order_by('?')[:5])
+        self.follow(GitHubUser.objects.exclude(pk__in=[user.pk for user in unfollowed]))
+
+        for _ in range(5):
+            picked = RandomUserSampler(self.requester).sample(5)
+            self.assertEqual({user.pk for user in picked}, {user.pk for user in unfollowed})
+        self.assertEqual(len(RandomUserSampler(self.requester).sample(10)), 5)
+
+    def test_country_sample_stays_in_the_country(self):
+        leaderboard.rebuild_leaderboards(full=True)
+        self.wonderland.refresh_from_db()
+        picked = RandomUserSampler(self.requester, country=self.wonderland).sample(10)
+        self.assertEqual(len(picked), 10)
+        self.assertEqual({user.country_id for user in picked}, {self.wonderland.pk})
+
+    def test_works_before_the_leaderboard_is_built(self):
+        self.assertEqual(len(RandomUserSampler(self.requester).sample(10)), 10)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_bursts_then_paces(self):
+        bucket = TokenBucket(rate=20, capacity=3)
+        started = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - started, 0.04)
+        bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+
+@override_settings(GITHUB_FOLLOW_RATE=1000, GITHUB_FOLLOW_BURST=1000)
+class BulkFollowerTests(FakeGitHubMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # A fresh token per test, so each gets its own bucket and cached login
+        self.user = User.objects.create_user(
+            email='me@example.com', github_username='me', github_access_token=f'token-{self.id()}'
+        )
+        self.country = Country.objects.create(name='Wonderland', slug='wonderland')
+        self.targets = [
+            GitHubUser.objects.create(github_username=f'dev{n}', country=self.country) for n in range(6)
+        ]
+        FakeGitHubREST.known = {f'dev{n}' for n in range(5)}
+
+    def test_follows_and_mirrors_successes(self):
+        results = {result.login: result.outcome for result in bulk_follow(self.user, self.targets)}
+
+        self.assertEqual(results, {**{f'dev{n}': FollowOutcome.FOLLOWED for n in range(5)},
+                                   'dev5': FollowOutcome.NOT_FOUND})
+        self.assertEqual(
+            set(GitHubFollowAction.objects.filter(user=self.user).values_list('github_user__github_username', flat=True)),
+            {f'dev{n}' for n in range(5)},
+        )
+        self.assertEqual(
+            set(UserFollowing.objects.filter(from_user=self.user).values_list('to_user__github_username', flat=True)),
+            {f'dev{n}' for n in range(5)},
+        )
+
+    def test_existing_follows_and_self_are_not_sent(self):
+        GitHubFollowAction.objects.create(user=self.user, github_user=self.targets[0])
+        own = GitHubUser.objects.create(github_username='Me', country=self.country)
+
+        results = {result.login: result.outcome for result in bulk_follow(self.user, self.targets[:2] + [own])}
+
+        self.assertEqual(results['dev0'], FollowOutcome.ALREADY_FOLLOWING)
+        self.assertEqual(results['Me'], FollowOutcome.FAILED)
+        self.assertEqual(FakeGitHubREST.writes, [('PUT', 'dev1')])
+
+    def test_rate_limit_stops_the_batch_and_keeps_targets_eligible(self):
+        FakeGitHubREST.limit = 2
+
+        results = bulk_follow(self.user, self.targets[:5], workers=1)
+
+        self.assertEqual([result.outcome for result in results],
+                         [FollowOutcome.FOLLOWED] * 2 + [FollowOutcome.RATE_LIMITED] * 3)
+        self.assertEqual(len(FakeGitHubREST.writes), 2)
+        self.assertEqual(GitHubFollowAction.objects.filter(user=self.user).count(), 2)
+
+    def test_missing_token_follows_nobody(self):
+        self.user.github_access_token = None
+        self.user.save()
+
+        with self.assertLogs('github_management.services', 'WARNING'):
+            results = bulk_follow(self.user, self.targets)
+            job = UnfollowJob.objects.create(user=self.user, days=3, action_ids=[1], total=1)
+            self.assertTrue(run_unfollow_job(job))
+
+        self.assertEqual({result.outcome for result in results}, {FollowOutcome.FAILED})
+        self.assertIsNone(GitHubFollowAction.follow_github_user(self.user, self.targets[0]))
+        self.assertFalse(GitHubFollowAction.objects.exists())
+        self.assertEqual(job.status, UnfollowJob.Status.FAILED)
+        self.assertEqual(FakeGitHubREST.writes, [])
+
+
+class FollowBackResolverTests(EagerCeleryMixin, TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='Wonderland', slug='wonderland')
+        self.user = User.objects.create_user(email='me@example.com', github_username='me')
+        self.actions = {}
+        for login in ('Alice', 'bob', 'carol', 'dave'):
+            self.actions[login] = GitHubFollowAction.objects.create(
+                user=self.user, github_user=GitHubUser.objects.create(github_username=login, country=country)
+            )
+        # alice (any casing) and carol follow me back; carol and dave were followed long ago
+        for login in ('alice', 'carol'):
+            follower = User.objects.create_user(email=f'{login}@example.com', github_username=login)
+            UserFollowing.objects.create(from_user=follower, to_user=self.user)
+        GitHubFollowAction.objects.filter(pk__in=[self.actions['carol'].pk, self.actions['dave'].pk]).update(
+            followed_at=timezone.now() - timedelta(days=30)
+        )
+
+    def statuses(self):
+        return {
+            action.github_user.github_username: action.status
+            for action in GitHubFollowAction.objects.select_related('github_user')
+        }
+
+    def test_actions_are_classified_against_the_follower_set(self):
+        with self.assertNumQueries(4):
+            counts = resolve_user(self.user, grace_days=7, sync=False)
+
+        self.assertEqual(counts, {'checked': 4, 'followed_back': 2, 'not_followed_back': 1})
+        self.assertEqual(self.statuses(), {
+            'Alice': GitHubFollowAction.FollowStatus.FOLLOWED_BACK,
+            'bob': GitHubFollowAction.FollowStatus.PENDING,
+            'carol': GitHubFollowAction.FollowStatus.FOLLOWED_BACK,
+            'dave': GitHubFollowAction.FollowStatus.NOT_FOLLOWED_BACK,
+        })
+        self.assertIsNotNone(GitHubFollowAction.objects.get(pk=self.actions['Alice'].pk).followed_back_at)
+
+    def test_late_follow_backs_are_picked_up(self):
+        resolve_user(self.user, grace_days=7, sync=False)
+        dave = User.objects.create_user(email='dave@example.com', github_username='dave')
+        UserFollowing.objects.create(from_user=dave, to_user=self.user)
+
+        counts = resolve_user(self.user, grace_days=7, sync=False)
+
+        self.assertEqual(counts, {'checked': 2, 'followed_back': 1, 'not_followed_back': 0})
+        self.assertEqual(self.statuses()['dave'], GitHubFollowAction.FollowStatus.FOLLOWED_BACK)
+
+    def test_scheduled_task_resolves_every_user(self):
+        self.assertEqual(tasks.resolve_follow_backs.delay().get(), 1)
+        self.assertEqual(GitHubFollowAction.objects.filter(status=GitHubFollowAction.FollowStatus.PENDING).count(), 1)
+
+
+@override_settings(GITHUB_FOLLOW_RATE=1000, GITHUB_FOLLOW_BURST=1000, GITHUB_FOLLOW_WORKERS=1, UNFOLLOW_BATCH_SIZE=2)
+class UnfollowJobTests(FakeGitHubMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.retry = mock.patch.object(tasks.process_unfollow_job, 'apply_async').start()
+        self.addCleanup(mock.patch.stopall)
+        country = Country.objects.create(name='Wonderland', slug='wonderland')
+        self.user = User.objects.create_user(
+            email='me@example.com', github_username='me', github_access_token=f'token-{self.id()}'
+        )
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        logins = [f'dev{n}' for n in range(5)]
+        FakeGitHubREST.known = set(logins) | {'newbie'}
+        for login in logins + ['newbie']:
+            GitHubFollowAction.objects.create(
+                user=self.user, github_user=GitHubUser.objects.create(github_username=login, country=country)
+            )
+            UserFollowing.objects.create(
+                from_user=self.user,
+                to_user=User.objects.create_user(email=f'{login}@example.com', github_username=login),
+            )
+        GitHubFollowAction.objects.exclude(github_user__github_username='newbie').update(
+            followed_at=timezone.now() - timedelta(days=10)
+        )
+        self.job, _ = prepare_unfollow_job(self.user, days=3)
+
+    def run_job(self):
+        tasks.process_unfollow_job(self.job.pk)
+        self.job.refresh_from_db()
+
+    def test_job_unfollows_old_candidates_in_batches(self):
+        # Followed back after the snapshot: skipped, not unfollowed
+        GitHubFollowAction.objects.filter(github_user__github_username='dev4').update(
+            status=GitHubFollowAction.FollowStatus.FOLLOWED_BACK
+        )
+
+        self.run_job()
+
+        self.assertEqual(self.job.status, UnfollowJob.Status.COMPLETED)
+        self.assertEqual((self.job.total, self.job.unfollowed, self.job.skipped, self.job.failed), (5, 4, 1, 0))
+        self.assertEqual(sorted(target for _, target in FakeGitHubREST.writes), ['dev0', 'dev1', 'dev2', 'dev3'])
+        self.assertEqual(
+            GitHubFollowAction.objects.filter(status=GitHubFollowAction.FollowStatus.UNFOLLOWED).count(), 4
+        )
+        self.assertEqual(
+            list(UserFollowing.objects.filter(from_user=self.user).values_list('to_user__github_username', flat=True)
+                 .order_by('to_user__github_username')),
+            ['dev4', 'newbie'],
+        )
+        status = self.client.get(reverse('github_management:unfollow_job_status', args=[self.job.pk]), secure=True)
+        self.assertEqual(status.json()['percent'], 100)
+
+    def test_rate_limited_job_resumes_where_it_stopped(self):
+        FakeGitHubREST.limit = 3
+
+        self.run_job()
+
+        self.assertEqual(self.job.status, UnfollowJob.Status.QUEUED)
+        self.assertEqual((self.job.processed, self.job.unfollowed), (3, 3))
+        self.retry.assert_called_once_with((self.job.pk,), countdown=mock.ANY)
+        # A second job is not created while this one is waiting
+        self.assertEqual(prepare_unfollow_job(self.user, days=3), (self.job, False))
+
+        FakeGitHubREST.limit = None
+        self.run_job()
+
+        self.assertEqual(self.job.status, UnfollowJob.Status.COMPLETED)
+        self.assertEqual(self.job.unfollowed, 5)
+        self.assertEqual(sorted(target for _, target in FakeGitHubREST.writes), [f'dev{n}' for n in range(5)])
+
+    def test_stalled_job_is_queued_again(self):
+        UnfollowJob.objects.filter(pk=self.job.pk).update(
+            status=UnfollowJob.Status.RUNNING, updated_at=timezone.now() - timedelta(hours=1)
+        )
+        job, enqueue = prepare_unfollow_job(self.user, days=3)
+        self.assertEqual((job.pk, job.status, enqueue), (self.job.pk, UnfollowJob.Status.QUEUED, True))
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='Wonderland', slug='wonderland')
+        for login, first_name, last_name, contributions in [
+            ('alice', 'Alice', 'Liddell', 10),
+            ('malice', '', '', 500),
+            ('bob', 'Bob', 'Alison', 300),
+            ('carol', 'Carol', 'Smith', 50),
+        ]:
+            GitHubUser.objects.create(github_username=login, first_name=first_name, last_name=last_name,
+                                      contributions_last_year=contributions, country=country)
+        search._backend = None
+        self.addCleanup(setattr, search, '_backend', None)
+
+    def logins(self, query, backend):
+        return [user.github_username for user in search.search_users(query, backend=backend)]
+
+    def test_backends_find_the_same_users(self):
+        for query in ('ali', 'ALI', 'smith', 'zz'):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    sorted(self.logins(query, search.FTS5Search())),
+                    sorted(self.logins(query, search.ContainsSearch())),
+                )
+
+    def test_index_follows_updates_and_deletes(self):
+        GitHubUser.objects.filter(github_username='carol').update(last_name='Alibaba')
+        GitHubUser.objects.filter(github_username='malice').delete()
+        self.assertEqual(sorted(self.logins('ali', search.FTS5Search())), ['alice', 'bob', 'carol'])
+
+    def test_login_matches_rank_first_and_short_queries_are_prefixes(self):
+        self.assertEqual(self.logins('alice', search.FTS5Search())[0], 'alice')
+        self.assertEqual(self.logins('ma', search.FTS5Search()), ['malice'])
+        self.assertEqual(search.search_users('   '), [])
+
+    def test_postgres_without_pg_trgm_falls_back_to_contains(self):
+        with mock.patch.object(search.connection, 'vendor', 'postgresql'), \
+                mock.patch.object(search, '_trigram_available', return_value=False), \
+                self.assertLogs('github_management.services.search', 'WARNING'):
+            self.assertIsInstance(search.get_search_backend(), search.ContainsSearch)
+
+    def test_search_endpoint(self):
+        response = self.client.get(reverse('opensearch'), {'q': 'carol'}, secure=True)
+        self.assertEqual(response.json()['results'][0]['country'], 'Wonderland')
+
+
+class AutocompleteIndexTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.settings = override_settings(AUTOCOMPLETE_INDEX_DIR=self.tmp, AUTOCOMPLETE_DELTA_MAX=3)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        # Re-stat the index files on every lookup instead of once a second
+        mock.patch.object(autocomplete, 'RELOAD_SECONDS', 0).start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(autocomplete._open.clear)
+        autocomplete._open.clear()
+
+        self.country = Country.objects.create(name='Wonderland', slug='wonderland')
+        for login in ('Alice', 'alfred', 'bob'):
+            GitHubUser.objects.create(github_username=login, first_name=login.title(), country=self.country)
+        User.objects.create_user(email='al@example.com', github_username='al', is_internal=True)
+        User.objects.create_user(email='bob@example.com', github_username='bob', is_internal=True)
+
+    def logins(self, prefix, limit=10):
+        return [result['github_username'] for result in autocomplete.complete(prefix, limit)]
+
+    def test_nothing_is_served_before_the_first_build(self):
+        self.assertIsNone(autocomplete.complete('al'))
+        response = self.client.get(reverse('autocomplete'), {'q': 'ali'}, secure=True)
+        self.assertEqual([result['github_username'] for result in response.json()['results']], ['Alice'])
+
+    def test_prefix_lookup(self):
+        self.assertEqual(autocomplete.rebuild_index(), 4)
+
+        self.assertEqual(self.logins('AL'), ['al', 'alfred', 'Alice'])
+        self.assertEqual(self.logins('al', limit=2), ['al', 'alfred'])
+        self.assertEqual(self.logins('zed'), [])
+        alice = GitHubUser.objects.get(github_username='Alice')
+        self.assertEqual(autocomplete.complete('alice')[0], search.search_result(alice))
+        # The leaderboard row wins over the internal user of the same login
+        self.assertEqual(autocomplete.complete('bob')[0]['country'], 'Wonderland')
+
+    def test_delta_overrides_the_base_until_it_is_folded_in(self):
+        autocomplete.rebuild_index()
+        GitHubUser.objects.filter(github_username='Alice').update(first_name='Alicia')
+        GitHubUser.objects.create(github_username='alma', country=self.country)
+
+        self.assertEqual(autocomplete.patch_index(GitHubUser.objects.filter(github_username__startswith='al')), 3)
+
+        self.assertEqual(self.logins('al'), ['al', 'alfred', 'Alice', 'alma'])
+        self.assertEqual(autocomplete.complete('alice')[0]['name'], 'Alicia')
+        self.assertEqual(autocomplete.index_stats(), {'base': 4, 'delta': 3})
+
+        GitHubUser.objects.create(github_username='alvin', country=self.country)
+        self.assertEqual(autocomplete.patch_index(GitHubUser.objects.filter(github_username='alvin')), 0)
+        self.assertEqual(autocomplete.index_stats(), {'base': 6, 'delta': 0})
+
+    def test_endpoint_reads_only_the_index(self):
+        autocomplete.rebuild_index()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('autocomplete'), {'q': 'b'}, secure=True)
+        self.assertEqual(response.json()['results'][0]['github_username'], 'bob')
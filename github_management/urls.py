@@ -15,6 +15,9 @@ urlpatterns = [
     path('countries/<slug:slug>/update-stats/', views.UpdateCountryUsersStatsView.as_view(), name='country_update_stats'),
     path('countries/<slug:slug>/fetch/', views.FetchUsersView.as_view(), name='fetch_users'),
     path('api/countries/<slug:slug>/status/', views.FetchStatusView.as_view(), name='country_status'),
+    path('api/countries/<slug:slug>/history/', views.CountryHistoryView.as_view(), name='country_history'),
+    path('api/users/<str:github_username>/history/', views.UserHistoryView.as_view(), name='user_history'),
+    path('api/token-budget/', views.TokenBudgetView.as_view(), name='token_budget'),
     
     path('user/<str:github_username>/', 
          views.UserDetailView.as_view(), 
@@ -32,6 +35,9 @@ path('follow/',
     path('unfollow/', 
          views.UnfollowNonFollowersView.as_view(), 
          name='unfollow_non_followers'),
+    path('api/unfollow-jobs/<int:job_id>/status/',
+         views.UnfollowJobStatusView.as_view(),
+         name='unfollow_job_status'),
     path('update-status/<int:action_id>/', 
          views.UpdateFollowStatusView.as_view(), 
          name='update_follow_status'),
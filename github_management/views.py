@@ -10,11 +10,22 @@ from django.utils import timezone
 from datetime import timedelta
 import random
 import logging
-from .models import Country, GitHubUser, GitHubFollowAction
+from .models import Country, GitHubUser, GitHubFollowAction, UnfollowJob
 from users.models import UserFollowing
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.views.generic import View
-from .tasks import fetch_all_countries_users
+from .tasks import ingest_all_countries, process_unfollow_job
+from .pagination import KeysetPaginator
+from .services.autocomplete import complete
+from .services.bulk_follow import FollowOutcome, bulk_follow
+from .services.bulk_unfollow import prepare_unfollow_job
+from .services.freshness import record_page_view
+from .services.leaderboard import LEADERBOARD_ORDER
+from .services.refresh_coordinator import request_refresh
+from .services.sampler import sample_users
+from .services.search import search_result, search_users
+from .services.stats_history import country_trend, user_trend
+from .services.token_pool import GitHubTokenPool
 from django.urls import reverse
 
 logger = logging.getLogger(__name__)
@@ -53,7 +64,7 @@ class FetchAllCountriesView(View):
     
     def get(self, request, *args, **kwargs):
         if request.user.is_superuser:
-            task = fetch_all_countries_users.delay()
+            task = ingest_all_countries.delay()
             messages.success(
                 request,
                 f"Started fetching users for all countries. Task ID: {task.id}"
@@ -109,14 +120,19 @@ class CountryDetailView(View):
     def get(self, request, slug):
         country = get_object_or_404(Country, slug=slug)
         
-        # Get users for this country
-        users = GitHubUser.objects.filter(country=country).order_by('-contributions_last_year')
-        
-        # Pagination
-        paginator = Paginator(users, 25)  # Show 25 users per page
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-        GitHubUser.objects.with_fresh_data(page_obj)
+        users = GitHubUser.objects.filter(country=country)
+
+        # Keyset pagination in leaderboard order; the materialized ranks give page
+        # numbers and let old ?page=N links seek to rank (N-1)*25 instead of OFFSET
+        paginator = KeysetPaginator(
+            users,
+            LEADERBOARD_ORDER,
+            25,
+            count=country.leaderboard_size or None,
+            position=lambda user: user.country_rank,
+            anchor=lambda offset: users.filter(country_rank=offset).first(),
+        )
+        page_obj = paginator.get_page(cursor=request.GET.get('cursor'), page=request.GET.get('page'))
         return render(request, 'github_management/country_detail.html', {
             'country': country,
             'page_obj': page_obj,
@@ -159,17 +175,50 @@ class FetchStatusView(View):
             'user_count': country.user_count
         })
 
+class TokenBudgetView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """API endpoint exposing the GitHub token pool's remaining budgets (superuser only)"""
+    def test_func(self):
+        return self.request.user.is_superuser
+
+    def get(self, request):
+        return JsonResponse(GitHubTokenPool.from_settings().metrics())
+
+def _history_days(request, default=365):
+    try:
+        return min(max(int(request.GET.get('days', default)), 1), 3650)
+    except ValueError:
+        return default
+
+class UserHistoryView(View):
+    """API endpoint returning a GitHub user's stats history"""
+    def get(self, request, github_username):
+        user = get_object_or_404(GitHubUser, github_username__iexact=github_username)
+        days = _history_days(request)
+        return JsonResponse({
+            'github_username': user.github_username,
+            'days': days,
+            'points': user_trend(user, days=days),
+        })
+
+class CountryHistoryView(View):
+    """API endpoint returning a country's daily totals"""
+    def get(self, request, slug):
+        country = get_object_or_404(Country, slug=slug)
+        days = _history_days(request)
+        return JsonResponse({
+            'country': country.slug,
+            'days': days,
+            'points': country_trend(country, days=days),
+        })
+
 class FollowRandomUsersView(View):
     """View to follow random users from any country"""
     def get(self, request):
-        # Get users not already followed by the current user, ordered randomly
-        users_to_follow = GitHubUser.objects.exclude(
-            follow_actions__user=request.user
-        ).select_related('country').order_by('?')[:50]  # Show first 50 random users
+        # Random users not already followed by the current user
+        users_to_follow = sample_users(50, user=request.user)
         
         # Get all countries for the filter dropdown
         countries = Country.objects.all().order_by('name')
-        GitHubUser.objects.with_fresh_data(users_to_follow)
         # Get the most common country from the users to follow (for display purposes)
         country = users_to_follow[0].country.name if users_to_follow else None
         
@@ -194,35 +243,31 @@ class FollowRandomUsersView(View):
         count = int(request.POST.get('count', 10))  # Default to 10 users
         country_id = request.POST.get('country')
         
-        # Build the base query
-        users_query = GitHubUser.objects.exclude(
-            follow_actions__user=request.user
-        )
-        
         # Filter by country if specified
+        country = None
         if country_id:
-            users_query = users_query.filter(country_id=country_id)
             country = get_object_or_404(Country, id=country_id)
             country_name = country.name
         else:
             country_name = "all countries"
         
         # Get random users
-        users_to_follow = list(users_query.order_by('?')[:count])
+        users_to_follow = sample_users(count, user=request.user, country=country)
         
-        # Follow each user
-        followed = 0
-        for user in users_to_follow:
-            try:
-                GitHubFollowAction.follow_github_user(request.user, user)
-                followed += 1
-            except Exception as e:
-                logger.error(f"Error following user {user.github_username}: {e}")
+        # Follow them concurrently; one bulk insert, no transaction across the GitHub calls
+        results = bulk_follow(request.user, users_to_follow)
+        followed = sum(1 for result in results if result.outcome == FollowOutcome.FOLLOWED)
+        rate_limited = sum(1 for result in results if result.outcome == FollowOutcome.RATE_LIMITED)
+        for result in results:
+            if not result.ok:
+                logger.error(f"Error following user {result.login}: {result.outcome} {result.detail}")
         
         messages.success(
             request, 
             f"Started following {followed} new users from {country_name}."
         )
+        if rate_limited:
+            messages.warning(request, f"GitHub rate limit reached; {rate_limited} users were skipped. Try again later.")
         return redirect('github_management:follow_random')
     
     
@@ -249,7 +294,14 @@ class FollowUserView(View):
         github_user = get_object_or_404(GitHubUser, id=user_id)
         
         try:
-            follow_action = GitHubFollowAction.follow_github_user(request.user, github_user)
+            result = bulk_follow(request.user, [github_user], workers=1)[0]
+            if not result.ok:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'Failed to follow user: {result.detail or result.outcome}',
+                    'outcome': result.outcome,
+                }, status=429 if result.outcome == FollowOutcome.RATE_LIMITED else 400)
+            follow_action = GitHubFollowAction.objects.get(user=request.user, github_user=github_user)
             return JsonResponse({
                 'success': True,
                 'message': f'Started following {github_user.github_username}',
@@ -273,11 +325,12 @@ class UnfollowNonFollowersView(View):
         # Get pending follow actions that haven't been followed back
         pending_actions = GitHubFollowAction.objects.filter(
             user=request.user,
-            status=GitHubFollowAction.FollowStatus.PENDING
+            status__in=[GitHubFollowAction.FollowStatus.PENDING, GitHubFollowAction.FollowStatus.NOT_FOLLOWED_BACK]
         ).select_related('github_user').order_by('-followed_at')
         
         return render(request, 'github_management/unfollow_non_followers.html', {
             'pending_actions': pending_actions,
+            'job': UnfollowJob.objects.filter(user=request.user).first(),
             'active_tab': 'unfollow'
         })
     
@@ -285,8 +338,12 @@ class UnfollowNonFollowersView(View):
         days = int(request.POST.get('days', 3))  # Default to 3 days
         
         try:
-            unfollowed_count = GitHubFollowAction.unfollow_non_followers(request.user, days)
-            messages.success(request, f"Unfollowed {unfollowed_count} users who didn't follow you back after {days} days.")
+            job, enqueue = prepare_unfollow_job(request.user, days)
+            if enqueue:
+                process_unfollow_job.delay(job.id)
+                messages.success(request, f"Unfollowing {job.total - job.processed} users who didn't follow you back in the background.")
+            else:
+                messages.info(request, "An unfollow job is already running.")
         except Exception as e:
             logger.error(f"Error unfollowing non-followers: {e}")
             messages.error(request, f"Failed to unfollow users: {str(e)}")
@@ -294,6 +351,18 @@ class UnfollowNonFollowersView(View):
         return redirect('github_management:unfollow_non_followers')
 
 
+class UnfollowJobStatusView(View):
+    """API endpoint to check an unfollow job's progress"""
+    def get(self, request, job_id):
+        if not request.user.is_authenticated:
+            return JsonResponse({
+                'success': False,
+                'message': 'You must be logged in to view unfollow jobs.'
+            }, status=401)
+        job = get_object_or_404(UnfollowJob, id=job_id, user=request.user)
+        return JsonResponse(job.as_dict())
+
+
 class UpdateFollowStatusView(View):
     """API endpoint to update follow status for a user"""
     def post(self, request, action_id):
@@ -333,16 +402,8 @@ class UserDetailView(View):
     """View to show detailed information about a GitHub user"""
     def get(self, request, github_username):
         user = get_object_or_404(GitHubUser, github_username__iexact=github_username)
-        
-        # Auto-refresh stats in background if data is stale (> 1 day)
-        auto_refresh_started = False
-        try:
-            if not user.fetched_at or (timezone.now() - user.fetched_at) > timedelta(days=1):
-                from .tasks import update_users_stats_batch
-                update_users_stats_batch.delay([user.id], "GitHubUser")
-                auto_refresh_started = True
-        except Exception as e:
-            logger.error(f"Failed to auto-enqueue refresh for {user.github_username}: {e}")
+        # Popularity input for the background freshness scheduler
+        record_page_view(user.id)
 
         # Check if the current user is following this GitHub user
         # Only check if the user is authenticated
@@ -357,14 +418,12 @@ class UserDetailView(View):
         similar_users = GitHubUser.objects.filter(
             country=user.country
         ).exclude(id=user.id).order_by('-contributions_last_year')[:5]
-        GitHubUser.objects.with_fresh_data(similar_users)
         
         context = {
             'github_user': user,
             'is_following': is_following,
             'similar_users': similar_users,
             'active_tab': 'users',
-            'auto_refresh_started': auto_refresh_started,
         }
         
         return render(request, 'github_management/user_detail.html', context)
@@ -385,12 +444,15 @@ class UpdateSingleUserStatsView(LoginRequiredMixin, View):
                 'stale': False,
             })
         try:
-            from .tasks import update_users_stats_batch
-            task = update_users_stats_batch.delay([gh_user.id], "GitHubUser")
+            queued = request_refresh([gh_user.id], "GitHubUser")
+            if queued:
+                message = f'Queued a stats refresh for @{gh_user.github_username}.'
+            else:
+                message = f'A refresh for @{gh_user.github_username} is already queued.'
             return JsonResponse({
                 'success': True,
-                'message': f'Started refreshing stats for @{gh_user.github_username}.',
-                'task_id': str(task.id),
+                'message': message,
+                'task_id': None,
                 'user_id': gh_user.id,
                 'stale': True,
             })
@@ -409,18 +471,20 @@ class SearchUsersView(View):
         if not query:
             return JsonResponse({'results': []})
 
-        users = GitHubUser.objects.filter(
-            Q(github_username__icontains=query) |
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query)
-        )[:10]  # Limit to 10 results
+        # Ranked by the search index, country joined in the same query
+        users = search_users(query, limit=10)
+        return JsonResponse({'results': [search_result(user) for user in users]})
 
-        results = [{
-            'github_username': user.github_username,
-            'name': user.full_name,
-            'avatar_url': user.avatar_url or '',
-            'url': user.get_absolute_url(),
-            'country': user.country.name if user.country else ''
-        } for user in users]
 
+class AutocompleteUsersView(View):
+    """Login prefix completion from the memory-mapped index (no database access)"""
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse({'results': []})
+
+        results = complete(query, limit=10)
+        if results is None:
+            # Index not built yet
+            results = [search_result(user) for user in search_users(query, limit=10)]
         return JsonResponse({'results': results})
\ No newline at end of file
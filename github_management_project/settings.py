@@ -163,6 +163,33 @@ LOGIN_REDIRECT_URL = '/profile/'
 LOGOUT_REDIRECT_URL = '/'
 
 GITHUB_TOKEN=os.getenv("GITHUB_TOKEN")
+# Users per aliased GraphQL request when refreshing stats
+GITHUB_GRAPHQL_BATCH_SIZE = int(os.getenv("GITHUB_GRAPHQL_BATCH_SIZE", 100))
+# Rows per bulk UPDATE when writing refreshed stats
+STATS_WRITE_BATCH_SIZE = int(os.getenv("STATS_WRITE_BATCH_SIZE", 500))
+# Extra comma-separated tokens pooled with GITHUB_TOKEN for background refreshes
+GITHUB_TOKENS = [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",") if t.strip()]
+# Longest a job waits (seconds) for a drained token pool to reset; past that the work is
+# re-scheduled for the reset instead of holding a worker. Budgets are only shared between
+# processes when CACHE_URL is set.
+GITHUB_TOKEN_POOL_MAX_WAIT = int(os.getenv("GITHUB_TOKEN_POOL_MAX_WAIT", 5))
+# Seconds each process reuses its copy of the tokens users share; saving a token reloads them sooner
+GITHUB_TOKEN_POOL_REFRESH = int(os.getenv("GITHUB_TOKEN_POOL_REFRESH", 300))
+# Bulk follows: concurrent PUTs, and the per-token pace (requests/second, burst)
+# kept under GitHub's secondary limits for content-creating requests
+GITHUB_FOLLOW_WORKERS = int(os.getenv("GITHUB_FOLLOW_WORKERS", 8))
+GITHUB_FOLLOW_RATE = float(os.getenv("GITHUB_FOLLOW_RATE", 2.0))
+GITHUB_FOLLOW_BURST = int(os.getenv("GITHUB_FOLLOW_BURST", 20))
+# Background unfollow jobs: candidates per saved batch, seconds to wait after a
+# rate limit, and minutes without progress before an active job is resumed
+UNFOLLOW_BATCH_SIZE = int(os.getenv("UNFOLLOW_BATCH_SIZE", 50))
+UNFOLLOW_RETRY_SECONDS = int(os.getenv("UNFOLLOW_RETRY_SECONDS", 900))
+UNFOLLOW_JOB_STALE_MINUTES = int(os.getenv("UNFOLLOW_JOB_STALE_MINUTES", 10))
+# Minutes between follower/following syncs triggered from the relationships page;
+# unchanged lists cost two conditional (304) requests, which GitHub does not count
+RELATIONSHIP_SYNC_INTERVAL = int(os.getenv("RELATIONSHIP_SYNC_INTERVAL", 15))
+# Hours after which a sync walks every page even if page 1 is unchanged
+RELATIONSHIP_SYNC_FULL_INTERVAL = int(os.getenv("RELATIONSHIP_SYNC_FULL_INTERVAL", 24))
 # -----------------------------
 # OAuth Settings (GitHub + Google)
 # -----------------------------
@@ -246,9 +273,31 @@ DATABASES = {
 }
 
 
+# -----------------------------
+# Cache
+# -----------------------------
+# Shared across web and worker processes when CACHE_URL points at Redis
+CACHE_URL = os.getenv("CACHE_URL")
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # -----------------------------
 # Celery Configuration
 # -----------------------------
+from celery.schedules import crontab
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
 CELERY_ACCEPT_CONTENT = ['json']
@@ -256,6 +305,104 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = os.getenv("CELERY_TIMEZONE", "UTC")
 
+# Stats refresh coordination: page views are coalesced into one batch per window
+REFRESH_COORDINATOR_URL = os.getenv("REFRESH_COORDINATOR_URL", CACHE_URL or CELERY_BROKER_URL)
+REFRESH_COALESCE_WINDOW = int(os.getenv("REFRESH_COALESCE_WINDOW", 30))
+# Users refreshed within this many seconds are not queued again
+REFRESH_COOLDOWN = int(os.getenv("REFRESH_COOLDOWN", 600))
+# Queued users whose task has not reported back after this long may be queued again
+REFRESH_INFLIGHT_TTL = int(os.getenv("REFRESH_INFLIGHT_TTL", 900))
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", 100))
+
+# Background freshness scheduler (replaces refreshes triggered by page views)
+FRESHNESS_TICK_SECONDS = int(os.getenv("FRESHNESS_TICK_SECONDS", 600))
+# Users refreshed per tick across GitHubUser and User rows
+FRESHNESS_USERS_PER_TICK = int(os.getenv("FRESHNESS_USERS_PER_TICK", 1000))
+# Rows fetched more recently than this are never picked
+FRESHNESS_MIN_AGE_HOURS = float(os.getenv("FRESHNESS_MIN_AGE_HOURS", 6))
+# Refresh interval of a user with no popularity; popular users are due proportionally sooner
+FRESHNESS_BASE_INTERVAL_HOURS = float(os.getenv("FRESHNESS_BASE_INTERVAL_HOURS", 72))
+# Failed refreshes are retried after this many minutes, doubling per failure up to the cap
+FRESHNESS_RETRY_BASE_MINUTES = int(os.getenv("FRESHNESS_RETRY_BASE_MINUTES", 30))
+FRESHNESS_RETRY_MAX_HOURS = int(os.getenv("FRESHNESS_RETRY_MAX_HOURS", 7 * 24))
+# Users ranked this high in their country are kept at most FRESHNESS_TOP_MAX_AGE_HOURS stale
+FRESHNESS_TOP_RANK = int(os.getenv("FRESHNESS_TOP_RANK", 10))
+FRESHNESS_TOP_MAX_AGE_HOURS = float(os.getenv("FRESHNESS_TOP_MAX_AGE_HOURS", 6))
+
+# Incremental leaderboard rebuilds queue one global re-rank this many seconds later
+LEADERBOARD_GLOBAL_DEBOUNCE = int(os.getenv("LEADERBOARD_GLOBAL_DEBOUNCE", 300))
+
+# Stats history retention: daily rows, then one per week, then one per month
+STATS_HISTORY_DAILY_DAYS = int(os.getenv("STATS_HISTORY_DAILY_DAYS", 90))
+STATS_HISTORY_WEEKLY_DAYS = int(os.getenv("STATS_HISTORY_WEEKLY_DAYS", 730))
+# User id range handled per downsampling DELETE
+STATS_HISTORY_DOWNSAMPLE_CHUNK = int(os.getenv("STATS_HISTORY_DOWNSAMPLE_CHUNK", 5000))
+
+# Follow actions not followed back after this many days are marked NOT_FOLLOWED_BACK
+FOLLOW_BACK_GRACE_DAYS = int(os.getenv("FOLLOW_BACK_GRACE_DAYS", 3))
+FOLLOW_BACK_RESOLVE_SECONDS = int(os.getenv("FOLLOW_BACK_RESOLVE_SECONDS", 3600))
+
+CELERY_BEAT_SCHEDULE = {
+    'freshness-tick': {
+        'task': 'github_management.tasks.freshness_tick',
+        'schedule': FRESHNESS_TICK_SECONDS,
+    },
+    'maintain-stats-history': {
+        'task': 'github_management.tasks.maintain_stats_history',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'resolve-follow-backs': {
+        'task': 'github_management.tasks.resolve_follow_backs',
+        'schedule': FOLLOW_BACK_RESOLVE_SECONDS,
+    },
+    'rebuild-autocomplete-index': {
+        'task': 'github_management.tasks.rebuild_autocomplete_index',
+        'schedule': crontab(hour=4, minute=15),
+    },
+    'prune-png-badge-cache': {
+        'task': 'badges.tasks.prune_png_cache',
+        'schedule': crontab(hour=4, minute=45),
+    },
+}
+
+
+# -----------------------------
+# committers.top Ingestion
+# -----------------------------
+COMMITTERS_TOP_URL = os.getenv("COMMITTERS_TOP_URL", "https://committers.top")
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", 16))
+INGEST_PER_HOST_LIMIT = int(os.getenv("INGEST_PER_HOST_LIMIT", 8))
+INGEST_REQUEST_TIMEOUT = float(os.getenv("INGEST_REQUEST_TIMEOUT", 30))
+COMMITTERS_TOP_REQUEST_DELAY = float(os.getenv("COMMITTERS_TOP_REQUEST_DELAY", 0.2))
+# One of: auto, lxml, stream, bs4 (auto picks lxml when installed)
+COMMITTERS_TOP_PARSER = os.getenv("COMMITTERS_TOP_PARSER", "auto")
+# Conditional-GET snapshot cache for country pages; set empty to disable
+COMMITTERS_TOP_CACHE_DIR = os.getenv("COMMITTERS_TOP_CACHE_DIR", os.path.join(BASE_DIR, "cache", "committers_top"))
+# Memory-mapped login autocomplete index, shared by all processes on the host;
+# ingests patch a delta file that is folded into a rebuild past AUTOCOMPLETE_DELTA_MAX
+AUTOCOMPLETE_INDEX_DIR = os.getenv("AUTOCOMPLETE_INDEX_DIR", os.path.join(BASE_DIR, "cache", "autocomplete"))
+AUTOCOMPLETE_DELTA_MAX = int(os.getenv("AUTOCOMPLETE_DELTA_MAX", 50000))
+
+
+# -----------------------------
+# Badges
+# -----------------------------
+# PNG badges are rasterized in a per-process pool of BADGE_PNG_WORKERS processes with at most
+# BADGE_PNG_QUEUE_SIZE renders in flight; requests that wait longer than BADGE_PNG_QUEUE_WAIT
+# for a slot, or BADGE_PNG_TIMEOUT for the render, are served the SVG instead
+BADGE_PNG_WORKERS = int(os.getenv("BADGE_PNG_WORKERS", 2))
+BADGE_PNG_QUEUE_SIZE = int(os.getenv("BADGE_PNG_QUEUE_SIZE", 8))
+BADGE_PNG_QUEUE_WAIT = float(os.getenv("BADGE_PNG_QUEUE_WAIT", 0.5))
+BADGE_PNG_TIMEOUT = float(os.getenv("BADGE_PNG_TIMEOUT", 5))
+# Rendered PNGs keyed by SVG hash: in-memory LRU bytes, then on disk (set empty to disable)
+BADGE_PNG_MEMORY_BYTES = int(os.getenv("BADGE_PNG_MEMORY_BYTES", 32 * 1024 * 1024))
+BADGE_PNG_CACHE_DIR = os.getenv("BADGE_PNG_CACHE_DIR", os.path.join(BASE_DIR, "cache", "badges_png"))
+BADGE_PNG_CACHE_DAYS = int(os.getenv("BADGE_PNG_CACHE_DAYS", 7))
+# Users per country (by committers.top rank) whose badges are pre-rendered after each ingest or refresh
+BADGE_WARMUP_PER_COUNTRY = int(os.getenv("BADGE_WARMUP_PER_COUNTRY", 50))
+# Changes to a country within this many seconds share one queued badge warm-up
+BADGE_WARMUP_DEBOUNCE = int(os.getenv("BADGE_WARMUP_DEBOUNCE", 300))
+
 
 # -----------------------------
 # Templates
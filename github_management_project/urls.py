@@ -8,7 +8,7 @@ from django.conf.urls.static import static
 from django.contrib.sitemaps.views import sitemap
 from github_management.views_auth import HomeView, ProfileView, google_one_tap_auth
 from github_management.sitemap import sitemaps
-from github_management.views import SearchUsersView
+from github_management.views import AutocompleteUsersView, SearchUsersView
 
 from django.views.generic.base import TemplateView
 from django.http import HttpResponse
@@ -52,6 +52,7 @@ urlpatterns = [
     
     
     path('search/', SearchUsersView.as_view(), name='opensearch'),
+    path('search/autocomplete/', AutocompleteUsersView.as_view(), name='autocomplete'),
     # Sitemap
     path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
     
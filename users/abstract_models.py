@@ -14,6 +14,10 @@ class BaseUser(models.Model):
     profile_url = models.URLField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
     fetched_at = models.DateTimeField(auto_now=True)
+    # When the freshness scheduler should refresh this row next (indexed on the concrete models)
+    refresh_due_at = models.DateTimeField(default=timezone.now)
+    # Consecutive failed refreshes; each one doubles the retry delay
+    refresh_failures = models.PositiveSmallIntegerField(default=0)
     is_updating = models.BooleanField(default=False)
     contributions_last_year = models.PositiveIntegerField(default=0)
     # Additional GitHub profile metadata (nullable for backward compatibility)
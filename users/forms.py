@@ -37,4 +37,9 @@ class GitHubTokenForm(forms.Form):
                 code='invalid_token'
             )
         ]
-    )
\ No newline at end of file
+    )
+    share_for_refresh = forms.BooleanField(
+        label='Share for background stats refresh',
+        required=False,
+        help_text='Let the site spend unused rate-limit budget of this token on refreshing public GitHub stats.'
+    )
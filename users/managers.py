@@ -1,8 +1,6 @@
 # users/managers.py
 from django.contrib.auth.base_user import BaseUserManager
 from django.db import models
-from django.utils import timezone
-from datetime import timedelta
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -55,44 +53,15 @@ class UserManager(BaseUserManager):
         
         return user
 
-    def with_fresh_data(self, queryset=None):
-        """
-        Ensure all users in the queryset or page have fresh data.
-        Returns the same queryset/page for chaining.
-        """
-        from django.core.paginator import Page
-        
-        if queryset is None:
-            queryset = self.get_queryset()
-        
-        # Handle both QuerySet and Page objects
-        if isinstance(queryset, Page):
-            # Get the actual queryset from the page
-            user_queryset = queryset.object_list
-            # Get the model's base queryset for the filter
-            model_queryset = self.get_queryset()
-            # Get the pks from the page
-            pks = list(user_queryset.values_list('pk', flat=True))
-            # Create a new queryset with the same filters but not sliced
-            user_queryset = model_queryset.filter(pk__in=pks)
-        else:
-            # For regular querysets, make sure we're not working with a sliced one
-            if not queryset.query.low_mark and not queryset.query.high_mark:
-                user_queryset = queryset
-            else:
-                # If it's already sliced, get the pks and create a new queryset
-                pks = list(queryset.values_list('pk', flat=True))
-                user_queryset = self.get_queryset().filter(pk__in=pks)
-        
-        # Identify users that need updates
-        stale_users = list(user_queryset.filter(
-            models.Q(fetched_at__isnull=True) | 
-            models.Q(fetched_at__lt=timezone.now() - timedelta(hours=24))
-        ).values_list('id', flat=True))
-        
-        # Trigger batch update if there are stale users
-        if stale_users:
-            from github_management.tasks import update_users_stats_batch
-            update_users_stats_batch.delay(stale_users,"User")
-        
-        return queryset
\ No newline at end of file
+    def stale(self, older_than):
+        """Users with a GitHub login whose stats were last fetched before ``older_than``."""
+        return self.get_queryset().exclude(github_username__isnull=True).exclude(github_username='').filter(
+            models.Q(fetched_at__isnull=True) |
+            models.Q(fetched_at__lt=older_than)
+        )
+
+    def due(self, now):
+        """Users with a GitHub login whose scheduled refresh time has come."""
+        return self.get_queryset().exclude(github_username__isnull=True).exclude(github_username='').filter(
+            refresh_due_at__lte=now
+        )
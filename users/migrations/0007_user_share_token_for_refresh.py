@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_account_type_user_bio_user_blog_user_company_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='share_token_for_refresh',
+            field=models.BooleanField(default=False, help_text="Allow the GitHub token pool to use this user's access token for background stats refresh."),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_users_user_fetched_6c6b8e_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GitHubListPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('followers', 'Followers'), ('following', 'Following')], max_length=10)),
+                ('page', models.PositiveIntegerField()),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('logins', models.JSONField(default=list)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+                ('walked_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='github_list_pages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind', 'page'), name='unique_github_list_page')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def schedule_existing_rows(apps, schema_editor):
+    # Existing rows are due in the order they were last fetched, oldest first
+    User = apps.get_model('users', 'User')
+    User.objects.update(refresh_due_at=models.F('fetched_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0009_github_list_page'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='refresh_due_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='refresh_failures',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['refresh_due_at'], name='users_user_refresh_733a8f_idx'),
+        ),
+        migrations.RunPython(schedule_existing_rows, migrations.RunPython.noop),
+    ]
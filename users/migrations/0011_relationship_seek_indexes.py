@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_refresh_schedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userfollowing',
+            index=models.Index(fields=['from_user', 'created_at', 'id'], name='users_follow_from_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userfollowing',
+            index=models.Index(fields=['to_user', 'created_at', 'id'], name='users_follow_to_seek_idx'),
+        ),
+    ]
@@ -11,6 +11,10 @@ from .managers import UserManager
 class User(AbstractUser, BaseUser):
     username = None  # We're using email as the username
     github_access_token = models.CharField(max_length=255, blank=True, null=True)
+    share_token_for_refresh = models.BooleanField(
+        default=False,
+        help_text="Allow the GitHub token pool to use this user's access token for background stats refresh."
+    )
     is_internal = models.BooleanField(
         default=False,
         help_text="Designates whether this user is an internal user (registered in our system) or external (just a GitHub user)."
@@ -23,6 +27,10 @@ class User(AbstractUser, BaseUser):
     
     class Meta(AbstractUser.Meta):
         swappable = 'AUTH_USER_MODEL'
+        indexes = [
+            models.Index(fields=['fetched_at']),
+            models.Index(fields=['refresh_due_at']),
+        ]
         
     def __str__(self):
         return self.email
@@ -59,6 +67,9 @@ class UserFollowing(models.Model):
             models.Index(fields=['from_user']),
             models.Index(fields=['to_user']),
             models.Index(fields=['from_user', 'to_user']),  # For faster lookups
+            # Keyset pagination of a user's relationships, newest first
+            models.Index(fields=['from_user', 'created_at', 'id'], name='users_follow_from_seek_idx'),
+            models.Index(fields=['to_user', 'created_at', 'id'], name='users_follow_to_seek_idx'),
         ]
     
     def __str__(self):
@@ -100,4 +111,37 @@ class UserFollowing(models.Model):
     def get_followers(cls, user):
         """Get all users that are following the given user."""
         return cls.objects.filter(to_user=user)
-    
\ No newline at end of file
+    
+
+class GitHubListPage(models.Model):
+    """Last seen copy of one page of a user's GitHub followers/following list.
+
+    The ETag is sent back as ``If-None-Match`` on the next sync; a 304 costs
+    no rate limit and the stored logins stand in for the page body.
+    """
+
+    class Kind(models.TextChoices):
+        FOLLOWERS = 'followers', 'Followers'
+        FOLLOWING = 'following', 'Following'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='github_list_pages',
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    page = models.PositiveIntegerField()
+    etag = models.CharField(max_length=255, blank=True)
+    # [[login, avatar_url], ...] as returned by GitHub
+    logins = models.JSONField(default=list)
+    fetched_at = models.DateTimeField(auto_now=True)
+    # Last time the whole list was walked and this page was part of it
+    walked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind', 'page'], name='unique_github_list_page'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.kind} page {self.page}"
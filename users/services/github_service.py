@@ -1,18 +1,107 @@
 # users/services/github_service.py
-from github import Github, GithubException
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+
+from github import Github
 from django.conf import settings
+from django.core.cache import cache
 import requests
+from requests.adapters import HTTPAdapter
 from django.db import transaction
 from users.models import User, UserFollowing
 
+
+class GitHubFollowClient:
+    """Minimal REST client for follow/unfollow and the follower lists.
+
+    Only the idempotent ``PUT``/``DELETE /user/following/{login}`` calls are
+    made (both answer 204 whether or not anything changed), over one
+    keep-alive session per token. The authenticated login is looked up once
+    and cached.
+    """
+    API_URL = 'https://api.github.com'
+    LOGIN_CACHE_TTL = 24 * 3600
+    MAX_SESSIONS = 64
+    PAGE_SIZE = 100
+
+    _sessions = OrderedDict()
+    _sessions_lock = threading.Lock()
+
+    def __init__(self, access_token):
+        self.access_token = access_token
+        self.fingerprint = sha256(access_token.encode()).hexdigest()[:12]
+        self.session = self._session_for(access_token, self.fingerprint)
+
+    @classmethod
+    def _session_for(cls, access_token, fingerprint):
+        with cls._sessions_lock:
+            session = cls._sessions.get(fingerprint)
+            if session is None:
+                session = requests.Session()
+                session.headers.update({
+                    "Authorization": f"token {access_token}",
+                    "Accept": "application/vnd.github+json",
+                })
+                pool_size = getattr(settings, 'GITHUB_FOLLOW_WORKERS', 10)
+                session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+                cls._sessions[fingerprint] = session
+                if len(cls._sessions) > cls.MAX_SESSIONS:
+                    _, oldest = cls._sessions.popitem(last=False)
+                    oldest.close()
+            else:
+                cls._sessions.move_to_end(fingerprint)
+            return session
+
+    def login(self):
+        """The token owner's login (one ``GET /user`` per token per day)."""
+        key = f"github:login:{self.fingerprint}"
+        login = cache.get(key)
+        if login is None:
+            response = self.session.get(f"{self.API_URL}/user", timeout=10)
+            response.raise_for_status()
+            login = response.json()['login']
+            cache.set(key, login, self.LOGIN_CACHE_TTL)
+        return login
+
+    def follow(self, target_username):
+        return self.session.put(
+            f"{self.API_URL}/user/following/{target_username}",
+            headers={"Content-Length": "0"},
+            timeout=10,
+        )
+
+    def unfollow(self, target_username):
+        return self.session.delete(f"{self.API_URL}/user/following/{target_username}", timeout=10)
+
+    def list_page(self, kind, page, etag=None):
+        """One page of the token owner's ``followers`` or ``following`` (up to 100 users).
+
+        With ``etag`` the request is conditional and GitHub answers 304, free
+        of rate limit, when the page is unchanged.
+        """
+        return self.session.get(
+            f"{self.API_URL}/user/{kind}",
+            params={'per_page': self.PAGE_SIZE, 'page': page},
+            headers={'If-None-Match': etag} if etag else None,
+            timeout=10,
+        )
+
+
 class GitHubService:
     @staticmethod
     def get_github_client(access_token):
         """Get authenticated GitHub client"""
         return Github(access_token, timeout=10, per_page=100)
 
+    @staticmethod
+    def _is_self(client, target_username):
+        try:
+            return client.login().lower() == target_username.lower()
+        except (requests.RequestException, KeyError, ValueError):
+            return False
+
     @classmethod
-    @transaction.atomic
     def follow_user_on_github(cls, user, target_username):
         """Follow a user on GitHub and update local database"""
         access_token = user.github_access_token
@@ -20,73 +109,52 @@ class GitHubService:
             print("❌ No GitHub access token found for user")
             return False
 
+        client = GitHubFollowClient(access_token)
+        if cls._is_self(client, target_username):
+            print("⚠️ Refusing to follow the token owner")
+            return False
+
         try:
-            g = cls.get_github_client(access_token)
-            github_user = g.get_user()
-
-            # Validate target username
-            try:
-                target_user = g.get_user(target_username)
-                target_username = target_user.login
-            except GithubException as e:
-                print(f"❌ Target user {target_username} not found: {e}")
-                return False
-
-            # Check if already following
-            if github_user.has_in_following(target_user):
-                print(f"✅ Already following {target_username}")
-                return True
-
-            # Use direct REST API
-            url = f"https://api.github.com/user/following/{target_username}"
-            headers = {
-                "Authorization": f"token {access_token}",
-                "Accept": "application/vnd.github+json",
-                "Content-Length": "0"
-            }
-
-            response = requests.put(url, headers=headers)
-            if response.status_code == 204:
-                print(f"✅ Successfully followed {target_username}")
-                # Update local database
-                target_user_obj, created = User.objects.get_or_create(
-                    github_username__iexact=target_username,
-                    defaults={
-                        'github_username': target_username,
-                        'is_active': False,
-                        'is_internal': False
-                    }
-                )
-                if created:
-                    target_user_obj.avatar_url = target_user.avatar_url
-                    target_user_obj.first_name = target_user.name
-                    target_user_obj.last_name = target_user.name
-                    target_user_obj.is_active = True
-                    target_user_obj.is_internal = True
-                    target_user_obj.save()
+            response = client.follow(target_username)
+        except requests.RequestException as e:
+            print(f"Unexpected error following {target_username}: {str(e)}")
+            return False
+
+        if response.status_code == 204:
+            print(f"✅ Successfully followed {target_username}")
+            # Network work is done; only now touch the database
+            with transaction.atomic():
+                target_user_obj = User.objects.filter(github_username__iexact=target_username).first()
+                if target_user_obj is None:
+                    from github_management.models import GitHubUser
+
+                    known = GitHubUser.objects.filter(github_username__iexact=target_username).first()
+                    target_user_obj, _ = User.objects.get_or_create(
+                        github_username=target_username,
+                        defaults={
+                            'email': f"{target_username}@users.noreply.github.com",
+                            'avatar_url': known.avatar_url if known else None,
+                            'first_name': (known.first_name if known else None) or '',
+                            'last_name': (known.last_name if known else None) or '',
+                            'password': '!',
+                            'is_active': False,
+                            'is_internal': False,
+                        }
+                    )
                 # Create or update the following relationship
                 UserFollowing.objects.update_or_create(
                     from_user=user,
                     to_user=target_user_obj
                 )
-                
-                return True
-            
-            elif response.status_code == 404:
-                print("❌ 404: Token likely missing 'user:follow' permission or user not found")
-            else:
-                print(f"❌ Error: {response.status_code} -> {response.text}")
-            return False
+            return True
 
-        except GithubException as e:
-            print(f"GitHub API error following {target_username}: {e.data.get('message', str(e))}")
-            return False
-        except Exception as e:
-            print(f"Unexpected error following {target_username}: {str(e)}")
-            return False
+        if response.status_code == 404:
+            print("❌ 404: Token likely missing 'user:follow' permission or user not found")
+        else:
+            print(f"❌ Error: {response.status_code} -> {response.text}")
+        return False
 
     @classmethod
-    @transaction.atomic
     def unfollow_user_on_github(cls, user, target_username):
         """Unfollow a user on GitHub and update local database"""
         access_token = user.github_access_token
@@ -95,52 +163,21 @@ class GitHubService:
             return False
 
         try:
-            g = cls.get_github_client(access_token)
-            github_user = g.get_user()
-
-            try:
-                target_user = g.get_user(target_username)
-                target_username = target_user.login
-            except GithubException:
-                print(f"⚠️ Target user {target_username} not found — considered already unfollowed")
-                return True
-
-            if not github_user.has_in_following(target_user):
-                print(f"⚠️ Not following {target_username}")
-                return True
-
-            url = f"https://api.github.com/user/following/{target_username}"
-            headers = {
-                "Authorization": f"token {access_token}",
-                "Accept": "application/vnd.github+json",
-            }
-
-            response = requests.delete(url, headers=headers)
-            if response.status_code == 204:
-                print(f"✅ Successfully unfollowed {target_username}")
-                
-                # Update local database
-                target_user_obj = User.objects.filter(
-                    github_username__iexact=target_username
-                ).first()
-                
-                if target_user_obj:
-                    # Remove the following relationship
-                    UserFollowing.objects.filter(
-                        from_user=user,
-                        to_user=target_user_obj
-                    ).delete()
-                    
-                return True
-            elif response.status_code == 404:
-                print("❌ 404: Token likely missing 'user:follow' permission or user not found")
-            else:
-                print(f"❌ Error: {response.status_code} -> {response.text}")
+            response = GitHubFollowClient(access_token).unfollow(target_username)
+        except requests.RequestException as e:
+            print(f"Unexpected error unfollowing {target_username}: {str(e)}")
             return False
 
-        except GithubException as e:
-            print(f"GitHub API error unfollowing {target_username}: {e.data.get('message', str(e))}")
-            return False
-        except Exception as e:
-            print(f"Unexpected error unfollowing {target_username}: {str(e)}")
-            return False
\ No newline at end of file
+        if response.status_code == 204:
+            print(f"✅ Successfully unfollowed {target_username}")
+            # Remove the following relationship
+            UserFollowing.objects.filter(
+                from_user=user,
+                to_user__github_username__iexact=target_username
+            ).delete()
+            return True
+        if response.status_code == 404:
+            print("❌ 404: Token likely missing 'user:follow' permission or user not found")
+        else:
+            print(f"❌ Error: {response.status_code} -> {response.text}")
+        return False
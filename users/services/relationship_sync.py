@@ -0,0 +1,222 @@
+# users/services/relationship_sync.py
+import logging
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from users.models import GitHubListPage, User, UserFollowing
+from .github_service import GitHubFollowClient
+
+logger = logging.getLogger(__name__)
+
+FOLLOWERS = 'followers'
+FOLLOWING = 'following'
+CHUNK = 1000
+
+
+@dataclass
+class SyncResult:
+    followers_added: int = 0
+    followers_removed: int = 0
+    following_added: int = 0
+    following_removed: int = 0
+    users_created: int = 0
+    requests: int = 0
+    not_modified: int = 0
+    # True when both lists were unchanged and nothing was reconciled
+    skipped: bool = False
+
+    @property
+    def changed(self) -> int:
+        return self.followers_added + self.followers_removed + self.following_added + self.following_removed
+
+    def as_dict(self) -> Dict[str, int]:
+        return {**asdict(self), 'changed': self.changed}
+
+
+def _chunks(items: List, size: int = CHUNK) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class RelationshipSync:
+    """Reconcile a user's ``UserFollowing`` edges with GitHub by set difference.
+
+    Follower and following logins are paged from the REST API (100 per
+    request, logins and avatars only), compared with one query of the
+    existing edges per direction, and the difference is applied with one
+    ``bulk_create`` and one bulk delete. A failed page aborts the sync before
+    anything is written, so a partial list never deletes edges.
+
+    Every page is requested conditionally with the ETag stored in
+    ``GitHubListPage``; unchanged pages answer 304 (free of rate limit) and
+    their stored logins are reused. When page 1 of both lists is unchanged
+    the sync stops there. Removals deep in a list leave page 1 intact, so a
+    full walk is still forced every ``RELATIONSHIP_SYNC_FULL_INTERVAL`` hours.
+    """
+
+    def __init__(self, user, client: GitHubFollowClient = None):
+        self.user = user
+        self.client = client or GitHubFollowClient(user.github_access_token)
+        self.pages = {
+            (page.kind, page.page): page
+            for page in GitHubListPage.objects.filter(user=user)
+        }
+        self.fetched: List[GitHubListPage] = []
+
+    def _page(self, kind: str, number: int, result: SyncResult) -> Tuple[List[List[str]], bool]:
+        """Rows of one page and whether it changed since the last sync."""
+        stored = self.pages.get((kind, number))
+        response = self.client.list_page(kind, number, etag=stored.etag if stored else None)
+        result.requests += 1
+        if response.status_code == 304 and stored is not None:
+            result.not_modified += 1
+            self.fetched.append(stored)
+            return stored.logins, False
+        response.raise_for_status()
+        rows = [[row['login'], row.get('avatar_url') or ''] for row in response.json()]
+        self.fetched.append(GitHubListPage(
+            user=self.user,
+            kind=kind,
+            page=number,
+            etag=response.headers.get('ETag', ''),
+            logins=rows,
+        ))
+        return rows, True
+
+    def fetch(self, kind: str, result: SyncResult, first: Optional[List[List[str]]] = None) -> Dict[str, Tuple[str, str]]:
+        """All remote logins of one list, keyed by lower-cased login: ``{login: (login, avatar_url)}``."""
+        remote = {}
+        number = 1
+        rows = first if first is not None else self._page(kind, 1, result)[0]
+        while True:
+            for login, avatar_url in rows:
+                remote[login.lower()] = (login, avatar_url)
+            if len(rows) < self.client.PAGE_SIZE:
+                return remote
+            number += 1
+            rows = self._page(kind, number, result)[0]
+
+    def _walked_recently(self) -> bool:
+        cutoff = timezone.now() - timedelta(hours=settings.RELATIONSHIP_SYNC_FULL_INTERVAL)
+        for kind in (FOLLOWERS, FOLLOWING):
+            page = self.pages.get((kind, 1))
+            if page is None or page.walked_at is None or page.walked_at < cutoff:
+                return False
+        return True
+
+    def _save_pages(self) -> None:
+        """Store the pages of a completed walk and drop pages past the end of either list."""
+        now = timezone.now()
+        changed = [page for page in self.fetched if page.pk is None]
+        for page in changed:
+            page.walked_at = now
+        GitHubListPage.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['user', 'kind', 'page'],
+            update_fields=['etag', 'logins', 'fetched_at', 'walked_at'],
+        )
+        GitHubListPage.objects.filter(
+            pk__in=[page.pk for page in self.fetched if page.pk is not None]
+        ).update(walked_at=now)
+        for kind in (FOLLOWERS, FOLLOWING):
+            last = max(page.page for page in self.fetched if page.kind == kind)
+            GitHubListPage.objects.filter(user=self.user, kind=kind, page__gt=last).delete()
+
+    def _local(self, kind: str) -> Dict[str, int]:
+        """Existing edges of one direction: ``{lower-cased login: edge pk}``."""
+        if kind == FOLLOWING:
+            edges = UserFollowing.objects.filter(from_user=self.user).annotate(login=Lower('to_user__github_username'))
+        else:
+            edges = UserFollowing.objects.filter(to_user=self.user).annotate(login=Lower('from_user__github_username'))
+        return dict(edges.filter(login__isnull=False).values_list('login', 'pk'))
+
+    def _user_ids(self, remote: Dict[str, Tuple[str, str]], logins: set, result: SyncResult) -> Dict[str, int]:
+        """Map logins to ``User`` ids, creating external users for unknown ones in bulk."""
+        def lookup():
+            found = {}
+            for chunk in _chunks(sorted(logins)):
+                found.update(
+                    User.objects.annotate(login=Lower('github_username'))
+                    .filter(login__in=chunk)
+                    .values_list('login', 'pk')
+                )
+            return found
+
+        ids = lookup()
+        missing = [login for login in logins if login not in ids]
+        if missing:
+            User.objects.bulk_create([
+                User(
+                    email=f"{remote[login][0]}@users.noreply.github.com",
+                    # Keep GitHub's casing; the lower-cased key is only for matching
+                    github_username=remote[login][0],
+                    avatar_url=remote[login][1],
+                    password='!',
+                    is_active=False,
+                    is_internal=False,
+                )
+                for login in missing
+            ], batch_size=CHUNK, ignore_conflicts=True)
+            known = len(ids)
+            ids = lookup()
+            result.users_created = len(ids) - known
+        return ids
+
+    def apply(self, followers: Dict[str, Tuple[str, str]], following: Dict[str, Tuple[str, str]]) -> SyncResult:
+        """Write the difference between the remote lists and the stored edges."""
+        result = SyncResult()
+        local_followers = self._local(FOLLOWERS)
+        local_following = self._local(FOLLOWING)
+
+        add_followers = followers.keys() - local_followers.keys()
+        add_following = following.keys() - local_following.keys()
+        removed = [pk for login, pk in local_followers.items() if login not in followers]
+        result.followers_removed = len(removed)
+        removed += [pk for login, pk in local_following.items() if login not in following]
+        result.following_removed = len(removed) - result.followers_removed
+
+        if add_followers or add_following:
+            ids = self._user_ids({**followers, **following}, add_followers | add_following, result)
+            edges = [
+                UserFollowing(from_user_id=ids[login], to_user=self.user)
+                for login in add_followers if login in ids and ids[login] != self.user.pk
+            ]
+            result.followers_added = len(edges)
+            edges += [
+                UserFollowing(from_user=self.user, to_user_id=ids[login])
+                for login in add_following if login in ids and ids[login] != self.user.pk
+            ]
+            result.following_added = len(edges) - result.followers_added
+            UserFollowing.objects.bulk_create(edges, batch_size=CHUNK, ignore_conflicts=True)
+
+        for chunk in _chunks(removed):
+            UserFollowing.objects.filter(pk__in=chunk).delete()
+        return result
+
+    def run(self, full: bool = False) -> SyncResult:
+        """Sync both lists; ``full`` walks every page even if page 1 is unchanged."""
+        result = SyncResult()
+        first = {kind: self._page(kind, 1, result) for kind in (FOLLOWERS, FOLLOWING)}
+        if not full and not any(changed for _, changed in first.values()) and self._walked_recently():
+            result.skipped = True
+            logger.info(f"Relationship sync for {self.user}: unchanged (2 conditional requests)")
+            return result
+
+        followers = self.fetch(FOLLOWERS, result, first[FOLLOWERS][0])
+        following = self.fetch(FOLLOWING, result, first[FOLLOWING][0])
+        reconciled = self.apply(followers, following)
+        self._save_pages()
+
+        reconciled.requests, reconciled.not_modified = result.requests, result.not_modified
+        logger.info(
+            f"Relationship sync for {self.user}: {len(followers)} followers, {len(following)} following "
+            f"on GitHub; {reconciled.changed} edges changed, {reconciled.users_created} users created, "
+            f"{reconciled.not_modified}/{reconciled.requests} pages not modified"
+        )
+        return reconciled
@@ -1,3 +1,290 @@
+import hashlib
+import json
+import threading
+from contextlib import redirect_stdout
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import GitHubListPage, User, UserFollowing
+from .services.github_service import GitHubFollowClient, GitHubService
+from .services.relationship_sync import RelationshipSync
+
+
+class FakeGitHub(BaseHTTPRequestHandler):
+    """The GitHub REST endpoints used for following, for the token owner ``login``.
+
+    ``PUT``/``DELETE /user/following/<login>`` answer 204 for logins in
+    ``known`` and 404 otherwise. ``/user/followers`` and ``/user/following``
+    page through ``lists`` and answer a matching ``If-None-Match`` with a
+    304. Every request is logged in ``requests``.
+    """
+
+    login = 'owner'
+    known = set()
+    lists = {}
+    requests = []
+
+    def _send(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        type(self).requests.append(('GET', self.path))
+        url = urlsplit(self.path)
+        if url.path == '/user':
+            return self._send(200, {'login': self.login})
+        kind = url.path.rsplit('/', 1)[-1]
+        if kind not in self.lists:
+            return self._send(404, {'message': 'Not Found'})
+        query = parse_qs(url.query)
+        size, page = int(query['per_page'][0]), int(query['page'][0])
+        rows = [{'login': login, 'avatar_url': ''} for login in self.lists[kind][(page - 1) * size:page * size]]
+        etag = '"{}"'.format(hashlib.sha256(json.dumps(rows).encode()).hexdigest()[:16])
+        if self.headers.get('If-None-Match') == etag:
+            return self._send(304, headers={'ETag': etag})
+        self._send(200, rows, headers={'ETag': etag})
+
+    def _write(self):
+        type(self).requests.append((self.command, self.path))
+        self._send(204 if self.path.rsplit('/', 1)[-1].lower() in self.known else 404)
+
+    do_PUT = do_DELETE = _write
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGitHubMixin:
+    """Serve ``FakeGitHub`` locally and point ``GitHubFollowClient`` at it."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGitHub)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        FakeGitHub.known, FakeGitHub.lists, FakeGitHub.requests = set(), {}, []
+        patcher = mock.patch.object(GitHubFollowClient, 'API_URL', self.base_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class RelationshipListingTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', github_username='owner')
+        self.client.force_login(self.owner, backend='django.contrib.auth.backends.ModelBackend')
+        people = [User.objects.create_user(email=f'user{n}@example.com', github_username=f'user{n}') for n in range(20)]
+        # I follow user0-14; user12-19 follow me, so user12-14 are mutual
+        for other in people[:15]:
+            UserFollowing.objects.create(from_user=self.owner, to_user=other)
+        for other in people[12:]:
+            UserFollowing.objects.create(from_user=other, to_user=self.owner)
+        # Every edge in the same instant: only the id breaks ties
+        UserFollowing.objects.update(created_at=timezone.now())
+
+    def walk(self, **params):
+        url = reverse('relationship_management')
+        response = self.client.get(url, params, secure=True)
+        logins = []
+        while True:
+            page = response.context['users']
+            logins += [user.github_username for user in page]
+            if not page.next_cursor:
+                return logins, response.context['stats']
+            response = self.client.get(url, {**params, 'cursor': page.next_cursor}, secure=True)
+
+    def test_every_related_user_is_listed_once(self):
+        logins, stats = self.walk()
+        self.assertEqual(sorted(logins), sorted(f'user{n}' for n in range(20)))
+        self.assertEqual(stats, {'following': 15, 'followers': 8, 'mutual': 3, 'total': 20})
+
+    def test_filters(self):
+        self.assertEqual(sorted(self.walk(filter='mutual')[0]), ['user12', 'user13', 'user14'])
+        self.assertEqual(len(self.walk(filter='followers')[0]), 8)
+        self.assertEqual(self.walk(filter='following', search='user1')[0], [f'user{n}' for n in range(14, 9, -1)] + ['user1'])
+
+
+class GitHubServiceFollowTests(FakeGitHubMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(
+            email='owner@example.com', github_username='owner', github_access_token=f'token-{self.id()}'
+        )
+        FakeGitHub.known = {'octocat'}
+
+    def call(self, method, target):
+        with redirect_stdout(StringIO()):
+            return method(self.owner, target)
+
+    def test_follow_is_one_put_after_the_cached_login(self):
+        self.assertTrue(self.call(GitHubService.follow_user_on_github, 'octocat'))
+        self.assertTrue(self.call(GitHubService.follow_user_on_github, 'octocat'))
+
+        self.assertEqual(FakeGitHub.requests, [
+            ('GET', '/user'), ('PUT', '/user/following/octocat'), ('PUT', '/user/following/octocat'),
+        ])
+        followed = UserFollowing.objects.get(from_user=self.owner)
+        self.assertEqual(followed.to_user.github_username, 'octocat')
+        self.assertFalse(followed.to_user.is_active)
+
+    def test_refusals_leave_the_database_alone(self):
+        self.assertFalse(self.call(GitHubService.follow_user_on_github, 'ghost'))
+        self.assertFalse(self.call(GitHubService.follow_user_on_github, 'Owner'))
+
+        self.assertFalse(UserFollowing.objects.exists())
+        self.assertNotIn(('PUT', '/user/following/Owner'), FakeGitHub.requests)
+
+    def test_unfollow_removes_the_edge(self):
+        target = User.objects.create_user(email='octocat@example.com', github_username='Octocat')
+        UserFollowing.objects.create(from_user=self.owner, to_user=target)
+
+        self.assertTrue(self.call(GitHubService.unfollow_user_on_github, 'octocat'))
+
+        self.assertEqual(FakeGitHub.requests, [('DELETE', '/user/following/octocat')])
+        self.assertFalse(UserFollowing.objects.exists())
+
+
+def remote(*logins):
+    """A fetched GitHub list: ``{lower-cased login: (login, avatar_url)}``."""
+    return {login.lower(): (login, f'https://avatars.example.com/{login}') for login in logins}
+
+
+class RelationshipSyncApplyTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', github_username='owner')
+        self.sync = RelationshipSync(self.owner, client=GitHubFollowClient('unused-token'))
+        people = {login: User.objects.create_user(email=f'{login}@example.com', github_username=login)
+                  for login in ('alice', 'bob', 'carol', 'dave')}
+        UserFollowing.objects.create(from_user=self.owner, to_user=people['alice'])
+        UserFollowing.objects.create(from_user=self.owner, to_user=people['bob'])
+        UserFollowing.objects.create(from_user=people['carol'], to_user=self.owner)
+        UserFollowing.objects.create(from_user=people['dave'], to_user=self.owner)
+
+    def edges(self):
+        return (
+            set(UserFollowing.objects.filter(to_user=self.owner).values_list('from_user__github_username', flat=True)),
+            set(UserFollowing.objects.filter(from_user=self.owner).values_list('to_user__github_username', flat=True)),
+        )
+
+    def test_difference_is_applied(self):
+        result = self.sync.apply(
+            followers=remote('Carol', 'Erin', 'owner'),
+            following=remote('ALICE', 'frank'),
+        )
+
+        self.assertEqual(self.edges(), ({'carol', 'Erin'}, {'alice', 'frank'}))
+        self.assertEqual(
+            (result.followers_added, result.followers_removed, result.following_added, result.following_removed),
+            (1, 1, 1, 1),
+        )
+        self.assertEqual(result.users_created, 2)
+        erin = User.objects.get(github_username='Erin')
+        self.assertFalse(erin.is_active)
+        self.assertEqual(erin.avatar_url, 'https://avatars.example.com/Erin')
+
+    def test_unchanged_lists_write_nothing(self):
+        result = self.sync.apply(followers=remote('carol', 'dave'), following=remote('alice', 'bob'))
+        self.assertEqual(result.changed, 0)
+
+    def test_queries_do_not_grow_with_the_lists(self):
+        def queries(size, prefix):
+            with CaptureQueriesContext(connection) as captured:
+                self.sync.apply(
+                    followers=remote(*(f'{prefix}-follower{n}' for n in range(size))),
+                    following=remote(*(f'{prefix}-followed{n}' for n in range(size))),
+                )
+            # bulk_create batches follow the backend's parameter limit
+            return len([query for query in captured if not query['sql'].startswith('INSERT')])
+
+        self.assertEqual(queries(5, 'small'), queries(200, 'large'))
+
+
+class RelationshipSyncConditionalTests(FakeGitHubMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        page_size = mock.patch.object(GitHubFollowClient, 'PAGE_SIZE', 2)
+        page_size.start()
+        self.addCleanup(page_size.stop)
+        self.owner = User.objects.create_user(
+            email='owner@example.com', github_username='owner', github_access_token='token'
+        )
+        FakeGitHub.lists = {
+            'followers': ['alice', 'bob', 'carol', 'dave', 'erin'],
+            'following': ['alice', 'frank'],
+        }
+
+    def sync(self, full=False):
+        FakeGitHub.requests = []
+        return RelationshipSync(self.owner).run(full=full)
+
+    def edges(self):
+        return (
+            sorted(UserFollowing.objects.filter(to_user=self.owner).values_list('from_user__github_username', flat=True)),
+            sorted(UserFollowing.objects.filter(from_user=self.owner).values_list('to_user__github_username', flat=True)),
+        )
+
+    def test_unchanged_lists_cost_two_conditional_requests(self):
+        first = self.sync()
+        self.assertEqual((first.followers_added, first.following_added, first.requests), (5, 2, 5))
+        self.assertEqual(GitHubListPage.objects.filter(user=self.owner).count(), 5)
+
+        second = self.sync()
+
+        self.assertTrue(second.skipped)
+        self.assertEqual((second.requests, second.not_modified), (2, 2))
+
+    def test_changed_page_is_reconciled_with_stored_pages(self):
+        self.sync()
+        FakeGitHub.lists['followers'] = ['zoe', 'bob', 'carol', 'dave', 'erin']
+
+        result = self.sync()
+
+        self.assertEqual((result.followers_added, result.followers_removed), (1, 1))
+        # Only page 1 of followers was downloaded; the other four pages answered 304
+        self.assertEqual((result.requests, result.not_modified), (5, 4))
+        self.assertEqual(self.edges(), (['bob', 'carol', 'dave', 'erin', 'zoe'], ['alice', 'frank']))
+
+    def test_deep_changes_wait_for_the_full_walk(self):
+        self.sync()
+        FakeGitHub.lists['followers'] = ['alice', 'bob', 'carol']
+
+        self.assertTrue(self.sync().skipped)
+        result = self.sync(full=True)
+
+        self.assertEqual(result.followers_removed, 2)
+        self.assertEqual(self.edges()[0], ['alice', 'bob', 'carol'])
+        self.assertFalse(GitHubListPage.objects.filter(user=self.owner, kind='followers', page=3).exists())
+
+    def test_stale_walk_is_redone(self):
+        self.sync()
+        FakeGitHub.lists['followers'] = ['alice', 'bob', 'carol']
+        GitHubListPage.objects.update(walked_at=timezone.now() - timedelta(days=2))
 
-# Create your tests here.
+        self.assertFalse(self.sync().skipped)
+        self.assertEqual(self.edges()[0], ['alice', 'bob', 'carol'])
@@ -6,11 +6,13 @@ from .models import User, UserFollowing
 from django.contrib import messages
 from .forms import *
 from .services.github_service import GitHubService
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Q, Exists, OuterRef, Case, When, Value, CharField
 from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
+from github_management.pagination import KeysetPaginator
+from github_management.services.token_pool import user_tokens_changed
 
 @login_required
 def relationship_management(request):
@@ -19,68 +21,77 @@ def relationship_management(request):
     # Get filter and search parameters
     filter_type = request.GET.get('filter', 'all')  # all, following, followers, mutual
     search_query = request.GET.get('search', '').strip()
-    page_number = request.GET.get('page', 1)
+    page_number = request.GET.get('page')
+    cursor = request.GET.get('cursor')
     per_page = request.GET.get('per_page', 12)
     
     # Get all unique users in relationships with current user
-    following_ids = UserFollowing.objects.filter(from_user=user).values_list('to_user_id', flat=True)
-    follower_ids = UserFollowing.objects.filter(to_user=user).values_list('from_user_id', flat=True)
+    following_ids = set(UserFollowing.objects.filter(from_user=user).values_list('to_user_id', flat=True))
+    follower_ids = set(UserFollowing.objects.filter(to_user=user).values_list('from_user_id', flat=True))
     
     # Combine all related user IDs
-    all_related_ids = set(following_ids) | set(follower_ids)
-    
-    # Start with base queryset of all related users
-    users_qs = get_user_model().objects.filter(id__in=all_related_ids).select_related()
-    
-    # Annotate each user with their relationship status
-    users_qs = users_qs.annotate(
-        is_following=Exists(
-            UserFollowing.objects.filter(
-                from_user=user,
-                to_user=OuterRef('pk')
+    all_related_ids = following_ids | follower_ids
+    
+    # Pages walk the follow edges themselves, newest first, so the seek runs on
+    # UserFollowing's (from_user|to_user, created_at, id) indexes. Each user appears
+    # once: through my edge to them if I follow them, else through theirs to me.
+    edges = UserFollowing.objects.annotate(
+        followed_back=Exists(UserFollowing.objects.filter(from_user=OuterRef('to_user'), to_user=user)),
+        i_follow_back=Exists(UserFollowing.objects.filter(from_user=user, to_user=OuterRef('from_user'))),
+    )
+    outgoing, incoming = (Q(from_user=user), 'to_user'), (Q(to_user=user), 'from_user')
+    clauses = {
+        'following': [outgoing],
+        'followers': [incoming],
+        'mutual': [(Q(from_user=user, followed_back=True), 'to_user')],
+    }.get(filter_type, [outgoing, (Q(to_user=user, i_follow_back=False), 'from_user')])
+
+    edge_filter = Q()
+    for direction, other in clauses:
+        # Apply search filter to the user on the other end of the edge
+        if search_query:
+            direction &= (
+                Q(**{f'{other}__github_username__icontains': search_query}) |
+                Q(**{f'{other}__first_name__icontains': search_query}) |
+                Q(**{f'{other}__last_name__icontains': search_query}) |
+                Q(**{f'{other}__email__icontains': search_query})
             )
-        ),
-        is_follower=Exists(
-            UserFollowing.objects.filter(
-                from_user=OuterRef('pk'),
-                to_user=user
+        edge_filter |= direction
+    edges = edges.filter(edge_filter)
+
+    def edge_users(page_edges):
+        """The users on the other end of a page of edges, with their relationship status."""
+        other_ids = [e.to_user_id if e.from_user_id == user.id else e.from_user_id for e in page_edges]
+        users_qs = get_user_model().objects.filter(id__in=other_ids).annotate(
+            is_following=Exists(
+                UserFollowing.objects.filter(
+                    from_user=user,
+                    to_user=OuterRef('pk')
+                )
+            ),
+            is_follower=Exists(
+                UserFollowing.objects.filter(
+                    from_user=OuterRef('pk'),
+                    to_user=user
+                )
+            )
+        ).annotate(
+            relationship_status=Case(
+                When(is_following=True, is_follower=True, then=Value('mutual')),
+                When(is_following=True, is_follower=False, then=Value('following')),
+                When(is_following=False, is_follower=True, then=Value('follower')),
+                default=Value('none'),
+                output_field=CharField()
             )
         )
-    ).annotate(
-        relationship_status=Case(
-            When(is_following=True, is_follower=True, then=Value('mutual')),
-            When(is_following=True, is_follower=False, then=Value('following')),
-            When(is_following=False, is_follower=True, then=Value('follower')),
-            default=Value('none'),
-            output_field=CharField()
-        )
-    )
-    
-    # Apply filters
-    if filter_type == 'following':
-        users_qs = users_qs.filter(is_following=True)
-    elif filter_type == 'followers':
-        users_qs = users_qs.filter(is_follower=True)
-    elif filter_type == 'mutual':
-        users_qs = users_qs.filter(is_following=True, is_follower=True)
-    
-    # Apply search filter
-    if search_query:
-        users_qs = users_qs.filter(
-            Q(github_username__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
-    
-    # Order by most recent relationship
-    users_qs = users_qs.order_by('-id')
+        by_id = {u.id: u for u in users_qs}
+        return [by_id[pk] for pk in other_ids if pk in by_id]
     
     # Calculate stats
     stats = {
-        'following': len([uid for uid in following_ids]),
-        'followers': len([uid for uid in follower_ids]),
-        'mutual': len(set(following_ids) & set(follower_ids)),
+        'following': len(following_ids),
+        'followers': len(follower_ids),
+        'mutual': len(following_ids & follower_ids),
         'total': len(all_related_ids)
     }
     
@@ -92,22 +103,21 @@ def relationship_management(request):
     except (ValueError, TypeError):
         per_page = 12
     
-    # Update this condition
+    # Sync is cheap when nothing changed (conditional requests), so it can run often
+    sync_interval = timedelta(minutes=settings.RELATIONSHIP_SYNC_INTERVAL)
     if (user.github_access_token and 
         (user.last_synced_github_followers_following is None or 
-        user.last_synced_github_followers_following < timezone.now() - timedelta(days=1))):
+        user.last_synced_github_followers_following < timezone.now() - sync_interval)):
         from users.tasks import sync_github_followers_following
         sync_github_followers_following.delay(user.id)
     
-    paginator = Paginator(users_qs, per_page)
-    
-    try:
-        users_page = paginator.page(page_number)
-    except PageNotAnInteger:
-        users_page = paginator.page(1)
-    except EmptyPage:
-        users_page = paginator.page(paginator.num_pages)
-    User.objects.with_fresh_data(users_page)
+    # Keyset pagination by most recent follow edge; the stats double as the
+    # estimated total, which is unknown while searching
+    estimated_count = None if search_query else stats.get(filter_type, stats['total'])
+    paginator = KeysetPaginator(
+        edges, ('-created_at', '-id'), per_page, count=estimated_count, transform=edge_users
+    )
+    users_page = paginator.get_page(cursor=cursor, page=page_number)
     context = {
         'users': users_page,
         'stats': stats,
@@ -181,10 +191,12 @@ def add_github_token(request):
         form = GitHubTokenForm(request.POST)
         if form.is_valid():
             request.user.github_access_token = form.cleaned_data['access_token']
+            request.user.share_token_for_refresh = form.cleaned_data['share_for_refresh']
             request.user.save()
+            user_tokens_changed()
             messages.success(request, 'GitHub token saved successfully!')
             return redirect('profile')  # Or wherever you want to redirect
     else:
-        form = GitHubTokenForm()
+        form = GitHubTokenForm(initial={'share_for_refresh': request.user.share_token_for_refresh})
     
     return render(request, 'users/add_github_token.html', {'form': form})
\ No newline at end of file